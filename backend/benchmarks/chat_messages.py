@@ -0,0 +1,172 @@
+"""Append and read latency of a growing chat, messages embedded in the chat document versus the messages collection.
+
+Every exchange appends a question and an answer citing --sources chunks of --source-chars
+characters. The embedded layout pushes onto the chat's messages array with the source text
+copied in, the way chats were stored before; the split layout goes through localrag's
+mongodb functions, one document per message with sources as chunk references. Reads are the
+history window of a follow-up, a page of 50 messages from the middle and the whole chat.
+Needs a MongoDB server, the benchmark database is dropped afterwards.
+
+Run from backend/: python -m benchmarks.chat_messages --messages 10000 --url mongodb://localhost:27017
+"""
+import argparse
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import Dict, List
+
+from bson import ObjectId
+from pymongo.errors import DocumentTooLarge, WriteError
+
+from localrag.database import mongodb
+
+WINDOW = 16
+PAGE = 50
+
+
+def exchange(i: int, sources: int, source_chars: int) -> List[Dict]:
+    now = datetime.utcnow()
+    return [
+        {"role": "user", "content": f"question {i} " + "q" * 80, "created_at": now},
+        {
+            "role": "assistant",
+            "content": f"answer {i} " + "a" * 600,
+            "sources": [
+                {"id": i * sources + j, "filename": "bench.pdf", "score": 0.5, "content": "s" * source_chars}
+                for j in range(sources)
+            ],
+            "web_sources": [],
+            "created_at": now,
+        },
+    ]
+
+
+class Embedded:
+    name = "embedded"
+
+    def __init__(self, database) -> None:
+        self.chats = database.bench_embedded_chats
+
+    async def create(self):
+        result = await self.chats.insert_one({"title": "bench", "messages": [], "last_updated": datetime.utcnow()})
+        return result.inserted_id
+
+    async def append(self, chat_id, messages: List[Dict]) -> None:
+        await self.chats.update_one(
+            {"_id": chat_id},
+            {"$push": {"messages": {"$each": messages}}, "$set": {"last_updated": datetime.utcnow()}}
+        )
+
+    async def window(self, chat_id) -> None:
+        await self._project(chat_id, {"$slice": ["$messages", -WINDOW]})
+
+    async def page(self, chat_id, skip: int) -> None:
+        await self._project(chat_id, {"$slice": ["$messages", skip, PAGE]})
+
+    async def full(self, chat_id) -> None:
+        await self.chats.find_one({"_id": chat_id})
+
+    async def size(self, chat_id) -> int:
+        docs = await self.chats.aggregate([
+            {"$match": {"_id": chat_id}}, {"$project": {"size": {"$bsonSize": "$$ROOT"}}}
+        ]).to_list(length=1)
+        return docs[0]["size"]
+
+    async def _project(self, chat_id, messages: Dict) -> None:
+        await self.chats.aggregate([{"$match": {"_id": chat_id}}, {"$project": {"messages": messages}}]).to_list(length=1)
+
+
+class Split:
+    name = "split"
+
+    async def create(self):
+        return await mongodb.create_chat({"title": "bench", "last_updated": datetime.utcnow()})
+
+    async def append(self, chat_id, messages: List[Dict]) -> None:
+        await mongodb.update_chat(chat_id, messages)
+
+    async def window(self, chat_id) -> None:
+        await mongodb.get_chat_window(chat_id, WINDOW)
+
+    async def page(self, chat_id, skip: int) -> None:
+        await mongodb.get_chat_message_page(chat_id, skip, PAGE)
+
+    async def full(self, chat_id) -> None:
+        await mongodb.get_chat(chat_id)
+
+    async def size(self, chat_id) -> int:
+        chats = await mongodb.get_chat_collection()
+        docs = await chats.aggregate([
+            {"$match": {"_id": ObjectId(chat_id)}}, {"$project": {"size": {"$bsonSize": "$$ROOT"}}}
+        ]).to_list(length=1)
+        return docs[0]["size"]
+
+
+async def timed(call, repeats: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeats):
+        await call()
+    return (time.perf_counter() - started) / repeats * 1000
+
+
+async def measure(layout, messages: int, checkpoints: List[int], sources: int, source_chars: int, reads: int) -> List[Dict]:
+    chat_id = await layout.create()
+    rows = []
+    appended, append_seconds, appends = 0, 0.0, 0
+    for i in range(messages // 2):
+        started = time.perf_counter()
+        try:
+            await layout.append(chat_id, exchange(i, sources, source_chars))
+        except (DocumentTooLarge, WriteError) as e:
+            print(f"{layout.name}: append failed at {appended} messages: {str(e)[:80]}")
+            break
+        append_seconds += time.perf_counter() - started
+        appends += 1
+        appended += 2
+        if appended in checkpoints:
+            rows.append({
+                "layout": layout.name,
+                "messages": appended,
+                "append": append_seconds / appends * 1000,
+                "window": await timed(lambda: layout.window(chat_id), reads),
+                "page": await timed(lambda: layout.page(chat_id, appended // 2), reads),
+                "full": await timed(lambda: layout.full(chat_id), max(1, reads // 4)),
+                "chat_kb": await layout.size(chat_id) / 1024,
+            })
+            append_seconds, appends = 0.0, 0
+    return rows
+
+
+async def run(url: str, database: str, messages: int, sources: int, source_chars: int, reads: int) -> None:
+    logging.disable(logging.INFO)
+    mongodb.settings.mongodb_url = url
+    mongodb.settings.mongodb_db_name = database
+    await mongodb.db.connect_to_mongo()
+    checkpoints = sorted({max(2, count - count % 2) for count in (messages // 10, messages // 2, messages)})
+    try:
+        rows = []
+        for layout in (Embedded(mongodb.db.db), Split()):
+            rows.extend(await measure(layout, messages, checkpoints, sources, source_chars, reads))
+    finally:
+        await mongodb.db.client.drop_database(database)
+        await mongodb.db.close_mongo_connection()
+
+    print(f"{'layout':<10}{'messages':>10}{'append ms':>11}{'window ms':>11}{'page ms':>9}{'full ms':>9}{'chat doc KB':>13}")
+    for row in rows:
+        print(
+            f"{row['layout']:<10}{row['messages']:>10}{row['append']:>11.2f}{row['window']:>11.2f}"
+            f"{row['page']:>9.2f}{row['full']:>9.1f}{row['chat_kb']:>13.0f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="mongodb://localhost:27017")
+    parser.add_argument("--db", default="localrag_bench")
+    parser.add_argument("--messages", type=int, default=10000)
+    parser.add_argument("--sources", type=int, default=4)
+    parser.add_argument("--source-chars", type=int, default=500)
+    parser.add_argument("--reads", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(run(args.url, args.db, args.messages, args.sources, args.source_chars, args.reads))
@@ -0,0 +1,59 @@
+"""Chunking throughput (MB/s) of the offset-based Chunker against LangChain's splitter.
+
+Run from backend/: python -m benchmarks.chunker --pages 200
+"""
+import argparse
+import io
+import logging
+import time
+
+import pypdf
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+from localrag.core.chunker import Chunker
+from localrag.core.document_processor import clean_pdf_text
+from tests.utils import make_pdf
+
+
+def measure(split, pages, repeat):
+    size = sum(len(page.encode("utf-8")) for page in pages) * repeat
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for page in pages:
+            split(page)
+    seconds = time.perf_counter() - start
+    return size / seconds / 1e6
+
+
+def run(page_count: int, repeat: int, chunk_size: int, chunk_overlap: int) -> None:
+    logging.disable(logging.INFO)
+    reader = pypdf.PdfReader(io.BytesIO(make_pdf(page_count)))
+    pages = [clean_pdf_text(page.extract_text()) for page in reader.pages]
+
+    reference = RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        length_function=len,
+        separators=["\n\n", "\n", " ", ""]
+    )
+    chunker = Chunker(chunk_size, chunk_overlap)
+    assert all(chunker.split_text(page) == reference.split_text(page) for page in pages)
+    results = [
+        ("langchain", measure(reference.split_text, pages, repeat)),
+        ("chunker", measure(chunker.split_text, pages, repeat)),
+        ("offsets", measure(chunker.split_offsets, pages, repeat)),
+    ]
+    print(f"{'splitter':<12}{'MB/s':>10}")
+    for name, throughput in results:
+        print(f"{name:<12}{throughput:>10.1f}")
+    print(f"speedup: {results[1][1] / results[0][1]:.2f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--chunk-overlap", type=int, default=200)
+    args = parser.parse_args()
+    run(args.pages, args.repeat, args.chunk_size, args.chunk_overlap)
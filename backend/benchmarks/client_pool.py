@@ -0,0 +1,56 @@
+"""Per-request overhead and TCP connections with per-request clients versus the shared ClientPool.
+
+Each simulated search builds a DocumentProcessor, embeds the query and asks for a chat
+completion against a local stub server, the way the search route does.
+
+Run from backend/: python -m benchmarks.client_pool --requests 200
+"""
+import argparse
+import asyncio
+import logging
+import os
+import time
+
+from localrag.core.client_pool import ClientPool
+from localrag.core.document_processor import DocumentProcessor
+from tests.utils import StubServer
+
+MESSAGES = [{"role": "user", "content": "what is in my documents?"}]
+
+
+async def simulate(requests: int, keys: int, pool: ClientPool = None) -> float:
+    started = time.perf_counter()
+    for i in range(requests):
+        processor = DocumentProcessor(f"key-{i % keys}", client_pool=pool)
+        await processor.aembed_texts(["what is in my documents?"])
+        processor.client.chat.completions.create(model="stub", messages=MESSAGES)
+    return (time.perf_counter() - started) / requests * 1000
+
+
+async def run(requests: int, keys: int) -> None:
+    logging.disable(logging.INFO)
+    results = []
+    with StubServer() as server:
+        # clients built without a pool pick the stub up from the environment
+        os.environ["OPENAI_BASE_URL"] = f"{server.url}/v1"
+        ms = await simulate(requests, keys)
+        results.append(("per-request", ms, server.connections))
+
+        before = server.connections
+        pool = ClientPool(openai_base_url=f"{server.url}/v1")
+        ms = await simulate(requests, keys, pool)
+        await pool.aclose()
+        results.append(("pooled", ms, server.connections - before))
+
+    print(f"{'clients':<14}{'ms/request':>12}{'connections':>14}")
+    for name, ms, connections in results:
+        print(f"{name:<14}{ms:>12.2f}{connections:>14}")
+    print(f"speedup: {results[0][1] / results[1][1]:.2f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--keys", type=int, default=4)
+    args = parser.parse_args()
+    asyncio.run(run(args.requests, args.keys))
@@ -0,0 +1,90 @@
+"""Client RPCs and latency per similarity_search with and without the per-search load-state check.
+
+The old path asked Milvus for the collection's load state before every search. The engine
+now tracks it locally, so a search is a single RPC. Runs against Milvus Lite by default, or
+the in-memory FakeMilvusClient with --fake.
+
+Run from backend/: python -m benchmarks.milvus_search --queries 500
+"""
+import argparse
+import logging
+import os
+import random
+import tempfile
+import time
+from collections import Counter
+
+from pymilvus import MilvusClient
+
+from localrag.core.vector_store import UragEngine
+from tests.utils import FakeMilvusClient
+
+DIM = 1536
+
+
+class CountingClient:
+    """Passes every call through to the wrapped client and counts it."""
+
+    def __init__(self, client) -> None:
+        self._client = client
+        self.calls = Counter()
+
+    def __getattr__(self, name):
+        attr = getattr(self._client, name)
+        if not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            self.calls[name] += 1
+            return attr(*args, **kwargs)
+        return call
+
+
+def measure(client: CountingClient, search, queries) -> tuple:
+    client.calls.clear()
+    started = time.perf_counter()
+    for query in queries:
+        search(query)
+    ms = (time.perf_counter() - started) / len(queries) * 1000
+    return ms, sum(client.calls.values()) / len(queries)
+
+
+def run(queries: int, rows: int, uri: str, fake: bool) -> None:
+    logging.disable(logging.INFO)
+    rng = random.Random(0)
+    client = CountingClient(FakeMilvusClient() if fake else MilvusClient(uri))
+    engine = UragEngine(client, "bench")
+    engine.bulk_add(
+        ["bench.pdf"] * rows,
+        [f"chunk {i}" for i in range(rows)],
+        [[rng.random() for _ in range(DIM)] for _ in range(rows)],
+        [{}] * rows
+    )
+    vectors = [[rng.random() for _ in range(DIM)] for _ in range(queries)]
+
+    def legacy(query):
+        client.get_load_state(engine.collection)
+        return engine.similarity_search(query)
+
+    # warm up so the collection is loaded and both paths start from the same state
+    for query in vectors[:10]:
+        engine.similarity_search(query)
+
+    results = [
+        ("load-state check", *measure(client, legacy, vectors)),
+        ("tracked state", *measure(client, engine.similarity_search, vectors)),
+    ]
+    print(f"{'search':<18}{'ms/query':>10}{'rpcs/query':>12}")
+    for name, ms, rpcs in results:
+        print(f"{name:<18}{ms:>10.3f}{rpcs:>12.2f}")
+    print(f"speedup: {results[0][1] / results[1][1]:.2f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--uri", default=os.path.join(tempfile.mkdtemp(), "bench.db"))
+    parser.add_argument("--fake", action="store_true", help="use the in-memory fake client instead of Milvus Lite")
+    args = parser.parse_args()
+    run(args.queries, args.rows, args.uri, args.fake)
@@ -0,0 +1,49 @@
+"""Pages/second of the serial PDF reader vs. parallel page-range extraction.
+
+Run from backend/: python -m benchmarks.pdf_extraction --pages 2000 --workers 4
+"""
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+import argparse
+import logging
+import os
+import tempfile
+import time
+
+from localrag.core.document_processor import DocumentLoader
+from tests.utils import make_pdf
+
+
+def run(pages: int, workers: int, pages_per_task: int) -> None:
+    logging.disable(logging.INFO)
+    loader = DocumentLoader()
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf_file = Path(tmp) / "synthetic.pdf"
+        pdf_file.write_bytes(make_pdf(pages))
+        print(f"synthetic PDF: {pages} pages, {pdf_file.stat().st_size / 1e6:.1f} MB, {os.cpu_count()} CPUs")
+
+        start = time.perf_counter()
+        serial = loader.read_pdf(pdf_file)
+        serial_seconds = time.perf_counter() - start
+
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            # spawn the workers before timing
+            list(pool.map(abs, range(workers)))
+            start = time.perf_counter()
+            parallel = loader.read_pdf_parallel(pdf_file, pool, pages_per_task)
+            parallel_seconds = time.perf_counter() - start
+
+    assert parallel == serial, "parallel extraction changed the output"
+    print(f"{'mode':<24}{'seconds':>10}{'pages/s':>12}")
+    print(f"{'serial':<24}{serial_seconds:>10.2f}{pages / serial_seconds:>12.1f}")
+    print(f"{f'parallel x{workers}':<24}{parallel_seconds:>10.2f}{pages / parallel_seconds:>12.1f}")
+    print(f"speedup: {serial_seconds / parallel_seconds:.2f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pages", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--pages-per-task", type=int, default=32)
+    args = parser.parse_args()
+    run(args.pages, args.workers, args.pages_per_task)
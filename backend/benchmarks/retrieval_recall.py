@@ -0,0 +1,241 @@
+"""Recall@k, QPS and latency percentiles of UragEngine searches across index types and search params.
+
+Ground truth is exact top-k from NumPy brute force over the same vectors. The corpus is either
+synthetic or loaded from .npy / .fvecs files, the format of the public ANN benchmark sets
+(SIFT-128, GIST-960, ...); collections are created with the corpus' dimension. The synthetic
+corpus has more clusters than the IVF profiles have lists and noise on the order of the
+distance between clusters, so neighbours spill into other lists and nprobe matters.
+--noise 2.0 suits 1536-d, lower dimensions need less (about 1.0 at 256-d).
+
+Backends:
+  server  a running Milvus at --uri, the only backend that searches with the ANN indexes
+  lite    Milvus Lite in a temporary file (default); it accepts any index type but always
+          searches FLAT, so it only measures exact search
+  local   the in-process LocalVectorClient, in memory or under --uri when given (always exact)
+  stub    the in-memory FakeMilvusClient, pure Python, only for checking the harness offline
+
+Run from backend/:
+  python -m benchmarks.retrieval_recall --backend server --uri http://localhost:19530
+  python -m benchmarks.retrieval_recall --backend server --corpus sift_base.fvecs --query-file sift_query.fvecs
+  python -m benchmarks.retrieval_recall --rows 20000 --queries 200
+  python -m benchmarks.retrieval_recall --backend stub --rows 500 --dim 32 --noise 0.5 --queries 20 --json recall.json
+"""
+import argparse
+import json
+import logging
+import os
+import tempfile
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from localrag.core.index_profiles import IndexConfig, resolve_index_config
+from localrag.core.metrics import LatencyTracker
+from localrag.core.vector_store import UragEngine
+
+# profile, build params overriding the profile's, the search param swept and its values
+SWEEPS = {
+    # backends that search exactly whatever the index, the ANN rows would only repeat this one
+    "exact": [
+        ("exact", {}, None, [None]),
+    ],
+    # nlist of the IVF profiles scaled down for corpora of tens of thousands of rows
+    "server": [
+        ("exact", {}, None, [None]),
+        ("default", {"nlist": 128}, "nprobe", [1, 4, 8, 16, 32, 64]),
+        ("low_latency", {}, "ef", [16, 32, 64, 128, 256]),
+        ("memory_lean", {"nlist": 128}, "nprobe", [1, 4, 16, 64]),
+        ("memory_lean_pq", {"nlist": 128}, "nprobe", [1, 4, 16, 64]),
+        ("disk", {}, "search_list", [20, 50, 100, 200]),
+    ],
+}
+
+
+def synthetic_corpus(
+    rows: int, queries: int, dim: int, clusters: int, noise: float, seed: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    # Clustered rather than uniform: uniform high-dimensional points are all nearly
+    # equidistant, which makes every ANN index look equally bad. Tight, well separated
+    # clusters are the opposite, each IVF list holds whole clusters and nprobe=1 is exact.
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim), dtype=np.float32)
+    corpus = centers[rng.integers(clusters, size=rows)] + noise * rng.standard_normal((rows, dim), dtype=np.float32)
+    queries = centers[rng.integers(clusters, size=queries)] + noise * rng.standard_normal((queries, dim), dtype=np.float32)
+    return corpus, queries
+
+
+def load_vectors(path: str, limit: Optional[int] = None) -> np.ndarray:
+    if path.endswith(".npy"):
+        vectors = np.load(path, mmap_mode="r")
+    elif path.endswith(".fvecs"):
+        # each vector is an int32 dimension followed by that many float32 values
+        raw = np.fromfile(path, dtype=np.int32)
+        dim = raw[0]
+        vectors = raw.reshape(-1, dim + 1)[:, 1:].view(np.float32)
+    else:
+        raise ValueError(f"Unsupported vector file {path}, expected .npy or .fvecs")
+    return np.ascontiguousarray(vectors[:limit], dtype=np.float32)
+
+
+def pq_subvectors(dim: int) -> int:
+    # IVF_PQ needs m to divide the dimension; 16 dimensions per subvector like the profile's 96 for 1536-d
+    m = max(1, dim // 16)
+    while dim % m:
+        m -= 1
+    return m
+
+
+def exact_top_k(corpus: np.ndarray, queries: np.ndarray, k: int, metric: str, block: int = 1024) -> np.ndarray:
+    if metric == "COSINE":
+        corpus = corpus / np.linalg.norm(corpus, axis=1, keepdims=True)
+        queries = queries / np.linalg.norm(queries, axis=1, keepdims=True)
+    corpus_norms = (corpus ** 2).sum(axis=1)
+    results = []
+    for start in range(0, len(queries), block):
+        part = queries[start:start + block]
+        if metric == "L2":
+            # |q - x|^2 without the |q|^2 term, which doesn't change the order
+            scores = corpus_norms[None, :] - 2 * part @ corpus.T
+        else:
+            scores = -(part @ corpus.T)
+        top = np.argpartition(scores, min(k, scores.shape[1] - 1), axis=1)[:, :k]
+        order = np.take_along_axis(scores, top, axis=1).argsort(axis=1)
+        results.append(np.take_along_axis(top, order, axis=1))
+    return np.concatenate(results)
+
+
+def make_client(backend: str, uri: Optional[str]):
+    if backend == "stub":
+        from tests.utils import FakeMilvusClient
+        return FakeMilvusClient()
+    if backend == "local":
+        from localrag.core.local_vectors import LocalVectorClient
+        return LocalVectorClient(uri)
+    from pymilvus import MilvusClient
+    if backend == "lite":
+        uri = uri or os.path.join(tempfile.mkdtemp(), "recall.db")
+    return MilvusClient(uri=uri)
+
+
+def build(client, collection: str, config: IndexConfig, corpus: np.ndarray) -> float:
+    started = time.perf_counter()
+    engine = UragEngine(client, collection, index_config=config, dim=corpus.shape[1])
+    engine.bulk_add(
+        ["bench"] * len(corpus),
+        [str(i) for i in range(len(corpus))],
+        corpus.tolist(),
+        [{}] * len(corpus)
+    )
+    if hasattr(client, "flush"):
+        # a server builds the index on sealed segments, searching right away would mostly hit growing ones
+        client.flush(collection)
+    return time.perf_counter() - started
+
+
+def measure(engine: UragEngine, queries: np.ndarray, truth: np.ndarray, k: int) -> Dict:
+    vectors = queries.tolist()
+    engine.batch_similarity_search(vectors[:10], limit=k)  # warm up
+    latencies = LatencyTracker(max_samples=len(vectors))
+    found = 0
+    started = time.perf_counter()
+    for query, expected in zip(vectors, truth):
+        query_started = time.perf_counter()
+        hits = engine.similarity_search(query, limit=k)
+        latencies.record("search", time.perf_counter() - query_started)
+        found += len({int(hit["content"]) for hit in hits} & set(expected.tolist()))
+    seconds = time.perf_counter() - started
+
+    batch_started = time.perf_counter()
+    engine.batch_similarity_search(vectors, limit=k)
+    batch_seconds = time.perf_counter() - batch_started
+
+    summary = latencies.summary()["search"]
+    return {
+        "recall": found / (len(vectors) * k),
+        "qps": len(vectors) / seconds,
+        "batch_qps": len(vectors) / batch_seconds,
+        "p50_ms": summary["p50_ms"],
+        "p95_ms": summary["p95_ms"],
+        "p99_ms": summary["p99_ms"],
+    }
+
+
+def run(args) -> List[Dict]:
+    logging.disable(logging.WARNING)
+    if args.corpus:
+        corpus = load_vectors(args.corpus, args.rows)
+        queries = load_vectors(args.query_file, args.queries) if args.query_file else corpus[-args.queries:]
+        if not args.query_file:
+            corpus = corpus[:-args.queries]
+    else:
+        corpus, queries = synthetic_corpus(args.rows, args.queries, args.dim, args.clusters, args.noise, args.seed)
+    truth = exact_top_k(corpus, queries, args.k, args.metric)
+    client = make_client(args.backend, args.uri)
+    print(f"{len(corpus)} vectors of {corpus.shape[1]} dimensions, {len(queries)} queries, {args.metric}, k={args.k}")
+
+    sweep = args.sweep or ("server" if args.backend == "server" else "exact")
+    if sweep == "server" and args.backend != "server":
+        print(f"note: the {args.backend} backend searches exactly, every row will have recall 1.000")
+    results = []
+    for i, (profile, build_params, param, values) in enumerate(SWEEPS[sweep]):
+        if profile == "memory_lean_pq":
+            build_params = {**build_params, "m": pq_subvectors(corpus.shape[1])}
+        config = resolve_index_config(profile, metric_type=args.metric, build_params=build_params)
+        collection = f"recall_{i}_{profile}"
+        if collection in client.list_collections():
+            client.drop_collection(collection)
+        build_seconds = build(client, collection, config, corpus)
+        for value in values:
+            search_params = {param: value} if param else {}
+            swept = IndexConfig(config.index_type, config.metric_type, config.build_params, search_params)
+            # reopening picks the collection's index up with the swept search params
+            engine = UragEngine(
+                client, collection, index_config=swept, search_batch_size=args.batch_size, dim=corpus.shape[1]
+            )
+            row = {
+                "profile": profile,
+                "index_type": config.index_type,
+                "build_params": config.build_params,
+                "param": f"{param}={value}" if param else "-",
+                "build_seconds": build_seconds,
+                **measure(engine, queries, truth, args.k)
+            }
+            results.append(row)
+            print_row(row, header=len(results) == 1)
+        client.drop_collection(collection)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"settings": vars(args), "results": results}, f, indent=2)
+        print(f"wrote {args.json}")
+    return results
+
+
+def print_row(row: Dict, header: bool = False) -> None:
+    if header:
+        print(f"{'profile':<16}{'index':<10}{'param':<18}{'recall':>8}{'qps':>9}{'batch qps':>11}"
+              f"{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'build s':>9}")
+    print(f"{row['profile']:<16}{row['index_type']:<10}{row['param']:<18}{row['recall']:>8.3f}{row['qps']:>9.0f}"
+          f"{row['batch_qps']:>11.0f}{row['p50_ms']:>9.2f}{row['p95_ms']:>9.2f}{row['p99_ms']:>9.2f}"
+          f"{row['build_seconds']:>9.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", choices=["lite", "server", "local", "stub"], default="lite")
+    parser.add_argument("--uri", help="Milvus URI, a temporary Milvus Lite file by default")
+    parser.add_argument("--sweep", choices=list(SWEEPS), help="server with --backend server, exact otherwise")
+    parser.add_argument("--corpus", help=".npy or .fvecs file of corpus vectors, synthetic when omitted")
+    parser.add_argument("--query-file", help=".npy or .fvecs file of query vectors, held out of the corpus when omitted")
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--dim", type=int, default=1536, help="of the synthetic corpus, files set their own")
+    parser.add_argument("--clusters", type=int, default=1000)
+    parser.add_argument("--noise", type=float, default=2.0, help="spread of the synthetic clusters")
+    parser.add_argument("--metric", choices=["L2", "IP", "COSINE"], default="L2")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--batch-size", type=int, default=512, help="query vectors per request for batch qps")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="also write the results to this file")
+    run(parser.parse_args())
@@ -0,0 +1,57 @@
+"""Throughput (MB/s) of the PDF page text cleaner against the original multi-pass version.
+
+Run from backend/: python -m benchmarks.text_cleaner --pages 200
+"""
+import argparse
+import io
+import logging
+import re
+import time
+
+import pypdf
+
+from localrag.core.document_processor import clean_pdf_text
+from tests.utils import make_pdf
+
+
+def legacy_clean_pdf_text(text):
+    text = re.sub(r'\n\s*\n', '\n', text)
+    text = re.sub(r'(?<!\n)\n(?!\n)(?!\s*[-•\d])(?!\s*[A-Z][a-z])', ' ', text)
+    text = re.sub(r'(\w)-\n(\w)', r'\1\2', text)
+    text = ' '.join(text.split())
+    text = text.replace('. ', '.\n')
+    return text
+
+
+def measure(clean, pages, repeat):
+    size = sum(len(page.encode("utf-8")) for page in pages) * repeat
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for page in pages:
+            clean(page)
+    seconds = time.perf_counter() - start
+    return size / seconds / 1e6
+
+
+def run(page_count: int, repeat: int) -> None:
+    logging.disable(logging.INFO)
+    reader = pypdf.PdfReader(io.BytesIO(make_pdf(page_count)))
+    pages = [page.extract_text() for page in reader.pages]
+    # extracted synthetic pages never hyphenate, so mix in some wrapped hyphenation
+    pages += [page.replace(" ", "-\n", 20) for page in pages[: page_count // 4]]
+
+    assert all(clean_pdf_text(page) == legacy_clean_pdf_text(page) for page in pages)
+    legacy = measure(legacy_clean_pdf_text, pages, repeat)
+    current = measure(clean_pdf_text, pages, repeat)
+    print(f"{'cleaner':<12}{'MB/s':>10}")
+    print(f"{'legacy':<12}{legacy:>10.1f}")
+    print(f"{'current':<12}{current:>10.1f}")
+    print(f"speedup: {current / legacy:.2f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    run(args.pages, args.repeat)
@@ -1,8 +1,20 @@
 from fastapi import FastAPI
 from .config import get_settings
-from .core import bind_milvus
-from .api.routes import documents, search, chat
+from .core import bind_milvus, build_vector_client
+from .core.embedding_cache import build_embedding_cache, build_chunk_index
+from .core.embedding_batcher import RateLimiter
+from .core.client_pool import ClientPool
+from .core.metrics import LatencyTracker
+from .core.index_profiles import index_config_from_settings
+from .core.lexical_index import build_lexical_index
+from .core.answer_cache import build_answer_cache
+from .core.chat_history import build_chat_history
+from .core.document_processor import lower_worker_priority
+from .core.ingest_jobs import IngestJobManager, MongoJobStore
+from .api.routes import documents, search, chat, index
 from fastapi.middleware.cors import CORSMiddleware
+from concurrent.futures import ProcessPoolExecutor
+import asyncio
 import logging
 from .database.mongodb import db 
 
@@ -14,6 +26,30 @@ def create_app() -> FastAPI:
         description="Universal Retrieval-Augmented Generation System",
         version="0.1.0"
     )
+    app.state.embedding_cache = build_embedding_cache(settings)
+    app.state.chunk_index = build_chunk_index(settings)
+    app.state.lexical_index = build_lexical_index(settings)
+    app.state.answer_cache = build_answer_cache(settings)
+    app.state.chat_history = build_chat_history(settings)
+    app.state.embedding_rate_limiter = RateLimiter(
+        settings.embedding_requests_per_minute,
+        settings.embedding_tokens_per_minute
+    )
+    app.state.client_pool = ClientPool(
+        max_entries=settings.client_pool_max_entries,
+        idle_seconds=settings.client_pool_idle_seconds,
+        max_connections=settings.client_pool_max_connections,
+        max_keepalive_connections=settings.client_pool_keepalive_connections,
+        http2=settings.client_pool_http2
+    )
+    # time to first token and total time of streamed answers
+    app.state.search_metrics = LatencyTracker()
+    # Workers are spawned lazily on first submit
+    app.state.process_pool = ProcessPoolExecutor(
+        max_workers=settings.ingest_process_workers,
+        initializer=lower_worker_priority,
+        initargs=(settings.ingest_process_niceness,)
+    )
     app.add_middleware(
         CORSMiddleware,
         allow_origins=settings.cors_origins,
@@ -26,13 +62,50 @@ def create_app() -> FastAPI:
     async def startup_event():
         # Bind Milvus using settings
         uri = f"http://{settings.milvus_host}:{settings.milvus_port}"
-        logger.info(f"Binding Milvus to {uri}")
-        bind_milvus(app, uri, settings.milvus_collection)
+        bind_milvus(
+            app,
+            uri,
+            settings.milvus_collection,
+            client=build_vector_client(settings, uri),
+            insert_batch_size=settings.milvus_insert_batch_size,
+            insert_batch_bytes=settings.milvus_insert_batch_bytes,
+            insert_concurrency=settings.milvus_insert_concurrency,
+            insert_max_retries=settings.milvus_insert_max_retries,
+            search_batch_size=settings.milvus_search_batch_size,
+            index_config=index_config_from_settings(settings),
+        )
+        app.state.vector_db.start_watchdog(settings.milvus_load_watchdog_seconds)
+        if app.state.lexical_index is not None:
+            # loaded before the ingest workers start, so no upload lands in it twice
+            await asyncio.to_thread(
+                app.state.lexical_index.load, app.state.vector_db.iter_rows(["id", "filename", "content"])
+            )
         await db.connect_to_mongo()  
+        app.state.ingest_jobs = IngestJobManager(
+            MongoJobStore(),
+            app.state.vector_db,
+            documents.UPLOAD_DIR,
+            process_pool=app.state.process_pool,
+            chunk_index=app.state.chunk_index,
+            rate_limiter=app.state.embedding_rate_limiter,
+            client_pool=app.state.client_pool,
+            lexical_index=app.state.lexical_index,
+            answer_cache=app.state.answer_cache,
+            max_concurrent_jobs=settings.ingest_max_concurrent_jobs,
+            queue_size=settings.ingest_queue_size,
+            embed_batch_size=settings.ingest_embed_batch_size,
+            page_batch_size=settings.ingest_page_batch_size,
+            prefetch_ranges=settings.ingest_prefetch_ranges,
+        )
+        await app.state.ingest_jobs.start()
 
     @app.on_event("shutdown")
     async def shutdown_event():
+        await app.state.ingest_jobs.stop()
+        app.state.vector_db.stop_watchdog()
         await db.close_mongo_connection()  
+        await app.state.client_pool.aclose()
+        app.state.process_pool.shutdown(wait=False, cancel_futures=True)
 
     # Register API routes
     app.include_router(
@@ -52,14 +125,27 @@ def create_app() -> FastAPI:
         tags=["chat"]
     )
 
+    app.include_router(
+        index.router,
+        prefix="/api/index",
+        tags=["index"]
+    )
+
     @app.get("/health")
     async def health_check():
+        cache = app.state.embedding_cache
+        lexical_index = app.state.lexical_index
+        answer_cache = app.state.answer_cache
         return {
             "status": "healthy",
             "version": "0.1.0",
             "services": {
                 "milvus": hasattr(app.state, "vector_db")
-            }
+            },
+            "embedding_cache": cache.stats() if cache is not None else None,
+            "lexical_index": lexical_index.stats() if lexical_index is not None else None,
+            "answer_cache": answer_cache.stats() if answer_cache is not None else None,
+            "client_pool": app.state.client_pool.stats()
         }
 
     return app
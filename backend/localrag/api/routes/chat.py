@@ -1,16 +1,25 @@
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, HTTPException, Query, Request
 from ...models.chat import Chat, Message
+from ...config import get_settings
+from ...core.vector_store import get_milvus
 from ...database.mongodb import (
     create_chat,
     get_chat,
-    get_chats,
+    chat_exists,
+    get_chat_page,
+    get_chat_message_page,
     update_chat,
     delete_chat,
-    search_chats,
-    get_chat_collection
+    delete_all_chats,
+    search_chats
 )
+from typing import Dict, List, Optional, Tuple
+import asyncio
+import base64
 import logging
 from bson import ObjectId
+from bson.errors import InvalidId
+from datetime import datetime
 import json
 
 logger = logging.getLogger(__name__)
@@ -24,41 +33,58 @@ async def create_new_chat(title: str):
     return {"id": chat_id}
 
 @router.get("/")
-async def get_chat_history():
-    logger.info("Starting get_chat_history endpoint")
+async def get_chat_history(
+    limit: int = Query(50, ge=1, le=200, description="Chats per page"),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page")
+):
+    # Newest first, one page at a time and without messages; GET /{chat_id}/messages has those
+    try:
+        before = _decode_cursor(cursor) if cursor else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
     try:
-        raw_chats = await get_chats()
-        chats = []
-        for chat_doc in raw_chats:
-            try:
-                chat_doc['id'] = str(chat_doc.pop('_id'))
-                if 'messages' in chat_doc:
-                    for msg in chat_doc['messages']:
-                        if isinstance(msg.get('content'), dict):
-                            msg['content'] = json.dumps(msg['content'])
-                
-                chat = Chat(**chat_doc)
-                chats.append(chat.dict())
-                
-            except Exception as e:
-                logger.error(f"Error processing chat document: {str(e)}")
-                logger.debug(f"Problematic chat doc: {chat_doc}")
-                continue
-        return chats
+        docs = await get_chat_page(limit + 1, before)
     except Exception as e:
         logger.error(f"Error in get_chat_history: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
-    
+    chats = [
+        {
+            "id": str(doc["_id"]),
+            "title": doc.get("title", ""),
+            "last_updated": doc.get("last_updated"),
+            "message_count": doc.get("message_count", 0)
+        }
+        for doc in docs[:limit]
+    ]
+    next_cursor = _encode_cursor(docs[limit - 1]) if len(docs) > limit else None
+    return {"chats": chats, "next_cursor": next_cursor}
+
 @router.get("/search")
 async def search_chat_history(
     q: str = Query(..., description="Search query"),
-    limit: int = Query(10, ge=1, le=50, description="Maximum number of results")
+    limit: int = Query(10, ge=1, le=50, description="Maximum number of results"),
+    offset: int = Query(0, ge=0, description="next_offset of the previous page")
 ):
-    results = await search_chats(q, limit)
-    return results
+    # Called as the user types: short prefixes are answered without touching Mongo, and
+    # results come one small page at a time
+    settings = get_settings()
+    q = q.strip()
+    if len(q) < settings.chat_search_min_query_chars:
+        return {"results": [], "total": 0, "next_offset": None, "mode": "none"}
+    try:
+        return await search_chats(
+            q,
+            limit,
+            offset,
+            max_candidates=settings.chat_search_max_candidates,
+            fallback_timeout_ms=settings.chat_search_fallback_timeout_ms
+        )
+    except Exception as e:
+        logger.error(f"Error searching chats for '{q}': {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/{chat_id}")
-async def get_chat_by_id(chat_id: str):
+async def get_chat_by_id(request: Request, chat_id: str):
     try:
         chat_doc = await get_chat(chat_id)
         if not chat_doc:
@@ -70,35 +96,58 @@ async def get_chat_by_id(chat_id: str):
             for msg in chat_doc['messages']:
                 if isinstance(msg.get('content'), dict):
                     msg['content'] = json.dumps(msg['content'])
+            await _resolve_sources(request, chat_doc['messages'])
         
         chat = Chat(**chat_doc)
         return chat.dict()
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error getting chat {chat_id}: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/{chat_id}/messages")
+async def get_chat_messages(
+    request: Request,
+    chat_id: str,
+    offset: int = Query(0, ge=0, description="Index of the first message"),
+    limit: int = Query(50, ge=1, le=500, description="Messages per page")
+):
+    try:
+        chat_doc = await get_chat_message_page(chat_id, offset, limit)
+    except InvalidId:
+        raise HTTPException(status_code=404, detail="Chat not found")
+    except Exception as e:
+        logger.error(f"Error getting messages of chat {chat_id}: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+    if not chat_doc:
+        raise HTTPException(status_code=404, detail="Chat not found")
+    messages = chat_doc.get("messages", [])
+    for msg in messages:
+        if isinstance(msg.get('content'), dict):
+            msg['content'] = json.dumps(msg['content'])
+    await _resolve_sources(request, messages)
+    return {
+        "chat_id": chat_id,
+        "offset": offset,
+        "total": chat_doc.get("message_count", 0),
+        "messages": messages
+    }
+
 @router.post("/{chat_id}/messages")
 async def add_message(chat_id: str, message: Message):
-    chat = await get_chat(chat_id)
-    if not chat:
+    if not await chat_exists(chat_id):
         raise HTTPException(status_code=404, detail="Chat not found")
     
-    chat["messages"].append(message.dict())
-    chat["last_updated"] = message.created_at
-    
-    await update_chat(chat_id, {
-        "messages": chat["messages"],
-        "last_updated": chat["last_updated"]
-    })
+    await update_chat(chat_id, [message.dict()])
     return {"success": True}
 
 @router.delete("/all")
-async def delete_all_chats():
+async def delete_all_chat_history():
     try:
         logger.info("Deleting all chats")
-        collection = await get_chat_collection()
-        await collection.delete_many({})
+        await delete_all_chats()
         return {"success": True}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e)) 
@@ -115,4 +164,27 @@ async def delete_chat_by_id(chat_id: str):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+async def _resolve_sources(request: Request, messages: List[Dict]) -> None:
+    # Sources are stored as chunk references; their text comes from the vector store, in
+    # one lookup for the whole page. Chunks deleted since keep their filename and lose the text.
+    references = [
+        source for msg in messages for source in msg.get("sources") or []
+        if source.get("id") is not None and "content" not in source
+    ]
+    if not references:
+        return
+    chunks = await asyncio.to_thread(get_milvus(request.app).get_chunks, [source["id"] for source in references])
+    for source in references:
+        source["content"] = chunks.get(source["id"], {}).get("content", "")
+
+def _encode_cursor(doc: Dict) -> str:
+    # position of the last chat on a page: its last_updated and _id
+    raw = f"{doc['last_updated'].isoformat()}|{doc['_id']}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
 
+def _decode_cursor(cursor: str) -> Tuple[datetime, ObjectId]:
+    try:
+        last_updated, chat_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(last_updated), ObjectId(chat_id)
+    except Exception as e:
+        raise ValueError(f"Invalid cursor {cursor}") from e
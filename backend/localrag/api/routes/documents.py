@@ -1,6 +1,7 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException, Header, Request
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Header, Request
 from fastapi.responses import JSONResponse, FileResponse
 from pathlib import Path
+import asyncio
 import shutil
 import os
 from datetime import datetime
@@ -9,14 +10,16 @@ from typing import List
 from dotenv import load_dotenv
 from urllib.parse import unquote
 from typing import Optional
-from localrag.core.document_processor import DocumentProcessor
-from localrag.config import get_settings
+from localrag.core.chunker import Chunker
+from localrag.core.ingest_jobs import QueueFullError
+from localrag.models.ingest_job import IngestJob
+from localrag.config import get_settings, DATA_DIR
 
 load_dotenv()
 
 logger = logging.getLogger(__name__)
 
-UPLOAD_DIR = Path(__file__).parent.parent.parent.parent / "data" / "documents"
+UPLOAD_DIR = DATA_DIR / "documents"
 UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
 
 logger.info(f"Upload directory configured at: {UPLOAD_DIR.absolute()}")
@@ -45,14 +48,26 @@ async def list_documents():
         logger.error(f"Error listing documents: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.post("/upload")
+@router.post("/upload", status_code=202)
 async def upload_document(
     request: Request,
     file: UploadFile = File(...),
+    chunk_size: Optional[int] = Form(None),
+    chunk_overlap: Optional[int] = Form(None),
+    chunk_unit: Optional[str] = Form(None),
     x_openai_key: Optional[str] = Header(None, alias="X-OpenAI-Key")
 ):
     try:
         logger.info(f"Received upload request for file: {file.filename}")
+        settings = get_settings()
+        try:
+            chunker = Chunker(
+                chunk_size=chunk_size if chunk_size is not None else settings.chunk_size,
+                chunk_overlap=chunk_overlap if chunk_overlap is not None else settings.chunk_overlap,
+                unit=chunk_unit or settings.chunk_unit
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
         file_ext = Path(file.filename).suffix.lower()
         
         if file_ext not in ALLOWED_EXTENSIONS:
@@ -62,64 +77,40 @@ async def upload_document(
                 detail=f"Unsupported file type. Allowed types: {ALLOWED_EXTENSIONS}"
             )
         
-        engine = request.app.state.vector_db
+        jobs = request.app.state.ingest_jobs
 
-        processor = DocumentProcessor(x_openai_key)
-
-        file_path = UPLOAD_DIR / file.filename
         content = await file.read()
+        job = IngestJob(
+            filename=file.filename,
+            file_type=file_ext,
+            size=len(content),
+            chunk_size=chunker.chunk_size,
+            chunk_overlap=chunker.chunk_overlap,
+            chunk_unit=chunker.unit
+        )
+        # staged until the job succeeds, the document list only shows indexed files
+        file_path = jobs.staged_path(job)
         
         logger.info(f"Saving file to {file_path}")
-        with open(file_path, "wb") as f:
-            f.write(content)
+        await asyncio.to_thread(file_path.parent.mkdir, parents=True, exist_ok=True)
+        await asyncio.to_thread(file_path.write_bytes, content)
         logger.info("File saved successfully")
-        
-        try:                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                              
-            logger.info("Loading document...")
-            chunks = processor.load_document(file_path)
-            logger.info(f"Generated {len(chunks)} chunks")
-            
 
-            metadata_list = []
-            texts = []
-            filenames = []
-            for chunk in chunks:
-                metadata = {
-                    "source": file.filename,
-                    "type": file_ext,
-                    "chunk_index": chunk.get('chunk_index', 0),
-                    "page": chunk.get('page', 1),
-                    "total_pages": chunk.get('total_pages', 1),
-                    "upload_date": datetime.now().isoformat()
-                }
-                filenames.append(file.filename)
-                metadata_list.append(metadata)
-                texts.append(chunk['content'])
-            
-            logger.info("Generating embeddings...")
-            embeddings = processor.embeddings.embed_documents(texts)
-            logger.info(f"Generated {len(embeddings)} embeddings")
-            
-            logger.info("Adding to vector store...")
-            ids = engine.add(filenames, texts, embeddings, metadata_list)
-            logger.info(f"Added to vector store with IDs: {ids}")
-            
-            if not ids:
-                raise HTTPException(status_code=500, detail="Failed to add document to vector store")
-            
-            return {
-                "name": file.filename,
-                "type": file_ext,
-                "size": len(content),
-                "uploadDate": datetime.now().isoformat(),
-                "status": "success"
-            }
-            
-        except Exception as e:
-            logger.error(f"Processing error: {str(e)}", exc_info=True)
-            if file_path.exists():
-                file_path.unlink()
-            raise HTTPException(status_code=500, detail=str(e))
+        try:
+            job = await jobs.submit(job, x_openai_key)
+        except QueueFullError as e:
+            await asyncio.to_thread(shutil.rmtree, file_path.parent, ignore_errors=True)
+            raise HTTPException(status_code=503, detail=str(e))
+        logger.info(f"Queued ingest job {job.id} for {file.filename}")
+
+        return {
+            "name": file.filename,
+            "type": file_ext,
+            "size": len(content),
+            "uploadDate": datetime.now().isoformat(),
+            "status": job.status,
+            "job_id": job.id
+        }
             
     except HTTPException:
         raise
@@ -127,6 +118,29 @@ async def upload_document(
         logger.error(f"Upload error: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/jobs/{job_id}")
+async def get_ingest_job(job_id: str, request: Request):
+    job = await request.app.state.ingest_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@router.post("/jobs/{job_id}/retry", status_code=202)
+async def retry_ingest_job(
+    job_id: str,
+    request: Request,
+    x_openai_key: Optional[str] = Header(None, alias="X-OpenAI-Key")
+):
+    try:
+        job = await request.app.state.ingest_jobs.retry(job_id, x_openai_key)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except QueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
 @router.delete("/{filename}")
 async def delete_document(
     filename: str,
@@ -141,6 +155,12 @@ async def delete_document(
         logger.info(f"Deleting from vector store with filename: {filename}")
         try:
             success = engine.delete_by_filename(filename)
+            lexical_index = request.app.state.lexical_index
+            if lexical_index is not None:
+                lexical_index.remove_filename(filename)
+            answer_cache = request.app.state.answer_cache
+            if answer_cache is not None:
+                answer_cache.invalidate_filename(filename)
             if success:
                 logger.info(f"Successfully deleted document chunks from vector store")
             else:
@@ -0,0 +1,51 @@
+from fastapi import APIRouter, HTTPException, Request
+import asyncio
+import logging
+
+from localrag.config import get_settings
+from localrag.core.index_profiles import INDEX_PROFILES, resolve_index_config
+from localrag.core.vector_store import get_milvus
+from localrag.models.index import ReindexRequest
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+
+@router.get("")
+async def get_index(request: Request):
+    engine = get_milvus(request.app)
+    return {
+        "collection": engine.collection,
+        "index": engine.index_config.to_dict(),
+        "profiles": INDEX_PROFILES,
+        "reindex": engine.reindex_status
+    }
+
+@router.post("/reindex", status_code=202)
+async def reindex(body: ReindexRequest, request: Request):
+    engine = get_milvus(request.app)
+    try:
+        index_config = resolve_index_config(
+            body.profile, body.index_type, body.metric_type, body.build_params, body.search_params
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if engine.reindex_running:
+        raise HTTPException(status_code=409, detail="A reindex is already running")
+
+    # Runs in the background, searches and uploads keep going against the current index
+    # until the rebuilt one is swapped in; progress is reported by GET /api/index
+    settings = get_settings()
+    task = asyncio.create_task(asyncio.to_thread(
+        engine.reindex, index_config, settings.milvus_reindex_batch_size, settings.milvus_reindex_drain_seconds
+    ))
+    task.add_done_callback(_log_failure)
+    request.app.state.reindex_task = task
+    logger.info(f"Started reindex of {engine.collection} with {index_config}")
+    return {"status": "accepted", "index": index_config.to_dict()}
+
+def _log_failure(task: asyncio.Task) -> None:
+    # the engine already logged the details and recorded them in reindex_status
+    if not task.cancelled() and task.exception() is not None:
+        logger.warning(f"Reindex task ended with: {task.exception()}")
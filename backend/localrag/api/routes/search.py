@@ -1,11 +1,20 @@
 from fastapi import APIRouter, HTTPException, Request, Header
+from fastapi.responses import StreamingResponse
+from ...core.answer_stream import JsonStringFieldStreamer
 from ...core.document_processor import DocumentProcessor
+from ...core.lexical_index import reciprocal_rank_fusion
+from ...core.reranker import build_reranker
+from ...core.answer_cache import chunk_ids
+import asyncio
 import logging
+import time
 from datetime import datetime
 import json
-from ...database.mongodb import create_chat, get_chat, update_chat
-from typing import Optional
+from ...database.mongodb import create_chat, update_chat
+from typing import Dict, List, Optional, Tuple
 from ...core.web_search import WebSearchEngine
+from ...config import get_settings
+from ...models.search import BatchSearchRequest
 
 
 router = APIRouter()
@@ -23,76 +32,389 @@ async def search_documents(
     with_web: Optional[bool] = Header(None, alias="X-Enable-Web-Search")
 ):
     try:
-        references = query.get('references', [])
-        logger.info(f"References: {references}")
-        web_results = []
-        search_results = []
+        processor, search_results, web_results, messages, query_embedding = await _prepare_answer(
+            request, query, x_openai_key, x_exa_key, with_web
+        )
+        cache_context = _answer_cache_context(request, query, with_web, web_results, query_embedding, search_results)
+        cached = _cached_answer(request, cache_context, x_openai_model)
+        if cached is not None:
+            response_content, search_results = cached
+        else:
+            completion = await processor.async_client.chat.completions.create(
+                model=x_openai_model,
+                messages=messages,
+                temperature=0.7,
+                response_format={ "type": "json_object" }
+            )
+
+            response_content = json.loads(completion.choices[0].message.content)
+            _cache_answer(request, cache_context, x_openai_model, response_content, search_results)
+
+        logger.info(f"Response content: {response_content}")
+        
+        chat_id = await _save_exchange(
+            query,
+            response_content["answer"],
+            search_results,
+            web_results,
+            response_content.get("used_context", False),
+            response_content.get("used_web", False)
+        )
+        _update_history_summary(request, query, processor, x_openai_model)
         
+        return {
+            "chat_id": str(chat_id),
+            "answer": response_content["answer"].strip(),
+            "sources": search_results if response_content.get("used_context", False) else [],
+            "web_sources": web_results if response_content.get("used_web", False) else [],
+            "cached": cached is not None
+        }
+        
+    except Exception as e:
+        logger.error(f"Search error: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/search/stream")
+async def stream_search_documents(
+    request: Request,
+    query: dict,
+    x_openai_key: Optional[str] = Header(None, alias="X-OpenAI-Key"),
+    x_openai_model: Optional[str] = Header(None, alias="X-OpenAI-Model"),
+    x_exa_key: Optional[str] = Header(None, alias="X-Exa-Key"),
+    with_web: Optional[bool] = Header(None, alias="X-Enable-Web-Search")
+):
+    started = time.perf_counter()
+    if not query.get('initial', False) and not query.get('chatId'):
+        raise HTTPException(status_code=400, detail="Missing chatId for follow-up question")
+    try:
+        processor, search_results, web_results, messages, query_embedding = await _prepare_answer(
+            request, query, x_openai_key, x_exa_key, with_web
+        )
+        cache_context = _answer_cache_context(request, query, with_web, web_results, query_embedding, search_results)
+        cached = _cached_answer(request, cache_context, x_openai_model)
+        if cached is not None:
+            search_results = cached[1]
+    except Exception as e:
+        logger.error(f"Search error: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+    metrics = request.app.state.search_metrics
+    metrics.record("retrieval", time.perf_counter() - started)
+
+    async def events():
+        yield _sse("retrieval", {"sources": search_results, "web_sources": web_results})
+        streamer = JsonStringFieldStreamer("answer")
+        content = ""
+        first_token = None
+        try:
+            if cached is not None:
+                response_content = cached[0]
+                yield _sse("token", {"text": response_content["answer"].strip()})
+            else:
+                stream = await processor.async_client.chat.completions.create(
+                    model=x_openai_model,
+                    messages=messages,
+                    temperature=0.7,
+                    response_format={ "type": "json_object" },
+                    stream=True
+                )
+                async for chunk in stream:
+                    if not chunk.choices or not chunk.choices[0].delta.content:
+                        continue
+                    delta = chunk.choices[0].delta.content
+                    content += delta
+                    text = streamer.feed(delta)
+                    if text:
+                        if first_token is None:
+                            first_token = time.perf_counter() - started
+                            metrics.record("ttft", first_token)
+                        yield _sse("token", {"text": text})
+
+                response_content = json.loads(content)
+                _cache_answer(request, cache_context, x_openai_model, response_content, search_results)
+            logger.info(f"Response content: {response_content}")
+            used_context = response_content.get("used_context", False)
+            used_web = response_content.get("used_web", False)
+            chat_id = await _save_exchange(
+                query, response_content["answer"], search_results, web_results, used_context, used_web
+            )
+            _update_history_summary(request, query, processor, x_openai_model)
+            total = time.perf_counter() - started
+            metrics.record("total", total)
+            yield _sse("done", {
+                "chat_id": str(chat_id),
+                "answer": response_content["answer"].strip(),
+                "sources": search_results if used_context else [],
+                "web_sources": web_results if used_web else [],
+                "ttft_ms": round(first_token * 1000, 1) if first_token is not None else None,
+                "total_ms": round(total * 1000, 1),
+                "cached": cached is not None
+            })
+        except Exception as e:
+            logger.error(f"Streaming search error: {str(e)}", exc_info=True)
+            yield _sse("error", {"detail": str(e)})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.post("/search/batch")
+async def batch_search_documents(
+    request: Request,
+    batch: BatchSearchRequest,
+    x_openai_key: Optional[str] = Header(None, alias="X-OpenAI-Key")
+):
+    settings = get_settings()
+    if (batch.queries is None) == (batch.embeddings is None):
+        raise HTTPException(status_code=400, detail="Provide either queries or embeddings")
+    count = len(batch.queries if batch.queries is not None else batch.embeddings)
+    if count > settings.search_batch_max_queries:
+        raise HTTPException(
+            status_code=413,
+            detail=f"At most {settings.search_batch_max_queries} queries per batch, got {count}"
+        )
+    try:
         engine = request.app.state.vector_db
-        web_search = WebSearchEngine(x_openai_key, x_exa_key) if with_web or any(ref['type'] == 'web' for ref in references) else None
-        processor = DocumentProcessor(x_openai_key)
-        query_embedding = await processor.get_embedding(query['query'])
-        exclude = []
-        web_need = False
-
-        if references:
-            for ref in references:
-                if ref['type'] == 'web' and web_search:
-                    web_result = await web_search.search_url([ref['source']])
-                    if web_result:
-                        web_results.extend(web_result)
-                elif ref['type'] == 'file':
-                    file_results = engine.similarity_search(
-                        query_embedding=query_embedding,
-                        metadata_filter=f'filename == "{ref["source"]}"'
-                    )
-                    exclude.extend(ref['source'])
-                    if file_results:
-                        search_results.extend(file_results)
+        embeddings = batch.embeddings
+        if embeddings is None:
+            processor = DocumentProcessor(
+                x_openai_key, request.app.state.embedding_cache, client_pool=request.app.state.client_pool
+            )
+            embeddings = await processor.embed_queries(batch.queries)
+        if batch.filenames:
+            results = await asyncio.to_thread(engine.search_files, embeddings, batch.filenames, batch.limit)
+            hits_key = "files"
+        else:
+            results = await asyncio.to_thread(engine.batch_similarity_search, embeddings, batch.limit)
+            hits_key = "hits"
+        logger.info(f"Batch search answered {count} queries")
+        return {
+            "results": [
+                {"query": batch.queries[i] if batch.queries is not None else i, hits_key: result}
+                for i, result in enumerate(results)
+            ]
+        }
+    except Exception as e:
+        logger.error(f"Batch search error: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
 
+@router.get("/search/metrics")
+async def search_metrics(request: Request):
+    return request.app.state.search_metrics.summary()
 
+
+async def _prepare_answer(
+    request: Request,
+    query: dict,
+    x_openai_key: Optional[str],
+    x_exa_key: Optional[str],
+    with_web: Optional[bool]
+) -> Tuple[DocumentProcessor, List[Dict], List[Dict], List[Dict], List[float]]:
+    settings = get_settings()
+    references = query.get('references', [])
+    logger.info(f"References: {references}")
+    
+    engine = request.app.state.vector_db
+    client_pool = request.app.state.client_pool
+    web_search = WebSearchEngine(x_openai_key, x_exa_key, client_pool) if with_web or any(ref['type'] == 'web' for ref in references) else None
+    processor = DocumentProcessor(x_openai_key, request.app.state.embedding_cache, client_pool=client_pool)
+    file_refs = [ref for ref in references if ref['type'] == 'file']
+    web_refs = [ref for ref in references if ref['type'] == 'web'] if web_search else []
+
+    lexical_index = request.app.state.lexical_index
+    # Hybrid retrieval also ranks chunks by BM25, which catches the exact identifiers,
+    # error codes and names that embeddings blur, and fuses both rankings
+    hybrid = query.get('hybrid', settings.search_hybrid_default) and lexical_index is not None and lexical_index.ready
+    # Reranking over-fetches candidates, with their vectors for the duplicate check, and
+    # keeps what fits the context token budget instead of every hit of every source
+    rerank = query.get('rerank', settings.search_rerank_default)
+    limit = settings.search_rerank_candidates if rerank else 5
+    filenames = [ref['source'] for ref in file_refs]
+
+    async def vector_results() -> Tuple[List[float], Dict[str, List[Dict]], List[Dict]]:
+        query_embedding = await processor.get_embedding(query['query'])
+        # Referenced files are searched in one request. The unscoped search only counts when they
+        # return fewer than 3 hits, but it is started alongside so the branch costs one round trip.
+        file_search = _with_timeout(
+            asyncio.to_thread(engine.search_files, [query_embedding], filenames, limit, rerank),
+            settings.search_vector_timeout_seconds,
+            f"Vector search [{len(filenames)} files]",
+            [{}]
+        ) if filenames else _no_results([{}])
+        per_file, unscoped = await asyncio.gather(
+            file_search,
+            _vector_search(engine, query_embedding, "", settings.search_vector_timeout_seconds, limit, rerank)
+        )
+        return query_embedding, per_file[0], unscoped
+
+    async def document_results() -> Tuple[List[float], List[Dict]]:
+        lexical_search = _with_timeout(
+            asyncio.to_thread(_lexical_search, lexical_index, engine, query['query'], filenames, limit),
+            settings.search_vector_timeout_seconds,
+            "Lexical search",
+            None
+        ) if hybrid else _no_results(None)
+        (query_embedding, per_file, unscoped), lexical = await asyncio.gather(vector_results(), lexical_search)
+        if lexical is not None:
+            lexical_per_file, lexical_unscoped = lexical
+            per_file = {
+                filename: reciprocal_rank_fusion(
+                    [per_file.get(filename, []), lexical_per_file.get(filename, [])], limit, settings.hybrid_rrf_k
+                )
+                for filename in filenames
+            }
+            unscoped = reciprocal_rank_fusion([unscoped, lexical_unscoped], limit, settings.hybrid_rrf_k)
+        search_results = [result for filename in filenames for result in per_file.get(filename, [])]
         if not references or len(search_results) < 3:
-            additional_results = engine.similarity_search(query_embedding=query_embedding)
-            search_results.extend(additional_results)
+            search_results.extend(unscoped)
+        if rerank:
+            started = time.perf_counter()
+            search_results = await asyncio.to_thread(build_reranker(settings).rerank, query_embedding, search_results)
+            request.app.state.search_metrics.record("rerank", time.perf_counter() - started)
+        return query_embedding, search_results
 
+    async def url_results() -> List[Dict]:
+        fetched = await asyncio.gather(*(
+            _with_timeout(web_search.search_url([ref['source']]), settings.search_web_timeout_seconds, f"Fetching {ref['source']}", [])
+            for ref in web_refs
+        ))
+        return [result for results in fetched for result in results]
 
+    # Retrieval branches run concurrently, so latency is the slowest branch rather than the sum
+    (query_embedding, search_results), web_results, chat_history = await asyncio.gather(
+        document_results(),
+        url_results(),
+        _with_timeout(_load_chat_history(request, query), settings.search_history_timeout_seconds, "Loading chat history", "")
+    )
 
-        context = "\n\n".join([result["content"] for result in search_results])
-        user_defined_web_context = "\n\n".join([result["text"] for result in web_results])
+    context = "\n\n".join([result["content"] for result in search_results])
+    user_defined_web_context = "\n\n".join([result["text"] for result in web_results])
 
-        if with_web and not any(ref['type'] == 'web' for ref in references):
-            web_need = await web_search.web_needed(query['query'], context, user_defined_web_context)
-            if web_need:
-                additional_web_results = await web_search.search_web(query['query'])
-                web_results.extend(additional_web_results)
+    if with_web and not any(ref['type'] == 'web' for ref in references):
+        web_need = await _with_timeout(
+            web_search.web_needed(query['query'], context, user_defined_web_context),
+            settings.search_web_timeout_seconds,
+            "Deciding on web search",
+            False
+        )
+        if web_need:
+            additional_web_results = await _with_timeout(
+                web_search.search_web(query['query']), settings.search_web_timeout_seconds, "Web search", []
+            )
+            web_results.extend(additional_web_results)
 
-        web_ctx = "\n\n".join([result["text"] for result in web_results])
-        
-        
-        
-        chat_history = ""
-        chat_id = None
-        if not query.get('initial', False) and 'chatId' in query and query['chatId']:
-            try:
-                chat = await get_chat(query['chatId'])
-                chat_id = query['chatId']
-                for msg in chat["messages"]:
-                    role = "User" if msg["role"] == "user" else "Assistant"
-                    chat_history += f"{role}: {msg['content']}\n"
-                chat_history = f"\nPrevious conversation:\n{chat_history}\n"
-            except Exception as e:
-                logger.error(f"Error getting chat history: {e}")
-                pass
-        
-        
-        context = "\n\n".join([result["content"] for result in search_results])
-        
-        web_ctx = "\n\n".join([result["text"] for result in web_results])
+    web_ctx = "\n\n".join([result["text"] for result in web_results])
+
+    messages = _build_messages(query, chat_history, context, web_ctx, web_results)
+    return processor, search_results, web_results, messages, query_embedding
+
+
+def _answer_cache_context(
+    request: Request, query: dict, with_web: Optional[bool], web_results: List[Dict], query_embedding: List[float], search_results: List[Dict]
+) -> Optional[Tuple[List[float], frozenset]]:
+    # Only answers that depend on nothing but the question and the retrieved chunks are
+    # cached: follow-ups also see the chat so far, and web results change between requests
+    if request.app.state.answer_cache is None or with_web or web_results:
+        return None
+    if not query.get('initial', False) and query.get('chatId'):
+        return None
+    return query_embedding, chunk_ids(search_results)
+
+
+def _cached_answer(request: Request, cache_context, model: Optional[str]) -> Optional[Tuple[Dict, List[Dict]]]:
+    if cache_context is None:
+        return None
+    query_embedding, chunks = cache_context
+    entry = request.app.state.answer_cache.get(query_embedding, chunks, model or "")
+    if entry is None:
+        return None
+    logger.info(f"Answered from the answer cache ({len(chunks)} chunks)")
+    return entry["response"], entry["sources"]
+
+
+def _cache_answer(request: Request, cache_context, model: Optional[str], response_content: Dict, search_results: List[Dict]) -> None:
+    if cache_context is None:
+        return
+    query_embedding, chunks = cache_context
+    request.app.state.answer_cache.set(
+        query_embedding,
+        chunks,
+        {result['filename'] for result in search_results if result.get('filename')},
+        {"response": response_content, "sources": search_results},
+        model or ""
+    )
+
+
+async def _vector_search(
+    engine, query_embedding: List[float], metadata_filter: str, timeout: float, limit: int = 5, output_vectors: bool = False
+) -> List[Dict]:
+    search = asyncio.to_thread(
+        engine.similarity_search,
+        query_embedding=query_embedding,
+        limit=limit,
+        metadata_filter=metadata_filter,
+        output_vectors=output_vectors
+    )
+    return await _with_timeout(search, timeout, f"Vector search [{metadata_filter or 'all documents'}]", [])
+
+
+def _lexical_search(lexical_index, engine, text: str, filenames: List[str], limit: int) -> Tuple[Dict[str, List[Dict]], List[Dict]]:
+    per_file = lexical_index.search_files(text, filenames, limit) if filenames else {}
+    unscoped = lexical_index.search(text, limit)
+    # The index keeps no chunk text, so it is fetched for the hits in one lookup. Hits
+    # without an id, or whose chunk was deleted since, are dropped.
+    rankings = list(per_file.values()) + [unscoped]
+    chunks = engine.get_chunks([hit["id"] for hits in rankings for hit in hits if "id" in hit])
+
+    def with_content(hits: List[Dict]) -> List[Dict]:
+        return [{**hit, "content": chunks[hit["id"]]["content"]} for hit in hits if hit.get("id") in chunks]
+
+    return {filename: with_content(hits) for filename, hits in per_file.items()}, with_content(unscoped)
 
-        if query.get('initial', False):
-            if web_results:
-                 messages = [
-                    {"role": "system", "content": """You are a helpful assistant who give credit to the sources you used to answer the question. You have access to some web sources, which you can assume are part of your internal knowledge. 
+
+async def _no_results(default):
+    return default
+
+
+async def _with_timeout(awaitable, timeout: float, source: str, default):
+    # A slow source is dropped from the answer instead of holding up the whole request
+    try:
+        return await asyncio.wait_for(awaitable, timeout)
+    except asyncio.TimeoutError:
+        logger.warning(f"{source} timed out after {timeout}s, continuing without it")
+        return default
+
+
+async def _load_chat_history(request: Request, query: dict) -> str:
+    if not query.get('initial', False) and 'chatId' in query and query['chatId']:
+        try:
+            return await request.app.state.chat_history.load(query['chatId'])
+        except Exception as e:
+            logger.error(f"Error getting chat history: {e}")
+    return ""
+
+
+def _update_history_summary(request: Request, query: dict, processor: DocumentProcessor, model: Optional[str]) -> None:
+    # a first question leaves nothing to summarize yet
+    if not query.get('initial', False) and query.get('chatId'):
+        request.app.state.chat_history.schedule_update(
+            query['chatId'], processor.async_client, get_settings().chat_summary_model or model
+        )
+
+
+def _sse(event: str, data: Dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+def _build_messages(query: dict, chat_history: str, context: str, web_ctx: str, web_results: List[Dict]) -> List[Dict]:
+    if query.get('initial', False):
+        if web_results:
+             messages = [
+                {"role": "system", "content": """You are a helpful assistant who give credit to the sources you used to answer the question. You have access to some web sources, which you can assume are part of your internal knowledge. 
                     Analyze if the additional context is needed to answer the question. If the question can be answered without addiitonal context (like greetings or general queries), 
                     ignore the context completely.
                     
@@ -103,11 +425,11 @@ async def search_documents(
                         "used_context": boolean (true/false) indicating if you used the document context for your answer
                         
                     }"""},
-                    {"role": "user", "content": f"Web context:\n{web_ctx}\n\nDocument context:\n{context}\n\nQuestion: {query['query']}\n\nAnswer in the specified JSON format:"}
-                ]
-            else:
-                messages = [
-                    {"role": "system", "content": """You are a helpful assistant who give credit to the sources you used to answer the question. Analyze if the provided context is needed to answer the question.
+                {"role": "user", "content": f"Web context:\n{web_ctx}\n\nDocument context:\n{context}\n\nQuestion: {query['query']}\n\nAnswer in the specified JSON format:"}
+            ]
+        else:
+            messages = [
+                {"role": "system", "content": """You are a helpful assistant who give credit to the sources you used to answer the question. Analyze if the provided context is needed to answer the question.
                     If the question can be answered without the context (like greetings or general queries), ignore the context completely.
                     
                     Your response should be in JSON format:
@@ -115,12 +437,12 @@ async def search_documents(
                         "answer": "your response to the user, answer should be a string/plain text, not dictionary or json format, you should always take advantage of markdown formatting for better readability",
                         "used_context": boolean (true/false) indicating if you used the context for your answer
                     }"""},
-                    {"role": "user", "content": f"Context:\n{context}\n\nQuestion: {query['query']}\n\nAnswer in the specified JSON format:"}
-                ]
-        else:
-            if web_results:
-                messages = [
-                    {"role": "system", "content": """You are a helpful assistant who give credit to the sources (not the conversation history) you used to answer the question. You have access to both previous conversation history and some web sources, 
+                {"role": "user", "content": f"Context:\n{context}\n\nQuestion: {query['query']}\n\nAnswer in the specified JSON format:"}
+            ]
+    else:
+        if web_results:
+            messages = [
+                {"role": "system", "content": """You are a helpful assistant who give credit to the sources (not the conversation history) you used to answer the question. You have access to both previous conversation history and some web sources, 
                     which you can assume are part of your internal knowledge. Use the conversation history to maintain continuity in the discussion.
                     Analyze if the additional context is needed to answer the question and indicate this in your response.
                     If the question can be answered without additional context (like greetings or general queries), ignore the context completely.
@@ -131,11 +453,11 @@ async def search_documents(
                         "used_web": boolean (true/false) indicating if you used the web context for your answer
                         "used_context": boolean (true/false) indicating if you used the document context for your answer
                     }"""},
-                    {"role": "user", "content": f"Conversation history:\n{chat_history}\n\nWeb context:\n{web_ctx}\n\nDocument context:\n{context}\n\nQuestion: {query['query']}\n\nAnswer in the specified JSON format:"}
-                ]
-            else:
-                messages = [
-                    {"role": "system", "content": """You are a helpful assistant who give credit to the sources (not the conversation history) you used to answer the question. You have access to both previous conversation history and additional context.
+                {"role": "user", "content": f"Conversation history:\n{chat_history}\n\nWeb context:\n{web_ctx}\n\nDocument context:\n{context}\n\nQuestion: {query['query']}\n\nAnswer in the specified JSON format:"}
+            ]
+        else:
+            messages = [
+                {"role": "system", "content": """You are a helpful assistant who give credit to the sources (not the conversation history) you used to answer the question. You have access to both previous conversation history and additional context.
                     Use the conversation history to maintain continuity in the discussion and you can assume this is your knowledge.
                     For the additional context, analyze if it is needed to answer the question and indicate this in your response.
                     
@@ -144,43 +466,24 @@ async def search_documents(
                     "answer": "your response to the user, answer should be a string/plain text, not dictionary or json format, you should always take advantage of markdown formatting for better readability",
                     "used_context": boolean (true/false) indicating if you used the additional context for your answer (not the conversation history, if you used the conversation history, it should be false)
                 }"""},
-                {"role": "user", "content": f"Conversation history:\n{chat_history}\n\nAdditional context:\n{context}\n\nQuestion: {query['query']}\n\nAnswer in the specified JSON format:"}
-            ]
-        completion = processor.client.chat.completions.create(
-            model=x_openai_model,
-            messages=messages,
-            temperature=0.7,
-            response_format={ "type": "json_object" }
-        )
-        
-        response_content = json.loads(completion.choices[0].message.content)
-        
-        logger.info(f"Response content: {response_content}")
-        
-        if query.get('initial', False):
-            chat = {
-                "title": query["query"][:50] + "...",
-                "messages": [
-                    {
-                        "role": "user",
-                        "content": query["query"],
-                        "created_at": datetime.utcnow()
-                    },
-                    {
-                        "role": "assistant",
-                        "content": response_content["answer"],
-                        "sources": search_results if response_content.get("used_context", False) else [],
-                        "web_sources": web_results if response_content.get("used_web", False) else [],
-                        "created_at": datetime.utcnow()
-                    }
-                ],
-                "last_updated": datetime.utcnow()
-            }
-            logger.info(f"HERE IS THE CHAT before creating: {chat}")
-            chat_id = await create_chat(chat)
-        elif 'chatId' in query and query['chatId']:
-            chat_id = query['chatId']
-            new_messages = [
+            {"role": "user", "content": f"Conversation history:\n{chat_history}\n\nAdditional context:\n{context}\n\nQuestion: {query['query']}\n\nAnswer in the specified JSON format:"}
+        ]
+    return messages
+
+
+async def _save_exchange(
+    query: dict,
+    answer: str,
+    search_results: List[Dict],
+    web_results: List[Dict],
+    used_context: bool,
+    used_web: bool
+) -> Optional[str]:
+    chat_id = None
+    if query.get('initial', False):
+        chat = {
+            "title": query["query"][:50] + "...",
+            "messages": [
                 {
                     "role": "user",
                     "content": query["query"],
@@ -188,23 +491,33 @@ async def search_documents(
                 },
                 {
                     "role": "assistant",
-                    "content": response_content["answer"],
-                    "sources": search_results if response_content.get("used_context", False) else [],
-                    "web_sources": web_results if response_content.get("used_web", False) else [],
+                    "content": answer,
+                    "sources": search_results if used_context else [],
+                    "web_sources": web_results if used_web else [],
                     "created_at": datetime.utcnow()
                 }
-            ]
-            await update_chat(chat_id, new_messages)
-        else:
-            raise HTTPException(status_code=400, detail="Missing chatId for follow-up question")
-        
-        return {
-            "chat_id": str(chat_id),
-            "answer": response_content["answer"].strip(),
-            "sources": search_results if response_content.get("used_context", False) else [],
-            "web_sources": web_results if response_content.get("used_web", False) else []
+            ],
+            "last_updated": datetime.utcnow()
         }
-        
-    except Exception as e:
-        logger.error(f"Search error: {str(e)}", exc_info=True)
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        logger.info(f"HERE IS THE CHAT before creating: {chat}")
+        chat_id = await create_chat(chat)
+    elif 'chatId' in query and query['chatId']:
+        chat_id = query['chatId']
+        new_messages = [
+            {
+                "role": "user",
+                "content": query["query"],
+                "created_at": datetime.utcnow()
+            },
+            {
+                "role": "assistant",
+                "content": answer,
+                "sources": search_results if used_context else [],
+                "web_sources": web_results if used_web else [],
+                "created_at": datetime.utcnow()
+            }
+        ]
+        await update_chat(chat_id, new_messages)
+    else:
+        raise HTTPException(status_code=400, detail="Missing chatId for follow-up question")
+    return chat_id
@@ -1,6 +1,10 @@
 from pydantic_settings import BaseSettings
 from pydantic import ConfigDict
 from functools import lru_cache
+from pathlib import Path
+from typing import Optional
+
+DATA_DIR = Path(__file__).parent.parent / "data"
 
 class Settings(BaseSettings):
 
@@ -8,6 +12,126 @@ class Settings(BaseSettings):
     milvus_port: int = 19530
     milvus_collection: str = "documents"
 
+    # "milvus" for a Milvus server, "local" for the in-process store kept under local_vector_path
+    # (in memory when unset); the milvus_* collection and index settings apply to both
+    vector_backend: str = "milvus"
+    local_vector_path: Optional[str] = str(DATA_DIR / "vectors")
+    local_vector_segment_rows: int = 8192
+
+    # Bulk insert settings
+    milvus_insert_batch_size: int = 256
+    milvus_insert_batch_bytes: int = 4 * 1024 * 1024
+    milvus_insert_concurrency: int = 4
+    milvus_insert_max_retries: int = 3
+    # how often the collection's load state is checked in the background, 0 disables the check
+    milvus_load_watchdog_seconds: float = 30
+
+    # Vector index: a profile from core/index_profiles.py (default, exact, low_latency,
+    # memory_lean, memory_lean_pq, disk) with optional overrides. Applies to new collections,
+    # an existing one keeps its index until POST /api/index/reindex rebuilds it.
+    milvus_index_profile: str = "default"
+    milvus_index_type: Optional[str] = None
+    milvus_metric_type: Optional[str] = None
+    milvus_index_build_params: dict = {}
+    milvus_index_search_params: dict = {}
+    # rows copied per request while reindexing, and how long the old collection is kept
+    # for searches already running on it once the new one is swapped in
+    milvus_reindex_batch_size: int = 1000
+    milvus_reindex_drain_seconds: float = 2
+
+    # Query embedding cache; the on-disk tier is only used when a path is set
+    embedding_cache_enabled: bool = True
+    embedding_cache_max_entries: int = 10000
+    embedding_cache_disk_max_entries: int = 100000
+    embedding_cache_ttl_seconds: int = 7 * 24 * 3600
+    embedding_cache_path: Optional[str] = None
+
+    # Content-addressed index of chunk text -> embedding used to skip re-embedding on upload;
+    # in memory only unless a path is set, e.g. data/chunk_embeddings.sqlite to keep it across restarts
+    chunk_index_enabled: bool = True
+    chunk_index_memory_entries: int = 20000
+    chunk_index_max_entries: int = 1000000
+    chunk_index_path: Optional[str] = None
+
+    # Worker processes used for parsing and chunking uploads off the event loop
+    ingest_process_workers: int = 2
+    ingest_process_niceness: int = 10
+
+    # Background ingestion queue
+    ingest_max_concurrent_jobs: int = 2
+    ingest_queue_size: int = 100
+    ingest_embed_batch_size: int = 512
+    ingest_page_batch_size: int = 32
+    # page ranges extracted in parallel per job, usually matched to ingest_process_workers
+    ingest_prefetch_ranges: int = 2
+
+    # Embedding endpoint quota shared by all ingest jobs; requests are packed by token count
+    embedding_requests_per_minute: int = 3000
+    embedding_tokens_per_minute: int = 1000000
+
+    # Shared OpenAI/Exa clients, keyed by a hash of the API key and dropped when idle
+    client_pool_max_entries: int = 64
+    client_pool_idle_seconds: int = 600
+    client_pool_max_connections: int = 100
+    client_pool_keepalive_connections: int = 20
+    # None enables HTTP/2 when the h2 package is installed
+    client_pool_http2: Optional[bool] = None
+
+    # Per-source timeouts for the search route's retrieval fan-out; a source that times out is skipped
+    search_vector_timeout_seconds: float = 10
+    search_web_timeout_seconds: float = 20
+    search_history_timeout_seconds: float = 5
+    # query vectors per Milvus search request, and the cap for /api/search/batch
+    milvus_search_batch_size: int = 512
+    search_batch_max_queries: int = 10000
+
+    # BM25 index over chunk text, rebuilt from the vector store at startup. Hybrid searches fuse
+    # its ranking with the vector search's by reciprocal rank; requests opt in with "hybrid"
+    lexical_index_enabled: bool = True
+    search_hybrid_default: bool = False
+    hybrid_rrf_k: int = 60
+    bm25_k1: float = 1.2
+    bm25_b: float = 0.75
+
+    # Optional rerank of the retrieved chunks before they go into the prompt: candidates are
+    # over-fetched, near-duplicates dropped and the rest ordered by MMR until the chunk limit
+    # or the context token budget is reached; requests opt in with "rerank"
+    search_rerank_default: bool = False
+    search_rerank_candidates: int = 20
+    search_rerank_limit: int = 8
+    search_rerank_dedup_similarity: float = 0.95
+    search_rerank_mmr_lambda: float = 0.7
+    search_rerank_budget_ms: float = 50
+    search_context_token_budget: int = 3000
+
+    # Answers reused for a near-identical question (cosine >= answer_cache_min_similarity of the
+    # query embeddings) that retrieved the same chunks; only questions asked without chat
+    # history or web context are cached
+    answer_cache_enabled: bool = True
+    answer_cache_max_entries: int = 1000
+    answer_cache_ttl_seconds: int = 3600
+    answer_cache_min_similarity: float = 0.97
+
+    # Follow-ups see the last chat_history_messages messages and a rolling summary of the earlier
+    # ones, extended in the background once chat_summary_batch_messages more have left the window
+    chat_history_messages: int = 10
+    chat_history_token_budget: int = 2000
+    chat_summary_batch_messages: int = 6
+    # model writing the summaries, the one answering the request when unset
+    chat_summary_model: Optional[str] = None
+
+    # Chat search ranks by the Mongo text indexes; queries shorter than chat_search_min_query_chars
+    # return nothing, and the regex fallback for fragments the text index misses is cut off
+    # after chat_search_fallback_timeout_ms
+    chat_search_min_query_chars: int = 2
+    chat_search_max_candidates: int = 200
+    chat_search_fallback_timeout_ms: int = 500
+
+    # Default chunking for uploads, overridable per upload; unit is "chars" or "tokens"
+    chunk_size: int = 1000
+    chunk_overlap: int = 200
+    chunk_unit: str = "chars"
+
     api_port: int = 8000
     cors_origins: list[str] = ["http://localhost:3000"]
 
@@ -1 +1 @@
-from .vector_store import bind_milvus, get_milvus, UragEngine
\ No newline at end of file
+from .vector_store import bind_milvus, build_vector_client, get_milvus, UragEngine, BulkInsertError, ReindexError
\ No newline at end of file
@@ -0,0 +1,134 @@
+from collections import OrderedDict, defaultdict
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+import hashlib
+import logging
+import threading
+import time
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def chunk_ids(hits: Iterable[Dict]) -> FrozenSet[str]:
+    # vector store ids, or a content hash for hits that come without one
+    return frozenset(
+        str(hit["id"]) if hit.get("id") is not None
+        else hashlib.sha1(f"{hit.get('filename')}\x00{hit['content']}".encode("utf-8")).hexdigest()
+        for hit in hits
+    )
+
+
+class AnswerCache:
+    """Answers to earlier questions, reused for a new question that is close in embedding space
+    and retrieved exactly the same chunks.
+
+    Entries are grouped by (scope, chunk set), so a lookup only compares the query against
+    the few earlier questions that saw the same context. Eviction is LRU with a TTL, and every
+    entry is dropped once a document it drew on is deleted or uploaded again.
+    """
+
+    def __init__(self, max_entries: int = 1000, ttl_seconds: Optional[float] = 3600, min_similarity: float = 0.97) -> None:
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.min_similarity = min_similarity
+        # entry id -> (expires_at, unit query vector, context key, filenames, value)
+        self._entries: "OrderedDict[int, Tuple[float, np.ndarray, Tuple, FrozenSet[str], Dict]]" = OrderedDict()
+        self._by_context: Dict[Tuple, Set[int]] = defaultdict(set)
+        self._by_filename: Dict[str, Set[int]] = defaultdict(set)
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, query_embedding: List[float], chunks: FrozenSet[str], scope: str = "") -> Optional[Dict]:
+        query = _unit(query_embedding)
+        now = time.time()
+        with self._lock:
+            best, best_similarity = None, self.min_similarity
+            for entry_id in list(self._by_context.get((scope, chunks), ())):
+                expires_at, vector, _, _, _ = self._entries[entry_id]
+                if expires_at and expires_at < now:
+                    self._remove(entry_id)
+                    continue
+                similarity = float(vector @ query)
+                if similarity >= best_similarity:
+                    best, best_similarity = entry_id, similarity
+            if best is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(best)
+            return self._entries[best][4]
+
+    def set(self, query_embedding: List[float], chunks: FrozenSet[str], filenames: Iterable[str], value: Dict, scope: str = "") -> None:
+        expires_at = time.time() + self.ttl_seconds if self.ttl_seconds else 0.0
+        filenames = frozenset(filenames)
+        with self._lock:
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = (expires_at, _unit(query_embedding), (scope, chunks), filenames, value)
+            self._by_context[(scope, chunks)].add(entry_id)
+            for filename in filenames:
+                self._by_filename[filename].add(entry_id)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate_filename(self, filename: str) -> int:
+        with self._lock:
+            entry_ids = self._by_filename.pop(filename, set())
+            for entry_id in entry_ids:
+                self._remove(entry_id)
+            self.invalidations += len(entry_ids)
+        if entry_ids:
+            logger.info(f"Dropped {len(entry_ids)} cached answers drawing on {filename}")
+        return len(entry_ids)
+
+    def stats(self) -> Dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "size": len(self),
+        }
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _remove(self, entry_id: int) -> None:
+        entry = self._entries.pop(entry_id, None)
+        if entry is None:
+            return
+        _, _, context, filenames, _ = entry
+        self._discard(self._by_context, context, entry_id)
+        for filename in filenames:
+            self._discard(self._by_filename, filename, entry_id)
+
+    @staticmethod
+    def _discard(index: Dict, key, entry_id: int) -> None:
+        ids = index.get(key)
+        if ids is not None:
+            ids.discard(entry_id)
+            if not ids:
+                del index[key]
+
+
+def _unit(vector: List[float]) -> np.ndarray:
+    vector = np.asarray(vector, dtype=np.float32)
+    return vector / max(float(np.linalg.norm(vector)), 1e-12)
+
+
+def build_answer_cache(settings) -> Optional[AnswerCache]:
+    if not settings.answer_cache_enabled:
+        return None
+    return AnswerCache(
+        settings.answer_cache_max_entries,
+        settings.answer_cache_ttl_seconds or None,
+        settings.answer_cache_min_similarity
+    )
@@ -0,0 +1,83 @@
+from typing import Optional
+import json
+import re
+
+
+class JsonStringFieldStreamer:
+    """Pulls the text of one top-level string field out of a JSON document as it streams in.
+
+    JSON-mode completions arrive as raw JSON fragments; feed() returns whatever part of the
+    field's decoded value is complete so far, holding back escape sequences that were split
+    across fragments. The full document should still be parsed once the stream ends.
+    """
+
+    def __init__(self, field: str) -> None:
+        self._pattern = re.compile(r'"%s"\s*:\s*"' % re.escape(field))
+        self._seen = ""
+        self._raw = ""
+        self.started = False
+        self.finished = False
+
+    def feed(self, delta: str) -> str:
+        if self.finished:
+            return ""
+        if not self.started:
+            self._seen += delta
+            match = self._pattern.search(self._seen)
+            if match is None:
+                return ""
+            self.started = True
+            delta = self._seen[match.end():]
+            self._seen = ""
+        self._raw += delta
+        return self._drain()
+
+    def _drain(self) -> str:
+        raw = self._raw
+        safe = 0
+        i = 0
+        while i < len(raw):
+            char = raw[i]
+            if char == '"':
+                self.finished = True
+                self._raw = ""
+                return _decode(raw[:i])
+            if char == '\\':
+                step = _escape_length(raw, i)
+                if step is None:
+                    break
+                i += step
+            else:
+                i += 1
+            safe = i
+        self._raw = raw[safe:]
+        return _decode(raw[:safe])
+
+
+def _escape_length(raw: str, i: int) -> Optional[int]:
+    # None means the escape sequence isn't complete yet
+    if i + 1 >= len(raw):
+        return None
+    if raw[i + 1] != 'u':
+        return 2
+    if i + 6 > len(raw):
+        return None
+    try:
+        code = int(raw[i + 2:i + 6], 16)
+    except ValueError:
+        return 6
+    # a high surrogate is only decodable together with the low surrogate that follows it
+    if 0xD800 <= code < 0xDC00 and raw[i + 6:i + 8] in ("", "\\", "\\u"):
+        if i + 12 > len(raw):
+            return None
+        return 12
+    return 6
+
+
+def _decode(raw: str) -> str:
+    if not raw:
+        return ""
+    try:
+        return json.loads(f'"{raw}"', strict=False)
+    except ValueError:
+        return raw
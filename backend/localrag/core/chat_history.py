@@ -0,0 +1,115 @@
+from datetime import datetime
+from typing import Dict, List, Optional, Set
+import asyncio
+import logging
+
+from .embedding_batcher import TokenCounter, default_token_counter
+from ..database.mongodb import get_chat_window, get_chat_messages, update_chat_summary
+
+logger = logging.getLogger(__name__)
+
+# messages folded into the summary per update, so a long chat that predates summaries catches up gradually
+MAX_SUMMARY_MESSAGES = 50
+
+SUMMARY_PROMPT = """You maintain a running summary of a conversation between a user and an assistant that answers from documents.
+Extend the existing summary with the new messages. Keep the facts, names, identifiers, numbers, decisions and open
+questions a follow-up question could refer to, drop pleasantries and repetition. Reply with the summary only, at most 200 words."""
+
+
+class ChatHistory:
+    """Chat history for follow-up prompts: the latest messages plus a rolling summary of the rest.
+
+    Only a window of recent messages is read from Mongo. Messages that fall out of the window
+    are folded into a summary stored on the chat, in batches of summary_batch_messages by a
+    background update after each exchange. The formatted history keeps to token_budget,
+    newest messages first.
+    """
+
+    def __init__(
+        self,
+        window_messages: int = 10,
+        token_budget: int = 2000,
+        summary_batch_messages: int = 6,
+        token_counter: Optional[TokenCounter] = None,
+    ) -> None:
+        self.window_messages = window_messages
+        self.token_budget = token_budget
+        self.summary_batch_messages = summary_batch_messages
+        self.token_counter = token_counter or default_token_counter
+        self._updates: Set[asyncio.Task] = set()
+
+    async def load(self, chat_id: str) -> str:
+        # The window reaches summary_batch_messages further back so that messages out of the
+        # window but not summarized yet are still seen
+        chat = await get_chat_window(chat_id, self.window_messages + self.summary_batch_messages)
+        if chat is None:
+            return ""
+        summary = chat.get("history_summary") or {}
+        messages = chat["messages"]
+        first = chat["message_count"] - len(messages)
+        messages = messages[max(0, summary.get("through", 0) - first):]
+        return await asyncio.to_thread(self.format, summary.get("text", ""), messages)
+
+    def format(self, summary: str, messages: List[Dict]) -> str:
+        lines = [f"{'User' if message['role'] == 'user' else 'Assistant'}: {message['content']}" for message in messages]
+        counts = self.token_counter.count(lines + [summary])
+        remaining = self.token_budget
+        kept = 0
+        for count in reversed(counts[:-1]):
+            if count > remaining:
+                break
+            remaining -= count
+            kept += 1
+        history = "\n".join(lines[len(lines) - kept:]) + "\n" if kept else ""
+        if summary and counts[-1] <= remaining:
+            history = f"Summary of the earlier conversation: {summary}\n{history}"
+        if kept < len(lines):
+            logger.info(f"Chat history cut to {kept} of {len(lines)} messages by the {self.token_budget} token budget")
+        return f"\nPrevious conversation:\n{history}\n" if history else ""
+
+    def schedule_update(self, chat_id: str, client, model: str) -> None:
+        # runs after the answer went out, the next follow-up picks the new summary up
+        task = asyncio.create_task(self.update_summary(chat_id, client, model))
+        self._updates.add(task)
+        task.add_done_callback(self._update_done)
+
+    async def update_summary(self, chat_id: str, client, model: str) -> bool:
+        chat = await get_chat_window(chat_id, 0)
+        if chat is None:
+            return False
+        summary = chat.get("history_summary") or {"text": "", "through": 0}
+        end = min(chat["message_count"] - self.window_messages, summary["through"] + MAX_SUMMARY_MESSAGES)
+        if end - summary["through"] < self.summary_batch_messages:
+            return False
+        messages = await get_chat_messages(chat_id, summary["through"], end - summary["through"])
+        transcript = "\n".join(
+            f"{'User' if message['role'] == 'user' else 'Assistant'}: {message['content']}" for message in messages
+        )
+        completion = await client.chat.completions.create(
+            model=model,
+            messages=[
+                {"role": "system", "content": SUMMARY_PROMPT},
+                {"role": "user", "content": f"Existing summary:\n{summary['text'] or '(none)'}\n\nNew messages:\n{transcript}"}
+            ],
+            temperature=0
+        )
+        text = completion.choices[0].message.content.strip()
+        updated = await update_chat_summary(
+            chat_id, {"text": text, "through": end, "updated_at": datetime.utcnow()}, summary["through"]
+        )
+        if updated:
+            logger.info(f"Summarized messages {summary['through']}-{end} of chat {chat_id}")
+        return updated
+
+    def _update_done(self, task: asyncio.Task) -> None:
+        self._updates.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning(f"Chat summary update failed: {task.exception()}")
+
+
+def build_chat_history(settings) -> ChatHistory:
+    return ChatHistory(
+        window_messages=settings.chat_history_messages,
+        token_budget=settings.chat_history_token_budget,
+        summary_batch_messages=settings.chat_summary_batch_messages,
+    )
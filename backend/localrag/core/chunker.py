@@ -0,0 +1,152 @@
+from typing import Callable, List, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SEPARATORS = ["\n\n", "\n", " ", ""]
+CHUNK_UNITS = ("chars", "tokens")
+
+Span = Tuple[int, int]
+
+class Chunker:
+    """Recursive separator chunker that works on offsets into the source text.
+
+    Boundaries match LangChain's RecursiveCharacterTextSplitter with
+    keep_separator=True and strip_whitespace=True: every split starts with its
+    separator, so a merged chunk is always one contiguous slice of the text and
+    nothing needs to be copied until a chunk is returned. In "tokens" mode a
+    split's length is its tiktoken count, summed the same way LangChain sums
+    length_function over splits.
+    """
+
+    def __init__(
+        self,
+        chunk_size: int = 1000,
+        chunk_overlap: int = 200,
+        separators: Optional[List[str]] = None,
+        unit: str = "chars",
+        encoding_name: str = "cl100k_base",
+    ) -> None:
+        if chunk_size < 1:
+            raise ValueError(f"Chunk size must be positive, got {chunk_size}")
+        if chunk_overlap < 0:
+            raise ValueError(f"Chunk overlap can't be negative, got {chunk_overlap}")
+        if chunk_overlap > chunk_size:
+            raise ValueError(
+                f"Got a larger chunk overlap ({chunk_overlap}) than chunk size ({chunk_size}), should be smaller."
+            )
+        if unit not in CHUNK_UNITS:
+            raise ValueError(f"Unknown chunk unit {unit!r}, expected one of {CHUNK_UNITS}")
+        self._chunk_size = chunk_size
+        self._chunk_overlap = chunk_overlap
+        self._separators = separators or DEFAULT_SEPARATORS
+        self.unit = unit
+        self._encoding_name = encoding_name
+        self._encoding = None
+
+    @property
+    def chunk_size(self) -> int:
+        return self._chunk_size
+
+    @property
+    def chunk_overlap(self) -> int:
+        return self._chunk_overlap
+
+    def split_text(self, text: str) -> List[str]:
+        return [text[start:end] for start, end in self.split_offsets(text)]
+
+    def split_offsets(self, text: str) -> List[Span]:
+        length = self._length_function(text)
+        chunks: List[Span] = []
+        self._split(text, 0, len(text), self._separators, length, chunks)
+        return chunks
+
+    def _length_function(self, text: str) -> Callable[[int, int], int]:
+        if self.unit == "chars":
+            return lambda start, end: end - start
+        if self._encoding is None:
+            import tiktoken
+            self._encoding = tiktoken.get_encoding(self._encoding_name)
+        encode = self._encoding.encode
+        return lambda start, end: len(encode(text[start:end], disallowed_special=()))
+
+    def _split(
+        self,
+        text: str,
+        start: int,
+        end: int,
+        separators: List[str],
+        length: Callable[[int, int], int],
+        chunks: List[Span],
+    ) -> None:
+        separator = separators[-1]
+        remaining: List[str] = []
+        for i, candidate in enumerate(separators):
+            if candidate == "":
+                separator = candidate
+                break
+            if text.find(candidate, start, end) != -1:
+                separator = candidate
+                remaining = separators[i + 1:]
+                break
+
+        good: List[Tuple[int, int, int]] = []
+        for split_start, split_end in _split_spans(text, start, end, separator):
+            split_length = length(split_start, split_end)
+            if split_length < self._chunk_size:
+                good.append((split_start, split_end, split_length))
+                continue
+            if good:
+                self._merge(text, good, chunks)
+                good = []
+            if remaining:
+                self._split(text, split_start, split_end, remaining, length, chunks)
+            else:
+                chunks.append((split_start, split_end))
+        if good:
+            self._merge(text, good, chunks)
+
+    def _merge(self, text: str, splits: List[Tuple[int, int, int]], chunks: List[Span]) -> None:
+        # Splits are adjacent, so the current window is text[splits[first][0]:splits[last][1]]
+        first = 0
+        count = 0
+        total = 0
+        for i, (_, _, split_length) in enumerate(splits):
+            if total + split_length > self._chunk_size:
+                if total > self._chunk_size:
+                    logger.warning(f"Created a chunk of size {total}, which is longer than the specified {self._chunk_size}")
+                if count:
+                    _append_stripped(text, splits[first][0], splits[i - 1][1], chunks)
+                    while total > self._chunk_overlap or (total + split_length > self._chunk_size and total > 0):
+                        total -= splits[first][2]
+                        first += 1
+                        count -= 1
+            count += 1
+            total += split_length
+        if count:
+            _append_stripped(text, splits[first][0], splits[-1][1], chunks)
+
+
+def _split_spans(text: str, start: int, end: int, separator: str) -> List[Span]:
+    if separator == "":
+        return [(i, i + 1) for i in range(start, end)]
+    spans = []
+    piece_start = start
+    position = text.find(separator, start, end)
+    while position != -1:
+        if position > piece_start:
+            spans.append((piece_start, position))
+        piece_start = position
+        position = text.find(separator, position + len(separator), end)
+    if end > piece_start:
+        spans.append((piece_start, end))
+    return spans
+
+
+def _append_stripped(text: str, start: int, end: int, chunks: List[Span]) -> None:
+    while start < end and text[start].isspace():
+        start += 1
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    if start < end:
+        chunks.append((start, end))
@@ -0,0 +1,146 @@
+from collections import OrderedDict
+from typing import Dict, Optional
+import hashlib
+import importlib.util
+import logging
+import threading
+import time
+
+import httpx
+import requests
+from exa_py import Exa
+from langchain_openai import OpenAIEmbeddings
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient, DefaultHttpxClient, OpenAI
+
+logger = logging.getLogger(__name__)
+
+
+def hash_key(api_key: Optional[str]) -> str:
+    # Raw keys are never kept as dict keys, so they don't show up in dumps or logs
+    return hashlib.sha256((api_key or "").encode("utf-8")).hexdigest()
+
+
+class PooledExa(Exa):
+    """Exa client that sends requests over a shared keep-alive session instead of requests.post."""
+
+    def __init__(self, api_key: Optional[str], session: requests.Session, **kwargs) -> None:
+        super().__init__(api_key, **kwargs)
+        self.session = session
+
+    def request(self, endpoint: str, data):
+        if data.get("stream"):
+            return super().request(endpoint, data)
+        res = self.session.post(self.base_url + endpoint, json=data, headers=self.headers)
+        if res.status_code != 200:
+            raise ValueError(f"Request failed with status code {res.status_code}: {res.text}")
+        return res.json()
+
+
+class ClientPool:
+    """Per API key OpenAI, embeddings and Exa clients on top of shared HTTP connection pools.
+
+    Clients for a key are built once and dropped after sitting idle. All keys share the same
+    httpx clients and requests session, so connections (and TLS sessions) to a host are reused
+    across keys; the key itself only travels in request headers.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 64,
+        idle_seconds: float = 600,
+        max_connections: int = 100,
+        max_keepalive_connections: int = 20,
+        keepalive_expiry: float = 60,
+        http2: Optional[bool] = None,
+        openai_base_url: Optional[str] = None,
+        exa_base_url: Optional[str] = None,
+    ) -> None:
+        self.max_entries = max_entries
+        self.idle_seconds = idle_seconds
+        self.openai_base_url = openai_base_url
+        self.exa_base_url = exa_base_url
+        if http2 is None:
+            http2 = importlib.util.find_spec("h2") is not None
+        self.http2 = http2
+        limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.http_client = DefaultHttpxClient(limits=limits, http2=http2)
+        self.async_http_client = DefaultAsyncHttpxClient(limits=limits, http2=http2)
+        self.session = requests.Session()
+        self.session.mount("https://", requests.adapters.HTTPAdapter(pool_maxsize=max_keepalive_connections))
+        self.session.mount("http://", requests.adapters.HTTPAdapter(pool_maxsize=max_keepalive_connections))
+        self._entries: "OrderedDict[str, Dict]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        logger.info(f"Client pool ready (http2={http2}, max_connections={max_connections})")
+
+    def openai(self, api_key: Optional[str]) -> OpenAI:
+        return self._get(api_key, "openai", lambda: OpenAI(
+            api_key=api_key, base_url=self.openai_base_url, http_client=self.http_client
+        ))
+
+    def async_openai(self, api_key: Optional[str]) -> AsyncOpenAI:
+        return self._get(api_key, "async_openai", lambda: AsyncOpenAI(
+            api_key=api_key, base_url=self.openai_base_url, http_client=self.async_http_client
+        ))
+
+    def embeddings(self, api_key: Optional[str], model: str) -> OpenAIEmbeddings:
+        return self._get(api_key, f"embeddings:{model}", lambda: OpenAIEmbeddings(
+            model=model,
+            openai_api_key=api_key,
+            client=self.openai(api_key).embeddings,
+            async_client=self.async_openai(api_key).embeddings
+        ))
+
+    def exa(self, api_key: Optional[str]) -> Exa:
+        kwargs = {"base_url": self.exa_base_url} if self.exa_base_url else {}
+        return self._get(api_key, "exa", lambda: PooledExa(api_key, self.session, **kwargs))
+
+    def _get(self, api_key: Optional[str], kind: str, build):
+        key = hash_key(api_key)
+        now = time.monotonic()
+        with self._lock:
+            self._evict_idle(now)
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._entries[key] = {"last_used": now, "clients": {}}
+            entry["last_used"] = now
+            self._entries.move_to_end(key)
+            client = entry["clients"].get(kind)
+            if client is not None:
+                self.hits += 1
+                return client
+            self.misses += 1
+        # built outside the lock, embeddings clients call back into the pool
+        client = build()
+        with self._lock:
+            entry["clients"].setdefault(kind, client)
+            client = entry["clients"][kind]
+            if key not in self._entries:
+                self._entries[key] = entry
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return client
+
+    def _evict_idle(self, now: float) -> None:
+        # entries are kept in last-used order, so idle ones are always at the front
+        while self._entries:
+            key, entry = next(iter(self._entries.items()))
+            if now - entry["last_used"] <= self.idle_seconds:
+                break
+            del self._entries[key]
+
+    def stats(self) -> Dict:
+        return {"keys": len(self._entries), "hits": self.hits, "misses": self.misses, "http2": self.http2}
+
+    async def aclose(self) -> None:
+        # Pooled OpenAI clients don't own the shared transports, so only the transports are closed
+        with self._lock:
+            self._entries.clear()
+        await self.async_http_client.aclose()
+        self.http_client.close()
+        self.session.close()
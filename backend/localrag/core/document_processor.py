@@ -1,60 +1,91 @@
 from pathlib import Path
-from typing import List, Dict
+from typing import List, Dict, Optional, Tuple, Iterable, Iterator, AsyncIterator, Deque
+from concurrent.futures import Executor
+from collections import deque
+from functools import cached_property
 import pypdf
 from docx import Document
 from langchain_openai import OpenAIEmbeddings
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from openai import OpenAI
+from openai import OpenAI, AsyncOpenAI
+import asyncio
 import logging
+import os
 import re
+import time
+from .chunker import Chunker
+from .client_pool import ClientPool
+from .embedding_batcher import EmbeddingBatcher, RateLimiter
+from .embedding_cache import EmbeddingCache
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-class DocumentProcessor:
-    def __init__(self, api_key: str):
-        self.client = OpenAI(api_key=api_key)
-        logger.info("DocumentProcessor initialized")
-        self.embeddings = OpenAIEmbeddings(
-            model="text-embedding-3-small",
-            openai_api_key=api_key
-        )
-        self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,
-            chunk_overlap=200,
-            length_function=len,
-            separators=["\n\n", "\n", " ", ""]
-        )
-        
+EMBEDDING_MODEL = "text-embedding-3-small"
+EMBEDDING_CONCURRENCY = 4
+
+# A hyphenated line break is joined when, after blank lines collapse to one newline,
+# the next word starts with a digit or a capitalized word (other line breaks become
+# spaces first and never join). The trailing character is consumed, like the original
+# (\w)-\n(\w) pass, so chains such as "1-\n2-\n3" only join their first break.
+_HYPHENATED_BREAK = re.compile(r'(\w)-\n(?:\s*\n)?(\d|[A-Z](?=[a-z]))')
+
+def clean_pdf_text(text: str) -> str:
+    # Single pass equivalent of: collapse blank lines, unwrap soft line breaks,
+    # join hyphenated words, normalize whitespace, then one sentence per line.
+    # Every step but the hyphen join only rewrites whitespace, which split()
+    # normalizes anyway, so only the join needs a regex.
+    if '-\n' in text:
+        text = _HYPHENATED_BREAK.sub(r'\1\2', text)
+    return ' '.join(text.split()).replace('. ', '.\n')
+
+class DocumentLoader:
+    """Reads and chunks files. Holds no API clients so it can run in worker processes."""
+
+    def __init__(self, chunk_size: int = 1000, chunk_overlap: int = 200, chunk_unit: str = "chars"):
+        self.text_splitter = Chunker(chunk_size=chunk_size, chunk_overlap=chunk_overlap, unit=chunk_unit)
+
 
     def read_pdf(self, file_path: Path) -> List[Dict]:
         logger.info(f"Reading PDF file with new method: {file_path}")
         try:
             logger.info(f"Reading PDF file: {file_path}")
-            with open(file_path, 'rb') as file:
-                pdf = pypdf.PdfReader(file)
-                pages = []
-                for i, page in enumerate(pdf.pages):
-                    text = page.extract_text()
-                    cleaned_text = self._clean_pdf_text(text)
-                    if cleaned_text.strip():  
-                        pages.append({
-                            'content': cleaned_text,
-                            'page': i + 1
-                        })
-                logger.info(f"Successfully read {len(pages)} pages from PDF")
-                return pages
+            pages = list(self.iter_pdf_pages(file_path))
+            logger.info(f"Successfully read {len(pages)} pages from PDF")
+            return pages
         except Exception as e:
             logger.error(f"Error reading PDF: {str(e)}")
             raise
 
+    def read_pdf_parallel(self, file_path: Path, executor: Executor, pages_per_task: int = 16) -> List[Dict]:
+        # Page ranges are extracted in worker processes; map() keeps results in page order
+        total_pages = self.count_pages(file_path)
+        starts = range(0, total_pages, pages_per_task)
+        parts = executor.map(
+            extract_pdf_pages,
+            [str(file_path)] * len(starts),
+            starts,
+            [min(start + pages_per_task, total_pages) for start in starts]
+        )
+        pages = [page for part in parts for page in part]
+        logger.info(f"Successfully read {len(pages)} pages from PDF in {len(starts)} ranges")
+        return pages
+
+    def iter_pdf_pages(self, file_path: Path, start: int = 0, end: Optional[int] = None) -> Iterator[Dict]:
+        # pypdf resolves page objects lazily, so only the pages in [start, end) are parsed
+        with open(file_path, 'rb') as file:
+            pdf = pypdf.PdfReader(file)
+            end = len(pdf.pages) if end is None else min(end, len(pdf.pages))
+            for i in range(start, end):
+                text = pdf.pages[i].extract_text()
+                cleaned_text = self._clean_pdf_text(text)
+                if cleaned_text.strip():  
+                    yield {
+                        'content': cleaned_text,
+                        'page': i + 1
+                    }
+
     def _clean_pdf_text(self, text: str) -> str:
-        text = re.sub(r'\n\s*\n', '\n', text)
-        text = re.sub(r'(?<!\n)\n(?!\n)(?!\s*[-•\d])(?!\s*[A-Z][a-z])', ' ', text)
-        text = re.sub(r'(\w)-\n(\w)', r'\1\2', text)
-        text = ' '.join(text.split())
-        text = text.replace('. ', '.\n')
-        return text
+        return clean_pdf_text(text)
 
     def read_docx(self, file_path: Path) -> List[Dict]:
         doc = Document(file_path)
@@ -65,84 +96,282 @@ class DocumentProcessor:
         with open(file_path, 'r', encoding='utf-8') as file:
             return [{'content': file.read(), 'page': 1}]
 
-    def load_document(self, file_path: Path) -> List[Dict]:
+    def read_document(self, file_path: Path) -> List[Dict]:
         if not file_path.exists():
             raise FileNotFoundError(f"File not found: {file_path}")
 
         if file_path.suffix.lower() == '.pdf':
-            pages = self.read_pdf(file_path)
+            return self.read_pdf(file_path)
         elif file_path.suffix.lower() == '.docx':
-            pages = self.read_docx(file_path)
+            return self.read_docx(file_path)
         elif file_path.suffix.lower() == '.txt':
-            pages = self.read_txt(file_path)
+            return self.read_txt(file_path)
         else:
             raise ValueError(f"Unsupported file type: {file_path.suffix}")
 
-        all_chunks = []
+    def count_pages(self, file_path: Path) -> int:
+        if file_path.suffix.lower() == '.pdf':
+            with open(file_path, 'rb') as file:
+                return len(pypdf.PdfReader(file).pages)
+        return 1
+
+    def iter_pages(self, file_path: Path, start: int = 0, end: Optional[int] = None) -> Iterator[Dict]:
+        if file_path.suffix.lower() == '.pdf':
+            yield from self.iter_pdf_pages(file_path, start, end)
+        elif start == 0 and (end is None or end > 0):
+            # docx and txt files are a single page
+            yield from self.read_document(file_path)
+
+    def load_document(self, file_path: Path) -> List[Dict]:
+        return self.chunk_pages(self.read_document(file_path), file_path.name)
+
+    def chunk_pages(self, pages: Iterable[Dict], source: str) -> List[Dict]:
+        return list(self.iter_chunks(pages, source))
+
+    def iter_chunks(self, pages: Iterable[Dict], source: str) -> Iterator[Dict]:
         for page in pages:
-            # TODO: Add user defined chunk size and overlap
-            text_chunks = self.text_splitter.split_text(page['content'])
-            
-            chunks = [{
-                'content': chunk,
-                'metadata': {
-                    'source': file_path.name,
-                    'page': page['page'],
-                    'chunk_index': i
+            text = page['content']
+            for i, (start, end) in enumerate(self.text_splitter.split_offsets(text)):
+                yield {
+                    'content': text[start:end],
+                    'metadata': {
+                        'source': source,
+                        'page': page['page'],
+                        'chunk_index': i,
+                        'start': start,
+                        'end': end
+                    }
                 }
-            } for i, chunk in enumerate(text_chunks)]
-            
-            all_chunks.extend(chunks)
-        return all_chunks
     
+    def _read_file(self, file_path: Path) -> str:
+        try:
+            with open(file_path, 'r', encoding='utf-8') as f:
+                return f.read()
+        except UnicodeDecodeError:
+            with open(file_path, 'r', encoding='latin-1') as f:
+                return f.read()
+
+
+def lower_worker_priority(niceness: int) -> None:
+    # Ingest workers yield the CPU to the API process on small machines
+    try:
+        os.nice(niceness)
+    except (AttributeError, OSError) as e:
+        logger.warning(f"Could not lower ingest worker priority: {e}")
+
+
+# Entry points for process pools: parsing and chunking are CPU bound
+def load_document_chunks(file_path: str, chunk_options: Optional[Dict] = None) -> List[Dict]:
+    return DocumentLoader(**(chunk_options or {})).load_document(Path(file_path))
+
+
+def extract_pdf_pages(file_path: str, start: int, end: int) -> List[Dict]:
+    return list(DocumentLoader().iter_pdf_pages(Path(file_path), start, end))
+
+
+def count_document_pages(file_path: str) -> int:
+    return DocumentLoader().count_pages(Path(file_path))
+
+
+def load_page_range_chunks(
+    file_path: str, start: int, end: int, source: str, chunk_options: Optional[Dict] = None
+) -> Dict:
+    loader = DocumentLoader(**(chunk_options or {}))
+    path = Path(file_path)
+    load_started = time.perf_counter()
+    pages = list(loader.iter_pages(path, start, end))
+    chunk_started = time.perf_counter()
+    chunks = loader.chunk_pages(pages, source)
+    return {
+        'chunks': chunks,
+        'pages': end - start,
+        'load_seconds': chunk_started - load_started,
+        'chunk_seconds': time.perf_counter() - chunk_started
+    }
+
+
+class DocumentProcessor(DocumentLoader):
+    def __init__(
+        self,
+        api_key: str,
+        embedding_cache: Optional[EmbeddingCache] = None,
+        chunk_index: Optional[EmbeddingCache] = None,
+        rate_limiter: Optional[RateLimiter] = None,
+        client_pool: Optional[ClientPool] = None,
+    ):
+        super().__init__()
+        self.api_key = api_key
+        logger.info("DocumentProcessor initialized")
+        self.embedding_model = EMBEDDING_MODEL
+        self.embedding_cache = embedding_cache
+        self.chunk_index = chunk_index
+        self.rate_limiter = rate_limiter
+        self.client_pool = client_pool
+
+    # Clients come from the app's pool when there is one. Otherwise they are built on
+    # first use: each one loads the CA bundle while holding the GIL, and the upload path
+    # only ever needs the async client.
+    @cached_property
+    def client(self) -> OpenAI:
+        if self.client_pool is not None:
+            return self.client_pool.openai(self.api_key)
+        return OpenAI(api_key=self.api_key)
+
+    @cached_property
+    def async_client(self) -> AsyncOpenAI:
+        if self.client_pool is not None:
+            return self.client_pool.async_openai(self.api_key)
+        return AsyncOpenAI(api_key=self.api_key)
+
+    @cached_property
+    def embeddings(self) -> OpenAIEmbeddings:
+        if self.client_pool is not None:
+            return self.client_pool.embeddings(self.api_key, self.embedding_model)
+        return OpenAIEmbeddings(
+            model=self.embedding_model,
+            openai_api_key=self.api_key
+        )
+
+    async def aload_document(
+        self, file_path: Path, executor: Optional[Executor] = None, chunk_options: Optional[Dict] = None
+    ) -> List[Dict]:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(executor, load_document_chunks, str(file_path), chunk_options)
+
+    async def aiter_chunk_batches(
+        self,
+        file_path: Path,
+        executor: Optional[Executor] = None,
+        page_batch_size: int = 32,
+        batch_size: int = 512,
+        prefetch: int = 1,
+        chunk_options: Optional[Dict] = None,
+    ) -> AsyncIterator[Tuple[List[Dict], Dict]]:
+        # Pages are read and chunked a range at a time, so memory is bounded by the
+        # page and chunk batch sizes rather than the size of the document. Up to
+        # `prefetch` ranges are extracted in parallel and consumed in page order.
+        loop = asyncio.get_running_loop()
+        total_pages = await loop.run_in_executor(executor, count_document_pages, str(file_path))
+        progress = {'total_pages': total_pages, 'pages': 0, 'load_seconds': 0.0, 'chunk_seconds': 0.0}
+        buffer: List[Dict] = []
+        ranges = iter(range(0, total_pages, page_batch_size))
+        in_flight: Deque[asyncio.Future] = deque()
+
+        def submit_next() -> None:
+            start = next(ranges, None)
+            if start is not None:
+                end = min(start + page_batch_size, total_pages)
+                in_flight.append(loop.run_in_executor(
+                    executor, load_page_range_chunks, str(file_path), start, end, file_path.name, chunk_options
+                ))
+
+        for _ in range(max(1, prefetch)):
+            submit_next()
+        while in_flight:
+            part = await in_flight.popleft()
+            submit_next()
+            progress['pages'] += part['pages']
+            progress['load_seconds'] += part['load_seconds']
+            progress['chunk_seconds'] += part['chunk_seconds']
+            buffer.extend(part['chunks'])
+            while len(buffer) >= batch_size:
+                yield buffer[:batch_size], dict(progress)
+                del buffer[:batch_size]
+        if buffer:
+            yield buffer, dict(progress)
+
+    async def aiter_embedding_batches(
+        self,
+        file_path: Path,
+        executor: Optional[Executor] = None,
+        page_batch_size: int = 32,
+        batch_size: int = 512,
+        prefetch: int = 1,
+        chunk_options: Optional[Dict] = None,
+    ) -> AsyncIterator[Tuple[List[Dict], List[List[float]], Dict]]:
+        async for chunks, progress in self.aiter_chunk_batches(
+            file_path, executor, page_batch_size, batch_size, prefetch, chunk_options
+        ):
+            embeddings, stats = await self.embed_chunks([chunk['content'] for chunk in chunks])
+            yield chunks, embeddings, {**progress, **stats}
+
+    @cached_property
+    def embedding_batcher(self) -> EmbeddingBatcher:
+        return EmbeddingBatcher(
+            self._embed_batch,
+            rate_limiter=self.rate_limiter,
+            concurrency=EMBEDDING_CONCURRENCY
+        )
+
+    async def aembed_texts(self, texts: List[str]) -> List[List[float]]:
+        return await self.embedding_batcher.embed(texts)
+
+    async def _embed_batch(self, batch: List[str]) -> List[List[float]]:
+        response = await self.async_client.embeddings.create(model=self.embedding_model, input=batch)
+        return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+
     async def get_embedding(self, text: str) -> List[float]:
+        if self.embedding_cache is not None:
+            cached = await asyncio.to_thread(self.embedding_cache.get, self.embedding_model, text)
+            if cached is not None:
+                logger.info("Embedding cache hit for search query")
+                return cached.tolist()
         try:
             embedding = await self.embeddings.aembed_query(text)
             logger.info(f"Generated embedding for search query")
+            if self.embedding_cache is not None:
+                await asyncio.to_thread(self.embedding_cache.set, self.embedding_model, text, embedding)
             return embedding
         except Exception as e:
             logger.error(f"Error generating embedding: {str(e)}")
             raise
 
+    async def embed_chunks(self, texts: List[str]) -> Tuple[List[List[float]], Dict]:
+        embeddings, stats = await self._embed_cached(self.chunk_index, texts)
+        logger.info(f"Chunk embeddings: {stats['reused']} reused, {stats['embedded']} newly embedded")
+        return embeddings, stats
+
+    async def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        embeddings, stats = await self._embed_cached(self.embedding_cache, texts)
+        logger.info(f"Query embeddings: {stats['reused']} cached, {stats['embedded']} newly embedded")
+        return embeddings
+
+    async def _embed_cached(self, cache: Optional[EmbeddingCache], texts: List[str]) -> Tuple[List[List[float]], Dict]:
+        if cache is None:
+            embeddings = await self.aembed_texts(texts)
+            return embeddings, {"reused": 0, "embedded": len(texts)}
+
+        cached = await asyncio.to_thread(cache.get_many, self.embedding_model, texts)
+        # identical texts within one call are embedded once
+        pending: Dict[str, List[int]] = {}
+        for i, vector in enumerate(cached):
+            if vector is None:
+                pending.setdefault(texts[i], []).append(i)
+
+        embeddings: List[Optional[List[float]]] = [
+            vector.tolist() if vector is not None else None for vector in cached
+        ]
+        if pending:
+            new_texts = list(pending)
+            new_embeddings = await self.aembed_texts(new_texts)
+            await asyncio.to_thread(cache.set_many, self.embedding_model, new_texts, new_embeddings)
+            for text, embedding in zip(new_texts, new_embeddings):
+                for i in pending[text]:
+                    embeddings[i] = embedding
+
+        return embeddings, {"reused": len(texts) - len(pending), "embedded": len(pending)}
+
     async def process_and_embed(self, file_path: Path):
         try:
             logger.info(f"Processing file: {file_path}")
-            chunks = self.load_document(file_path)
-            
-            texts = [chunk['content'] for chunk in chunks]
-            
-            embeddings = await self.embeddings.aembed_documents(texts)
+            texts = []
+            embeddings = []
+            async for chunks, batch_embeddings, _ in self.aiter_embedding_batches(file_path):
+                texts.extend(chunk['content'] for chunk in chunks)
+                embeddings.extend(batch_embeddings)
             
             logger.info(f"Generated {len(embeddings)} embeddings")
             return texts, embeddings
         except Exception as e:
             logger.error(f"Error in process_and_embed: {str(e)}")
             raise
-
-    def _read_file(self, file_path: Path) -> str:
-        try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                return f.read()
-        except UnicodeDecodeError:
-            with open(file_path, 'r', encoding='latin-1') as f:
-                return f.read()
-
-    def _split_text(self, text: str, chunk_size: int = 1000) -> list[str]:
-        words = text.split()
-        chunks = []
-        current_chunk = []
-        current_size = 0
-        
-        for word in words:
-            current_size += len(word) + 1  # +1 for space
-            if current_size > chunk_size:
-                chunks.append(' '.join(current_chunk))
-                current_chunk = [word]
-                current_size = len(word)
-            else:
-                current_chunk.append(word)
-                
-        if current_chunk:
-            chunks.append(' '.join(current_chunk))
-            
-        return chunks
\ No newline at end of file
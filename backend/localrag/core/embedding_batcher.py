@@ -0,0 +1,182 @@
+from typing import Awaitable, Callable, List, Optional
+import asyncio
+import logging
+import random
+import time
+
+from openai import RateLimitError
+
+logger = logging.getLogger(__name__)
+
+# Limits of the OpenAI embeddings endpoint for a single request
+MAX_INPUT_TOKENS = 8191
+MAX_BATCH_TOKENS = 300000
+MAX_BATCH_ITEMS = 2048
+
+EmbedFn = Callable[[List[str]], Awaitable[List[List[float]]]]
+
+
+class TokenCounter:
+    """Counts tokens with tiktoken, falling back to UTF-8 byte length when the encoding can't be loaded.
+
+    Every cl100k token covers at least one byte, so the fallback never undercounts and
+    packed batches stay under the endpoint limits, just less densely.
+    """
+
+    def __init__(self, encoding_name: str = "cl100k_base") -> None:
+        self.encoding_name = encoding_name
+        self._encoding = None
+        self._unavailable = False
+
+    def count(self, texts: List[str]) -> List[int]:
+        encoding = self._load()
+        if encoding is None:
+            return [len(text.encode("utf-8")) for text in texts]
+        return [len(tokens) for tokens in encoding.encode_ordinary_batch(texts)]
+
+    def _load(self):
+        if self._encoding is None and not self._unavailable:
+            try:
+                import tiktoken
+                self._encoding = tiktoken.get_encoding(self.encoding_name)
+            except Exception as e:
+                logger.warning(f"Could not load tokenizer {self.encoding_name}, estimating tokens from bytes: {e}")
+                self._unavailable = True
+        return self._encoding
+
+
+# shared so a missing tokenizer is only looked up once per process
+default_token_counter = TokenCounter()
+
+
+def pack_batches(
+    token_counts: List[int],
+    max_tokens: int = MAX_BATCH_TOKENS,
+    max_items: int = MAX_BATCH_ITEMS,
+) -> List[List[int]]:
+    # Greedy in input order so results can be stitched back together by position
+    batches: List[List[int]] = []
+    current: List[int] = []
+    current_tokens = 0
+    for i, tokens in enumerate(token_counts):
+        if current and (current_tokens + tokens > max_tokens or len(current) >= max_items):
+            batches.append(current)
+            current = []
+            current_tokens = 0
+        current.append(i)
+        current_tokens += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+
+class RateLimiter:
+    """Token bucket over requests and tokens per minute, shared by everything calling one endpoint."""
+
+    def __init__(self, requests_per_minute: int = 3000, tokens_per_minute: int = 1000000) -> None:
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._requests = float(requests_per_minute)
+        self._tokens = float(tokens_per_minute)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, tokens: int) -> None:
+        # a single request larger than the whole budget waits for a full bucket
+        tokens = min(tokens, self.tokens_per_minute)
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                wait = self._paused_until - now
+                if wait <= 0:
+                    if self._requests >= 1 and self._tokens >= tokens:
+                        self._requests -= 1
+                        self._tokens -= tokens
+                        return
+                    wait = max(
+                        (1 - self._requests) * 60 / self.requests_per_minute,
+                        (tokens - self._tokens) * 60 / self.tokens_per_minute,
+                    )
+                await asyncio.sleep(wait)
+
+    def pause(self, seconds: float) -> None:
+        # called on a 429 so every in-flight caller backs off, not just the one that was rejected
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._updated
+        self._updated = now
+        self._requests = min(self.requests_per_minute, self._requests + elapsed * self.requests_per_minute / 60)
+        self._tokens = min(self.tokens_per_minute, self._tokens + elapsed * self.tokens_per_minute / 60)
+
+
+class EmbeddingBatcher:
+    def __init__(
+        self,
+        embed: EmbedFn,
+        token_counter: Optional[TokenCounter] = None,
+        rate_limiter: Optional[RateLimiter] = None,
+        max_batch_tokens: int = MAX_BATCH_TOKENS,
+        max_batch_items: int = MAX_BATCH_ITEMS,
+        concurrency: int = 4,
+        max_retries: int = 5,
+    ) -> None:
+        self._embed = embed
+        self.token_counter = token_counter or default_token_counter
+        self.rate_limiter = rate_limiter
+        self.max_batch_tokens = max_batch_tokens
+        self.max_batch_items = max_batch_items
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+
+    async def embed(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        token_counts = await asyncio.to_thread(self.token_counter.count, texts)
+        for i, tokens in enumerate(token_counts):
+            if tokens > MAX_INPUT_TOKENS:
+                logger.warning(f"Text {i} has about {tokens} tokens, over the {MAX_INPUT_TOKENS} token input limit")
+        batches = pack_batches(token_counts, self.max_batch_tokens, self.max_batch_items)
+        logger.info(f"Embedding {len(texts)} texts ({sum(token_counts)} tokens) in {len(batches)} requests")
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+        results: List[Optional[List[float]]] = [None] * len(texts)
+
+        async def run(batch: List[int]) -> None:
+            tokens = sum(token_counts[i] for i in batch)
+            async with semaphore:
+                embeddings = await self._embed_with_retry([texts[i] for i in batch], tokens)
+            for i, embedding in zip(batch, embeddings):
+                results[i] = embedding
+
+        await asyncio.gather(*(run(batch) for batch in batches))
+        return results
+
+    async def _embed_with_retry(self, batch: List[str], tokens: int) -> List[List[float]]:
+        for attempt in range(self.max_retries + 1):
+            if self.rate_limiter is not None:
+                await self.rate_limiter.acquire(tokens)
+            try:
+                return await self._embed(batch)
+            except RateLimitError as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = _retry_after(e) or min(30.0, 0.5 * 2 ** attempt) * (1 + random.random())
+                logger.warning(f"Embedding request rate limited, retrying in {delay:.1f}s (attempt {attempt + 1})")
+                if self.rate_limiter is not None:
+                    self.rate_limiter.pause(delay)
+                await asyncio.sleep(delay)
+
+
+def _retry_after(error: RateLimitError) -> Optional[float]:
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    for name, scale in (("retry-after-ms", 0.001), ("retry-after", 1.0)):
+        value = headers.get(name)
+        if value is not None:
+            try:
+                return float(value) * scale
+            except ValueError:
+                pass
+    return None
@@ -0,0 +1,309 @@
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Union
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+import unicodedata
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_text(text: str) -> str:
+    text = unicodedata.normalize("NFKC", text)
+    return " ".join(text.split()).casefold()
+
+
+def make_key(model: str, text: str, normalize: bool = True) -> str:
+    if normalize:
+        text = normalize_text(text)
+    return hashlib.sha256(f"{model}\x00{text}".encode("utf-8")).hexdigest()
+
+
+def to_vector(embedding: Union[Sequence[float], np.ndarray]) -> np.ndarray:
+    return np.ascontiguousarray(embedding, dtype=np.float32)
+
+
+class EmbeddingCache(ABC):
+    """Base class for embedding caches keyed by model name plus (optionally normalized) text."""
+
+    def __init__(self, normalize: bool = True) -> None:
+        self.normalize = normalize
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, model: str, text: str) -> Optional[np.ndarray]:
+        return self.get_many(model, [text])[0]
+
+    def set(self, model: str, text: str, embedding: Union[Sequence[float], np.ndarray]) -> None:
+        self.set_many(model, [text], [embedding])
+
+    def get_many(self, model: str, texts: List[str]) -> List[Optional[np.ndarray]]:
+        vectors = self._get_many([make_key(model, text, self.normalize) for text in texts])
+        found = sum(1 for vector in vectors if vector is not None)
+        self.hits += found
+        self.misses += len(vectors) - found
+        return vectors
+
+    def set_many(self, model: str, texts: List[str], embeddings: Sequence[Union[Sequence[float], np.ndarray]]) -> None:
+        self._set_many(
+            [make_key(model, text, self.normalize) for text in texts],
+            [to_vector(embedding) for embedding in embeddings],
+        )
+
+    def stats(self) -> Dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "size": len(self),
+        }
+
+    @abstractmethod
+    def _get(self, key: str) -> Optional[np.ndarray]:
+        ...
+
+    @abstractmethod
+    def _set(self, key: str, vector: np.ndarray) -> None:
+        ...
+
+    def _get_many(self, keys: List[str]) -> List[Optional[np.ndarray]]:
+        return [self._get(key) for key in keys]
+
+    def _set_many(self, keys: List[str], vectors: List[np.ndarray]) -> None:
+        for key, vector in zip(keys, vectors):
+            self._set(key, vector)
+
+    @abstractmethod
+    def __len__(self) -> int:
+        ...
+
+
+class MemoryEmbeddingCache(EmbeddingCache):
+    def __init__(self, max_entries: int = 10000, ttl_seconds: Optional[float] = None, normalize: bool = True) -> None:
+        super().__init__(normalize)
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, tuple[float, np.ndarray]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get(self, key: str) -> Optional[np.ndarray]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, vector = entry
+            if expires_at and expires_at < time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return vector
+
+    def _set(self, key: str, vector: np.ndarray) -> None:
+        expires_at = time.time() + self.ttl_seconds if self.ttl_seconds else 0.0
+        with self._lock:
+            self._entries[key] = (expires_at, vector)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class DiskEmbeddingCache(EmbeddingCache):
+    """SQLite-backed cache, evicting the least recently read entries over max_entries.
+
+    Eviction only runs once the table has grown EVICT_SLACK past max_entries, so a write
+    doesn't walk the last_access index every time. Reads don't write either: access times
+    are buffered and flushed every TOUCH_FLUSH_ROWS entries or TOUCH_FLUSH_SECONDS, and
+    before an eviction so it sees them.
+    """
+
+    EVICT_SLACK = 0.05
+    TOUCH_FLUSH_ROWS = 1000
+    TOUCH_FLUSH_SECONDS = 30.0
+
+    def __init__(
+        self,
+        path: Union[str, Path],
+        max_entries: int = 100000,
+        ttl_seconds: Optional[float] = None,
+        normalize: bool = True,
+    ) -> None:
+        super().__init__(normalize)
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key TEXT PRIMARY KEY, vector BLOB NOT NULL, expires_at REAL NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS embeddings_last_access ON embeddings (last_access)")
+        self._conn.commit()
+        # upper bound on the row count, replaced keys are counted as new until the next eviction
+        self._count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        self._touched: Dict[str, float] = {}
+        self._touched_at = time.time()
+        logger.info(f"Embedding disk cache opened at {self.path}")
+
+    def _get(self, key: str) -> Optional[np.ndarray]:
+        return self._get_many([key])[0]
+
+    def _set(self, key: str, vector: np.ndarray) -> None:
+        self._set_many([key], [vector])
+
+    def _get_many(self, keys: List[str]) -> List[Optional[np.ndarray]]:
+        now = time.time()
+        found: Dict[str, np.ndarray] = {}
+        expired: List[str] = []
+        with self._lock:
+            # stay well under SQLite's bound-parameter limit
+            for start in range(0, len(keys), 500):
+                part = keys[start:start + 500]
+                placeholders = ",".join("?" * len(part))
+                rows = self._conn.execute(
+                    f"SELECT key, vector, expires_at FROM embeddings WHERE key IN ({placeholders})", part
+                ).fetchall()
+                for key, blob, expires_at in rows:
+                    if expires_at and expires_at < now:
+                        expired.append(key)
+                    else:
+                        found[key] = np.frombuffer(blob, dtype=np.float32)
+            if expired:
+                self._conn.executemany("DELETE FROM embeddings WHERE key = ?", [(key,) for key in expired])
+                self._count -= len(expired)
+                self._conn.commit()
+            for key in found:
+                self._touched[key] = now
+            if len(self._touched) >= self.TOUCH_FLUSH_ROWS or now - self._touched_at >= self.TOUCH_FLUSH_SECONDS:
+                self._flush_touched()
+                self._conn.commit()
+        return [found.get(key) for key in keys]
+
+    def _set_many(self, keys: List[str], vectors: List[np.ndarray]) -> None:
+        if not keys:
+            return
+        now = time.time()
+        expires_at = now + self.ttl_seconds if self.ttl_seconds else 0.0
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector, expires_at, last_access) VALUES (?, ?, ?, ?)",
+                [(key, vector.tobytes(), expires_at, now) for key, vector in zip(keys, vectors)],
+            )
+            for key in keys:
+                self._touched.pop(key, None)
+            self._count += len(keys)
+            if self._count > self.max_entries + max(1, int(self.max_entries * self.EVICT_SLACK)):
+                self._evict()
+            self._conn.commit()
+
+    def _flush_touched(self) -> None:
+        if self._touched:
+            self._conn.executemany(
+                "UPDATE embeddings SET last_access = ? WHERE key = ?",
+                [(at, key) for key, at in self._touched.items()],
+            )
+            self._touched = {}
+        self._touched_at = time.time()
+
+    def _evict(self) -> None:
+        # the oldest rows over the limit, walking only that many entries of the last_access index
+        self._flush_touched()
+        count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        if count > self.max_entries:
+            self._conn.execute(
+                "DELETE FROM embeddings WHERE key IN ("
+                "SELECT key FROM embeddings ORDER BY last_access ASC LIMIT ?)",
+                (count - self.max_entries,),
+            )
+            logger.info(f"Evicted {count - self.max_entries} entries from the embedding disk cache")
+        self._count = min(count, self.max_entries)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._flush_touched()
+            self._conn.commit()
+            self._conn.close()
+
+
+class TieredEmbeddingCache(EmbeddingCache):
+    """In-process LRU in front of an optional persistent tier; disk hits are promoted."""
+
+    def __init__(
+        self,
+        memory: MemoryEmbeddingCache,
+        disk: Optional[DiskEmbeddingCache] = None,
+        normalize: bool = True,
+    ) -> None:
+        super().__init__(normalize)
+        self.memory = memory
+        self.disk = disk
+
+    def _get(self, key: str) -> Optional[np.ndarray]:
+        return self._get_many([key])[0]
+
+    def _set(self, key: str, vector: np.ndarray) -> None:
+        self._set_many([key], [vector])
+
+    def _get_many(self, keys: List[str]) -> List[Optional[np.ndarray]]:
+        vectors = self.memory._get_many(keys)
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing and self.disk is not None:
+            from_disk = self.disk._get_many([keys[i] for i in missing])
+            promoted = [(keys[i], vector) for i, vector in zip(missing, from_disk) if vector is not None]
+            for i, vector in zip(missing, from_disk):
+                vectors[i] = vector
+            if promoted:
+                self.memory._set_many([key for key, _ in promoted], [vector for _, vector in promoted])
+        return vectors
+
+    def _set_many(self, keys: List[str], vectors: List[np.ndarray]) -> None:
+        self.memory._set_many(keys, vectors)
+        if self.disk is not None:
+            self.disk._set_many(keys, vectors)
+
+    def stats(self) -> Dict:
+        stats = super().stats()
+        stats["memory_size"] = len(self.memory)
+        stats["disk_size"] = len(self.disk) if self.disk is not None else 0
+        return stats
+
+    def __len__(self) -> int:
+        return len(self.memory)
+
+
+def build_embedding_cache(settings) -> Optional[EmbeddingCache]:
+    if not settings.embedding_cache_enabled:
+        return None
+    ttl = settings.embedding_cache_ttl_seconds or None
+    memory = MemoryEmbeddingCache(settings.embedding_cache_max_entries, ttl)
+    disk = None
+    if settings.embedding_cache_path:
+        disk = DiskEmbeddingCache(settings.embedding_cache_path, settings.embedding_cache_disk_max_entries, ttl)
+    return TieredEmbeddingCache(memory, disk)
+
+
+def build_chunk_index(settings) -> Optional[EmbeddingCache]:
+    # Content-addressed: chunk text is hashed verbatim, never normalized
+    if not settings.chunk_index_enabled:
+        return None
+    memory = MemoryEmbeddingCache(settings.chunk_index_memory_entries, normalize=False)
+    disk = None
+    if settings.chunk_index_path:
+        disk = DiskEmbeddingCache(settings.chunk_index_path, settings.chunk_index_max_entries, normalize=False)
+    return TieredEmbeddingCache(memory, disk, normalize=False)
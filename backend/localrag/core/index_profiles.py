@@ -0,0 +1,133 @@
+from typing import Dict, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+METRIC_TYPES = ("L2", "IP", "COSINE")
+
+# The search-time knob of each index type and its default. ef and search_list must be at
+# least the number of hits asked for, so they are raised to the limit when needed.
+SEARCH_PARAMS = {
+    "FLAT": {},
+    "AUTOINDEX": {},
+    "IVF_FLAT": {"nprobe": 10},
+    "IVF_SQ8": {"nprobe": 16},
+    "IVF_PQ": {"nprobe": 16},
+    "HNSW": {"ef": 64},
+    "DISKANN": {"search_list": 100},
+}
+LIMIT_BOUND_PARAMS = ("ef", "search_list")
+
+INDEX_PROFILES = {
+    # what collections were always created with
+    "default": {"index_type": "IVF_FLAT", "build_params": {"nlist": 1024}},
+    # exact search, the ground truth for recall measurements
+    "exact": {"index_type": "FLAT"},
+    "low_latency": {"index_type": "HNSW", "build_params": {"M": 16, "efConstruction": 200}},
+    # 1 byte per dimension instead of 4
+    "memory_lean": {"index_type": "IVF_SQ8", "build_params": {"nlist": 1024}},
+    # 96 subvectors of 16 dimensions at 8 bits, 96 bytes per 1536-d vector
+    "memory_lean_pq": {"index_type": "IVF_PQ", "build_params": {"nlist": 1024, "m": 96, "nbits": 8}},
+    # graph kept on local disk, only compressed vectors in memory
+    "disk": {"index_type": "DISKANN"},
+}
+
+
+class IndexConfig:
+    def __init__(
+        self,
+        index_type: str,
+        metric_type: str = "L2",
+        build_params: Optional[Dict] = None,
+        search_params: Optional[Dict] = None,
+    ) -> None:
+        index_type = index_type.upper()
+        metric_type = metric_type.upper()
+        if index_type not in SEARCH_PARAMS:
+            raise ValueError(f"Unknown index type {index_type!r}, expected one of {tuple(SEARCH_PARAMS)}")
+        if metric_type not in METRIC_TYPES:
+            raise ValueError(f"Unknown metric type {metric_type!r}, expected one of {METRIC_TYPES}")
+        self.index_type = index_type
+        self.metric_type = metric_type
+        self.build_params = dict(build_params or {})
+        self.search_params = {**SEARCH_PARAMS[index_type], **(search_params or {})}
+
+    @property
+    def higher_is_better(self) -> bool:
+        # L2 is a distance, IP and COSINE are similarities
+        return self.metric_type != "L2"
+
+    def milvus_search_params(self, limit: int) -> Dict:
+        params = dict(self.search_params)
+        for name in LIMIT_BOUND_PARAMS:
+            if name in params:
+                params[name] = max(params[name], limit)
+        return {"metric_type": self.metric_type, "params": params}
+
+    def to_dict(self) -> Dict:
+        return {
+            "index_type": self.index_type,
+            "metric_type": self.metric_type,
+            "build_params": self.build_params,
+            "search_params": self.search_params
+        }
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, IndexConfig) and self.to_dict() == other.to_dict()
+
+    def __repr__(self) -> str:
+        return f"IndexConfig({self.index_type}, {self.metric_type}, build={self.build_params}, search={self.search_params})"
+
+    @classmethod
+    def from_description(cls, description: Dict, search_params: Optional[Dict] = None) -> "IndexConfig":
+        # describe_index flattens build params into the top level as strings
+        reserved = {
+            "index_type", "metric_type", "field_name", "index_name", "dim", "params",
+            "total_rows", "indexed_rows", "pending_index_rows", "state"
+        }
+        build_params = {
+            name: _parse_number(value) for name, value in description.items() if name not in reserved
+        }
+        return cls(description["index_type"], description["metric_type"], build_params, search_params)
+
+
+def resolve_index_config(
+    profile: str = "default",
+    index_type: Optional[str] = None,
+    metric_type: Optional[str] = None,
+    build_params: Optional[Dict] = None,
+    search_params: Optional[Dict] = None,
+) -> IndexConfig:
+    # A named profile with any of its fields overridden; switching index type drops the
+    # profile's build params since they belong to the profile's index type
+    if profile not in INDEX_PROFILES:
+        raise ValueError(f"Unknown index profile {profile!r}, expected one of {tuple(INDEX_PROFILES)}")
+    base = INDEX_PROFILES[profile]
+    same_type = index_type is None or index_type.upper() == base["index_type"]
+    return IndexConfig(
+        index_type or base["index_type"],
+        metric_type or base.get("metric_type", "L2"),
+        {**(base.get("build_params", {}) if same_type else {}), **(build_params or {})},
+        {**(base.get("search_params", {}) if same_type else {}), **(search_params or {})}
+    )
+
+
+def index_config_from_settings(settings) -> IndexConfig:
+    return resolve_index_config(
+        settings.milvus_index_profile,
+        settings.milvus_index_type,
+        settings.milvus_metric_type,
+        settings.milvus_index_build_params,
+        settings.milvus_index_search_params
+    )
+
+
+def _parse_number(value):
+    if not isinstance(value, str):
+        return value
+    for parse in (int, float):
+        try:
+            return parse(value)
+        except ValueError:
+            pass
+    return value
@@ -0,0 +1,350 @@
+from abc import ABC, abstractmethod
+from concurrent.futures import Executor
+from contextlib import asynccontextmanager, contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+import asyncio
+import logging
+import time
+
+from .document_processor import DocumentProcessor
+from .client_pool import ClientPool
+from .embedding_batcher import RateLimiter
+from .embedding_cache import EmbeddingCache
+from .lexical_index import LexicalIndex
+from .answer_cache import AnswerCache
+from .vector_store import BulkInsertError, UragEngine
+from ..models.ingest_job import IngestJob, STAGES, StageProgress
+from ..database.mongodb import (
+    create_ingest_job,
+    get_ingest_job,
+    update_ingest_job,
+    get_ingest_jobs_by_status
+)
+
+logger = logging.getLogger(__name__)
+
+class QueueFullError(Exception):
+    pass
+
+class JobStore(ABC):
+    @abstractmethod
+    async def create(self, job: Dict) -> None:
+        ...
+
+    @abstractmethod
+    async def get(self, job_id: str) -> Optional[Dict]:
+        ...
+
+    @abstractmethod
+    async def update(self, job_id: str, fields: Dict) -> None:
+        ...
+
+    @abstractmethod
+    async def find(self, statuses: List[str]) -> List[Dict]:
+        ...
+
+class MongoJobStore(JobStore):
+    async def create(self, job: Dict) -> None:
+        await create_ingest_job(job)
+
+    async def get(self, job_id: str) -> Optional[Dict]:
+        return await get_ingest_job(job_id)
+
+    async def update(self, job_id: str, fields: Dict) -> None:
+        await update_ingest_job(job_id, fields)
+
+    async def find(self, statuses: List[str]) -> List[Dict]:
+        return await get_ingest_jobs_by_status(statuses)
+
+class MemoryJobStore(JobStore):
+    def __init__(self) -> None:
+        self._jobs: Dict[str, Dict] = {}
+
+    async def create(self, job: Dict) -> None:
+        self._jobs[job["id"]] = dict(job)
+
+    async def get(self, job_id: str) -> Optional[Dict]:
+        job = self._jobs.get(job_id)
+        return dict(job) if job else None
+
+    async def update(self, job_id: str, fields: Dict) -> None:
+        self._jobs[job_id].update(fields)
+
+    async def find(self, statuses: List[str]) -> List[Dict]:
+        return [dict(job) for job in self._jobs.values() if job["status"] in statuses]
+
+class IngestJobManager:
+    def __init__(
+        self,
+        store: JobStore,
+        engine: UragEngine,
+        upload_dir: Path,
+        process_pool: Optional[Executor] = None,
+        chunk_index: Optional[EmbeddingCache] = None,
+        rate_limiter: Optional[RateLimiter] = None,
+        client_pool: Optional[ClientPool] = None,
+        lexical_index: Optional[LexicalIndex] = None,
+        answer_cache: Optional[AnswerCache] = None,
+        max_concurrent_jobs: int = 2,
+        queue_size: int = 100,
+        embed_batch_size: int = 512,
+        page_batch_size: int = 32,
+        prefetch_ranges: int = 2,
+    ) -> None:
+        self.store = store
+        self.engine = engine
+        self.upload_dir = upload_dir
+        # uploads wait here until their job succeeds, so only fully indexed files are listed
+        self.staging_dir = upload_dir / ".ingest"
+        self.process_pool = process_pool
+        self.chunk_index = chunk_index
+        self.rate_limiter = rate_limiter
+        self.client_pool = client_pool
+        self.lexical_index = lexical_index
+        self.answer_cache = answer_cache
+        self.max_concurrent_jobs = max_concurrent_jobs
+        self.queue_size = queue_size
+        self.embed_batch_size = embed_batch_size
+        self.page_batch_size = page_batch_size
+        self.prefetch_ranges = prefetch_ranges
+        # API keys only live in memory for the lifetime of a queued job, never in the store
+        self._api_keys: Dict[str, str] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        # queue slots held by submits and retries still writing to the store
+        self._reserved = 0
+        # per filename, a lock and the number of jobs holding or waiting for it
+        self._file_locks: Dict[str, Tuple[asyncio.Lock, int]] = {}
+        self._workers: List[asyncio.Task] = []
+
+    async def start(self) -> None:
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        # Jobs cut off by a restart can't resume on their own since the API key is gone
+        for job in await self.store.find(["queued", "running"]):
+            logger.warning(f"Marking ingest job {job['id']} as interrupted")
+            await self.store.update(job["id"], {
+                "status": "interrupted",
+                "error": "Server restarted before the job finished, retry the job to resume"
+            })
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.max_concurrent_jobs)]
+        logger.info(f"Started {len(self._workers)} ingest workers")
+
+    async def stop(self) -> None:
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    def staged_path(self, job: IngestJob) -> Path:
+        return self.staging_dir / job.id / job.filename
+
+    async def submit(self, job: IngestJob, api_key: Optional[str]) -> IngestJob:
+        with self._reserve_slot():
+            await self.store.create(job.model_dump())
+            self._enqueue(job.id, api_key)
+        return job
+
+    async def retry(self, job_id: str, api_key: Optional[str]) -> Optional[Dict]:
+        job = await self.store.get(job_id)
+        if job is None:
+            return None
+        if job["status"] not in ("failed", "interrupted"):
+            raise ValueError(f"Job {job_id} is {job['status']} and can't be retried")
+        with self._reserve_slot():
+            await self.store.update(job_id, {
+                "status": "queued",
+                "error": None,
+                "stages": {stage: StageProgress().model_dump() for stage in STAGES}
+            })
+            self._enqueue(job_id, api_key)
+        return await self.get(job_id)
+
+    async def get(self, job_id: str) -> Optional[Dict]:
+        job = await self.store.get(job_id)
+        if job is None:
+            return None
+        for stage in job["stages"].values():
+            stage["items_per_second"] = stage["done"] / stage["seconds"] if stage["seconds"] else 0.0
+        job["queue_depth"] = self._queue.qsize() if self._queue else 0
+        return job
+
+    @contextmanager
+    def _reserve_slot(self):
+        # Held across the store write, so submits awaiting theirs can't all pass the check
+        # for the last free slot and then overflow the queue
+        if self.queue_size > 0 and self._queue.qsize() + self._reserved >= self.queue_size:
+            raise QueueFullError("Ingest queue is full, try again later")
+        self._reserved += 1
+        try:
+            yield
+        finally:
+            self._reserved -= 1
+
+    def _enqueue(self, job_id: str, api_key: Optional[str]) -> None:
+        self._api_keys[job_id] = api_key
+        self._queue.put_nowait(job_id)
+
+    async def _worker(self) -> None:
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self._run(job_id)
+            except Exception as e:
+                logger.error(f"Ingest job {job_id} crashed: {e}", exc_info=True)
+            finally:
+                self._queue.task_done()
+
+    async def _save(self, job: IngestJob) -> None:
+        await self.store.update(job.id, job.model_dump())
+
+    @asynccontextmanager
+    async def _file_lock(self, filename: str):
+        lock, users = self._file_locks.get(filename, (asyncio.Lock(), 0))
+        self._file_locks[filename] = (lock, users + 1)
+        try:
+            async with lock:
+                yield
+        finally:
+            lock, users = self._file_locks[filename]
+            if users == 1:
+                del self._file_locks[filename]
+            else:
+                self._file_locks[filename] = (lock, users - 1)
+
+    async def _run(self, job_id: str) -> None:
+        job = IngestJob(**await self.store.get(job_id))
+        # Uploads of the same file run one at a time, so the earlier chunks a job replaces
+        # include everything the job before it wrote
+        async with self._file_lock(job.filename):
+            await self._ingest(job)
+
+    async def _ingest(self, job: IngestJob) -> None:
+        api_key = self._api_keys.pop(job.id, None)
+        job.status = "running"
+        job.attempts += 1
+        job.started_at = datetime.utcnow()
+        job.finished_at = None
+        job.chunks = job.chunks_reused = job.chunks_embedded = 0
+        for stage in job.stages.values():
+            stage.status = "running"
+        await self._save(job)
+        logger.info(f"Running ingest job {job.id} for {job.filename} (attempt {job.attempts})")
+
+        processor = DocumentProcessor(
+            api_key,
+            chunk_index=self.chunk_index,
+            rate_limiter=self.rate_limiter,
+            client_pool=self.client_pool
+        )
+        file_path = self.staged_path(job)
+        stages = job.stages
+        upload_date = datetime.now().isoformat()
+        chunk_options = {
+            "chunk_size": job.chunk_size,
+            "chunk_overlap": job.chunk_overlap,
+            "chunk_unit": job.chunk_unit
+        }
+        pending_insert: Optional[asyncio.Task] = None
+        # ids written by this attempt, and those of an earlier upload of the file that they replace
+        inserted: List[int] = []
+        previous: List[int] = []
+        try:
+            previous = await asyncio.to_thread(self.engine.ids_by_filename, job.filename)
+            # Batches flow through embed while the previous batch is still being inserted,
+            # so at most two batches of chunks are held in memory at once.
+            async for chunks, progress in processor.aiter_chunk_batches(
+                file_path, self.process_pool, self.page_batch_size, self.embed_batch_size, self.prefetch_ranges,
+                chunk_options
+            ):
+                stages["load"].total = progress["total_pages"]
+                stages["load"].done = progress["pages"]
+                stages["load"].seconds = progress["load_seconds"]
+                stages["chunk"].seconds = progress["chunk_seconds"]
+                stages["chunk"].done += len(chunks)
+                job.chunks += len(chunks)
+
+                texts = [chunk['content'] for chunk in chunks]
+                started = time.perf_counter()
+                embeddings, stats = await processor.embed_chunks(texts)
+                stages["embed"].seconds += time.perf_counter() - started
+                stages["embed"].done += len(texts)
+                job.chunks_reused += stats["reused"]
+                job.chunks_embedded += stats["embedded"]
+
+                metadata_list = [{
+                    "source": job.filename,
+                    "type": job.file_type,
+                    "chunk_index": chunk['metadata']['chunk_index'],
+                    "page": chunk['metadata']['page'],
+                    "total_pages": progress["total_pages"],
+                    "upload_date": upload_date
+                } for chunk in chunks]
+                if pending_insert is not None:
+                    await pending_insert
+                pending_insert = asyncio.create_task(self._insert(job, texts, embeddings, metadata_list, inserted))
+                await self._save(job)
+
+            if pending_insert is not None:
+                await pending_insert
+            # the earlier upload stays searchable until this one is fully inserted
+            await self._remove_chunks(job.filename, previous)
+            await asyncio.to_thread(self._publish, job, file_path)
+            # answers drawing on an earlier upload of this file may no longer hold
+            if self.answer_cache is not None:
+                self.answer_cache.invalidate_filename(job.filename)
+            for stage in stages.values():
+                stage.status = "done"
+                stage.total = stage.done
+            job.status = "succeeded"
+            logger.info(f"Ingest job {job.id} finished: {job.chunks} chunks")
+        except Exception as e:
+            logger.error(f"Ingest job {job.id} failed: {e}", exc_info=True)
+            # an insert already handed to a thread can't be stopped, wait for it so its ids are known
+            if pending_insert is not None:
+                await asyncio.gather(pending_insert, return_exceptions=True)
+            job.status = "failed"
+            job.error = str(e)
+            for stage in stages.values():
+                if stage.status == "running":
+                    stage.status = "failed"
+            # drop this attempt's rows so a retry doesn't duplicate them, an earlier upload is kept
+            try:
+                await self._remove_chunks(job.filename, inserted)
+            except Exception as cleanup_error:
+                logger.error(f"Cleanup after failed ingest job {job.id} failed: {cleanup_error}")
+        finally:
+            job.finished_at = datetime.utcnow()
+            await self._save(job)
+
+    async def _remove_chunks(self, filename: str, ids: List[int]) -> None:
+        if not ids:
+            return
+        await asyncio.to_thread(self.engine.delete_by_ids, ids)
+        if self.lexical_index is not None:
+            await asyncio.to_thread(self.lexical_index.remove_ids, filename, ids)
+
+    def _publish(self, job: IngestJob, file_path: Path) -> None:
+        # moves the staged upload over any earlier copy, from here on it is listed as a document
+        file_path.replace(self.upload_dir / job.filename)
+        file_path.parent.rmdir()
+
+    async def _insert(
+        self,
+        job: IngestJob,
+        texts: List[str],
+        embeddings: List[List[float]],
+        metadata_list: List[Dict],
+        inserted: List[int]
+    ) -> None:
+        started = time.perf_counter()
+        try:
+            ids = await asyncio.to_thread(self.engine.add, [job.filename] * len(texts), texts, embeddings, metadata_list)
+        except BulkInsertError as e:
+            inserted.extend(row_id for row_id in e.ids if row_id is not None)
+            raise
+        inserted.extend(ids)
+        if self.lexical_index is not None:
+            await asyncio.to_thread(self.lexical_index.add, [job.filename] * len(texts), texts, ids)
+        job.stages["insert"].seconds += time.perf_counter() - started
+        job.stages["insert"].done += len(texts)
@@ -0,0 +1,245 @@
+from array import array
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+import logging
+import math
+import re
+import threading
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+TOKEN_PATTERN = re.compile(r"\w+(?:[.\-:/]\w+)*")
+PART_PATTERN = re.compile(r"[^\W_]+")
+# postings are rewritten without deleted chunks once they make up this share of the index
+COMPACT_DELETED_FRACTION = 0.25
+MAX_TERM_FREQUENCY = 65535
+
+
+def tokenize(text: str) -> List[str]:
+    tokens = TOKEN_PATTERN.findall(text.lower())
+    # identifiers like ERR_CONN_RESET, v2.3.1 or app/main.py match whole and by their parts
+    compounds = [token for token in tokens if not token.isalnum()]
+    if compounds:
+        tokens.extend(PART_PATTERN.findall(" ".join(compounds)))
+    return tokens
+
+
+class LexicalIndex:
+    """In-memory BM25 index over chunk text, updated in place as documents are uploaded and deleted.
+
+    Postings are two typed arrays per term, chunk numbers (uint32) and term frequencies
+    (uint16), so a posting costs 6 bytes and adding a chunk only appends to them. Deleted
+    chunks are tombstoned and dropped from the postings by a compaction once they pile up;
+    until then they still count towards document frequencies.
+
+    Only ids and term statistics are kept, not the chunk text: hits carry the vector store
+    id, and callers fetch the text of the few they keep with UragEngine.get_chunks.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75) -> None:
+        self.k1 = k1
+        self.b = b
+        self.ready = False
+        self._postings: Dict[str, Tuple[array, array]] = {}
+        self._lengths = array("I")
+        self._deleted = bytearray()
+        self._filenames: List[str] = []
+        # vector store ids, to fetch the text of hits and match them to the vector search's
+        self._ids: List[Optional[int]] = []
+        self._by_filename: Dict[str, List[int]] = defaultdict(list)
+        self._live = 0
+        self._total_length = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self._live
+
+    def load(self, batches: Iterable[List[Dict]]) -> None:
+        # batches of {"id", "filename", "content"} rows, from the vector store at startup
+        for rows in batches:
+            self.add([row["filename"] for row in rows], [row["content"] for row in rows], [row.get("id") for row in rows])
+        self.ready = True
+        logger.info(f"Lexical index ready: {self._live} chunks, {len(self._postings)} terms")
+
+    def add(self, filenames: List[str], texts: List[str], ids: Optional[List[Optional[int]]] = None) -> None:
+        # Tokenized outside the lock, then (term, chunk) pairs are counted and grouped by term
+        # with numpy, so a batch costs one extend per distinct term instead of one per posting
+        vocabulary: Dict[str, int] = {}
+        term_ids: List[int] = []
+        lengths: List[int] = []
+        for text in texts:
+            tokens = tokenize(text)
+            term_ids.extend([vocabulary.setdefault(token, len(vocabulary)) for token in tokens])
+            lengths.append(len(tokens))
+        terms = list(vocabulary)
+        pairs = np.asarray(term_ids, dtype=np.int64) * len(texts) + np.repeat(np.arange(len(texts)), lengths)
+        pairs, frequencies = np.unique(pairs, return_counts=True)
+        pair_terms = pairs // len(texts) if len(texts) else pairs
+        frequencies = np.minimum(frequencies, MAX_TERM_FREQUENCY).astype(np.uint16)
+        bounds = (np.flatnonzero(np.diff(pair_terms)) + 1).tolist()
+
+        with self._lock:
+            first = len(self._lengths)
+            chunks = (pairs % max(len(texts), 1) + first).astype(np.uint32)
+            for start, end in zip([0] + bounds, bounds + [len(pairs)]):
+                if start == end:
+                    continue
+                term = terms[pair_terms[start]]
+                postings = self._postings.get(term)
+                if postings is None:
+                    postings = self._postings[term] = (array("I"), array("H"))
+                postings[0].frombytes(chunks[start:end].tobytes())
+                postings[1].frombytes(frequencies[start:end].tobytes())
+            for offset, filename in enumerate(filenames):
+                self._by_filename[filename].append(first + offset)
+            self._lengths.extend(lengths)
+            self._deleted.extend(bytes(len(texts)))
+            self._filenames.extend(filenames)
+            self._ids.extend(ids if ids is not None else [None] * len(texts))
+            self._live += len(texts)
+            self._total_length += sum(lengths)
+
+    def remove_filename(self, filename: str) -> int:
+        with self._lock:
+            chunks = self._by_filename.pop(filename, [])
+            self._tombstone(chunks)
+        return len(chunks)
+
+    def remove_ids(self, filename: str, ids: Iterable[int]) -> int:
+        # only these chunks of the file, e.g. the rows of one upload replaced by the next
+        ids = set(ids)
+        with self._lock:
+            chunks = self._by_filename.get(filename, [])
+            removed = [chunk for chunk in chunks if self._ids[chunk] in ids]
+            kept = [chunk for chunk in chunks if self._ids[chunk] not in ids]
+            if kept:
+                self._by_filename[filename] = kept
+            else:
+                self._by_filename.pop(filename, None)
+            self._tombstone(removed)
+        return len(removed)
+
+    def search(self, query: str, limit: int = 5, filenames: Optional[List[str]] = None) -> List[Dict]:
+        terms = set(tokenize(query))
+        with self._lock:
+            scores = self._score(terms)
+            if scores is None:
+                return []
+            if filenames is not None:
+                allowed = np.zeros(len(scores), dtype=bool)
+                for filename in filenames:
+                    allowed[self._by_filename.get(filename, [])] = True
+                scores[~allowed] = 0
+            return self._top(scores, limit)
+
+    def search_files(self, query: str, filenames: List[str], limit: int = 5) -> Dict[str, List[Dict]]:
+        # top hits per file from a single scoring pass
+        terms = set(tokenize(query))
+        with self._lock:
+            scores = self._score(terms)
+            results = {}
+            for filename in dict.fromkeys(filenames):
+                chunks = self._by_filename.get(filename)
+                if scores is None or not chunks:
+                    results[filename] = []
+                    continue
+                file_scores = np.zeros(len(scores), dtype=np.float32)
+                file_scores[chunks] = scores[chunks]
+                results[filename] = self._top(file_scores, limit)
+            return results
+
+    def stats(self) -> Dict:
+        return {
+            "ready": self.ready,
+            "chunks": self._live,
+            "terms": len(self._postings),
+            "postings": sum(len(postings[0]) for postings in self._postings.values()),
+        }
+
+    def _score(self, terms: Iterable[str]) -> Optional[np.ndarray]:
+        # Runs under the lock: the arrays are viewed in place, and an array can't grow while viewed
+        if not self._live:
+            return None
+        lengths = np.frombuffer(self._lengths, dtype=np.uint32)
+        average_length = max(self._total_length / self._live, 1.0)
+        scores = np.zeros(len(lengths), dtype=np.float32)
+        for term in terms:
+            postings = self._postings.get(term)
+            if postings is None:
+                continue
+            chunks = np.frombuffer(postings[0], dtype=np.uint32)
+            frequencies = np.frombuffer(postings[1], dtype=np.uint16).astype(np.float32)
+            idf = math.log(1 + (self._live - len(chunks) + 0.5) / (len(chunks) + 0.5))
+            norm = self.k1 * (1 - self.b + self.b * lengths[chunks] / average_length)
+            scores[chunks] += idf * frequencies * (self.k1 + 1) / (frequencies + norm)
+        scores[np.frombuffer(self._deleted, dtype=np.uint8).astype(bool)] = 0
+        return scores
+
+    def _top(self, scores: np.ndarray, limit: int) -> List[Dict]:
+        candidates = np.flatnonzero(scores > 0)
+        if len(candidates) > limit:
+            candidates = candidates[np.argpartition(-scores[candidates], limit - 1)[:limit]]
+        candidates = candidates[np.argsort(-scores[candidates], kind="stable")]
+        hits = []
+        for chunk in candidates.tolist():
+            hit = {"filename": self._filenames[chunk], "score": float(scores[chunk])}
+            if self._ids[chunk] is not None:
+                hit["id"] = self._ids[chunk]
+            hits.append(hit)
+        return hits
+
+    def _tombstone(self, chunks: List[int]) -> None:
+        for chunk in chunks:
+            if not self._deleted[chunk]:
+                self._deleted[chunk] = 1
+                self._live -= 1
+                self._total_length -= self._lengths[chunk]
+        deleted = len(self._lengths) - self._live
+        if deleted > COMPACT_DELETED_FRACTION * len(self._lengths):
+            self._compact()
+
+    def _compact(self) -> None:
+        live = np.frombuffer(self._deleted, dtype=np.uint8) == 0
+        renumber = np.cumsum(live, dtype=np.int64) - 1
+        postings = {}
+        for term, (chunks, frequencies) in self._postings.items():
+            old = np.frombuffer(chunks, dtype=np.uint32)
+            keep = live[old]
+            if keep.any():
+                postings[term] = (
+                    array("I", renumber[old[keep]].astype(np.uint32).tobytes()),
+                    array("H", np.frombuffer(frequencies, dtype=np.uint16)[keep].tobytes())
+                )
+            del old, keep
+        kept = np.flatnonzero(live).tolist()
+        del live
+        self._postings = postings
+        self._lengths = array("I", [self._lengths[chunk] for chunk in kept])
+        self._deleted = bytearray(len(kept))
+        self._filenames = [self._filenames[chunk] for chunk in kept]
+        self._ids = [self._ids[chunk] for chunk in kept]
+        self._by_filename = defaultdict(list)
+        for chunk, filename in enumerate(self._filenames):
+            self._by_filename[filename].append(chunk)
+        logger.info(f"Compacted lexical index to {len(kept)} chunks and {len(postings)} terms")
+
+
+def build_lexical_index(settings) -> Optional[LexicalIndex]:
+    if not settings.lexical_index_enabled:
+        return None
+    return LexicalIndex(settings.bm25_k1, settings.bm25_b)
+
+
+def reciprocal_rank_fusion(rankings: List[List[Dict]], limit: int = 5, k: int = 60) -> List[Dict]:
+    # Hits are matched on (filename, content) across rankings and scored by sum(1 / (k + rank))
+    scores: Dict[Tuple, float] = defaultdict(float)
+    hits: Dict[Tuple, Dict] = {}
+    for ranking in rankings:
+        for rank, hit in enumerate(ranking, start=1):
+            key = (hit.get("filename"), hit["content"])
+            scores[key] += 1.0 / (k + rank)
+            hits.setdefault(key, hit)
+    ordered = sorted(scores, key=lambda key: -scores[key])[:limit]
+    return [{**hits[key], "score": scores[key]} for key in ordered]
@@ -0,0 +1,584 @@
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+import json
+import logging
+import os
+import re
+import shutil
+import struct
+import threading
+import zlib
+
+import numpy as np
+from pymilvus import DataType
+from pymilvus.client.types import LoadState
+
+from .vector_client import VectorClient
+
+logger = logging.getLogger(__name__)
+
+SEGMENT_ROWS = 8192
+# query vectors scored against a segment at once, bounds the score matrix to QUERY_BLOCK x SEGMENT_ROWS
+QUERY_BLOCK = 256
+# a sealed segment is rewritten once more than this fraction of its rows is deleted
+COMPACT_DELETED_FRACTION = 0.5
+
+FILTER_PATTERN = re.compile(r"\s*(\w+)\s*(==|in)\s*(.+?)\s*", re.S)
+SEGMENT_FILE_PATTERN = re.compile(r"seg_(\d+)\.(?:ids\.npy|vectors\.npy|rows\.json)(?:\.tmp)?")
+SEGMENT_SUFFIXES = ("ids.npy", "vectors.npy", "rows.json")
+WAL_FILE_PATTERN = re.compile(r"wal_(\d+)\.bin")
+# a log record is its body length and crc32, then the body: int64 id, float32 vector, JSON row
+WAL_HEADER = struct.Struct("<II")
+WAL_ID = struct.Struct("<q")
+
+Filter = Optional[Tuple[str, Set]]
+
+
+class _Segment:
+    """Rows whose vectors sit in one contiguous float32 matrix, memory-mapped once sealed to disk."""
+
+    def __init__(self, ids: np.ndarray, vectors: np.ndarray, rows: List[Dict], number: Optional[int] = None) -> None:
+        self.ids = ids
+        self.vectors = vectors
+        self.rows = rows
+        self.number = number
+        self.live = np.ones(len(ids), dtype=bool)
+        self.positions = {int(row_id): i for i, row_id in enumerate(ids.tolist())}
+        by_filename: Dict[str, List[int]] = {}
+        for i, row in enumerate(rows):
+            by_filename.setdefault(row.get("filename", ""), []).append(i)
+        self.by_filename = {name: np.array(positions) for name, positions in by_filename.items()}
+        self._norms = None
+
+    @property
+    def norms(self) -> np.ndarray:
+        if self._norms is None:
+            self._norms = np.einsum("ij,ij->i", self.vectors, self.vectors)
+        return self._norms
+
+    def mask(self, parsed: Filter) -> np.ndarray:
+        if parsed is None:
+            return self.live
+        field, values = parsed
+        mask = np.zeros(len(self.ids), dtype=bool)
+        if field == "filename":
+            for value in values:
+                positions = self.by_filename.get(value)
+                if positions is not None:
+                    mask[positions] = True
+        elif field == "id":
+            for value in values:
+                position = self.positions.get(int(value))
+                if position is not None:
+                    mask[position] = True
+        else:
+            raise ValueError(f"Filtering on {field} isn't supported by the local vector store")
+        return mask & self.live
+
+
+class _Collection:
+    def __init__(self, name: str, path: Optional[Path], meta: Dict, segment_rows: int) -> None:
+        self.name = name
+        self.path = path
+        self.meta = meta
+        self.segment_rows = segment_rows
+        self.segments: List[_Segment] = []
+        # rows not sealed into a segment yet, also appended to the write-ahead log on disk
+        self.growing: List[Tuple[int, np.ndarray, Dict]] = []
+        self.deleted: Set[int] = set()
+        self.next_id = 1
+        self._next_segment = 0
+        # number of the write-ahead log the manifest points at, a seal moves on to a new one
+        self._wal = 0
+        self._growing_segment: Optional[_Segment] = None
+
+    @property
+    def dim(self) -> int:
+        return self.meta["dim"]
+
+    @property
+    def metric_type(self) -> str:
+        return self.meta["index"].get("metric_type", "L2")
+
+    def open(self) -> None:
+        # The manifest lists the committed segments, the deleted ids and the log of unsealed
+        # rows. Segment and log files it doesn't list are left over from a seal or compaction
+        # that never committed, or one that committed but crashed before cleaning up.
+        if self.path is None:
+            return
+        manifest_path = self.path / "manifest.json"
+        manifest = (
+            json.loads(manifest_path.read_text()) if manifest_path.exists()
+            else {"segments": [], "deleted": [], "wal": 0}
+        )
+        self.deleted = set(manifest["deleted"])
+        self._wal = manifest["wal"]
+        for number in manifest["segments"]:
+            prefix = self.path / f"seg_{number:06d}"
+            segment = _Segment(
+                np.load(f"{prefix}.ids.npy"),
+                np.load(f"{prefix}.vectors.npy", mmap_mode="r"),
+                json.loads(Path(f"{prefix}.rows.json").read_text()),
+                number
+            )
+            self._apply_deleted(segment)
+            self.segments.append(segment)
+            if len(segment.ids):
+                self.next_id = max(self.next_id, int(segment.ids.max()) + 1)
+        self._next_segment = max(manifest["segments"], default=-1) + 1
+        listed = set(manifest["segments"])
+        for name in os.listdir(self.path):
+            match = SEGMENT_FILE_PATTERN.fullmatch(name)
+            if match and int(match.group(1)) not in listed:
+                (self.path / name).unlink()
+            match = WAL_FILE_PATTERN.fullmatch(name)
+            if match and int(match.group(1)) != self._wal:
+                (self.path / name).unlink()
+        for row_id, vector, row in self._read_wal():
+            self.growing.append((row_id, vector, row))
+            self.next_id = max(self.next_id, row_id + 1)
+        logger.info(f"Opened local collection {self.name}: {len(self.segments)} segments, {len(self.growing)} unsealed rows")
+
+    def insert(self, data: List[Dict]) -> List[int]:
+        primary, vector_field = self.meta["primary_field"], self.meta["vector_field"]
+        entries = []
+        for row in data:
+            row = dict(row)
+            if self.meta["auto_id"]:
+                if primary in row:
+                    raise ValueError(f"{self.name} assigns its own ids, got an explicit {primary}")
+                row_id = self.next_id
+            else:
+                if primary not in row:
+                    raise ValueError(f"{self.name} needs an explicit {primary} for every row")
+                row_id = int(row.pop(primary))
+            vector = np.asarray(row.pop(vector_field), dtype=np.float32)
+            if vector.shape != (self.dim,):
+                raise ValueError(f"Expected a {self.dim} dimensional vector, got shape {vector.shape}")
+            self.next_id = max(self.next_id, row_id + 1)
+            entries.append((row_id, vector, row))
+
+        if self.path is not None:
+            with open(self._wal_path(), "ab") as f:
+                f.write(b"".join(_wal_record(row_id, vector, row) for row_id, vector, row in entries))
+        self.growing.extend(entries)
+        self._growing_segment = None
+        if len(self.growing) >= self.segment_rows:
+            self.seal()
+        return [row_id for row_id, _, _ in entries]
+
+    def seal(self) -> None:
+        live = [entry for entry in self.growing if entry[0] not in self.deleted]
+        dropped = {entry[0] for entry in self.growing} & self.deleted
+        if live:
+            ids = np.array([row_id for row_id, _, _ in live], dtype=np.int64)
+            vectors = np.stack([vector for _, vector, _ in live]).astype(np.float32, copy=False)
+            self.segments.append(self._write_segment(ids, vectors, [row for _, _, row in live]))
+        self.growing = []
+        self._growing_segment = None
+        self.deleted -= dropped
+        if self.path is not None:
+            # the manifest switches to a fresh log along with the new segment, so a crash either
+            # side of it reopens with the old segments and log or the new ones, never a mix
+            sealed_wal = self._wal_path()
+            self._wal += 1
+            self._save_manifest()
+            sealed_wal.unlink(missing_ok=True)
+
+    def delete(self, parsed: Filter) -> int:
+        if parsed is None:
+            raise ValueError("Deleting needs a filter")
+        ids = []
+        for segment in self.snapshot():
+            ids.extend(segment.ids[segment.mask(parsed)].tolist())
+        if not ids:
+            return 0
+        self.deleted.update(ids)
+        for segment in self.segments:
+            self._apply_deleted(segment)
+        self._growing_segment = None
+        retired = [
+            self._compact(segment) for segment in list(self.segments)
+            if (~segment.live).sum() > COMPACT_DELETED_FRACTION * len(segment.ids)
+        ]
+        if self.path is not None:
+            self._save_manifest()
+            # only once the manifest points at their replacements
+            for segment in retired:
+                self._remove_segment_files(segment)
+        return len(ids)
+
+    def snapshot(self) -> List[_Segment]:
+        if self._growing_segment is None and self.growing:
+            live = [entry for entry in self.growing if entry[0] not in self.deleted]
+            if live:
+                self._growing_segment = _Segment(
+                    np.array([row_id for row_id, _, _ in live], dtype=np.int64),
+                    np.stack([vector for _, vector, _ in live]),
+                    [row for _, _, row in live]
+                )
+        return self.segments + ([self._growing_segment] if self._growing_segment is not None else [])
+
+    def _apply_deleted(self, segment: _Segment) -> None:
+        for row_id in self.deleted:
+            position = segment.positions.get(row_id)
+            if position is not None:
+                segment.live[position] = False
+
+    def _compact(self, segment: _Segment) -> _Segment:
+        # returns the replaced segment, its files go once the manifest no longer lists it
+        keep = np.flatnonzero(segment.live)
+        index = self.segments.index(segment)
+        replacement = self._write_segment(
+            segment.ids[keep], np.ascontiguousarray(segment.vectors[keep]), [segment.rows[i] for i in keep]
+        )
+        self.segments[index] = replacement
+        self.deleted -= set(segment.ids[~segment.live].tolist())
+        logger.info(f"Compacted a segment of {self.name} from {len(segment.ids)} to {len(keep)} rows")
+        return segment
+
+    def _write_segment(self, ids: np.ndarray, vectors: np.ndarray, rows: List[Dict]) -> _Segment:
+        number = self._next_segment
+        self._next_segment += 1
+        if self.path is None:
+            return _Segment(ids, vectors, rows, number)
+        prefix = self.path / f"seg_{number:06d}"
+        _write_atomic(f"{prefix}.ids.npy", lambda f: np.save(f, ids))
+        _write_atomic(f"{prefix}.vectors.npy", lambda f: np.save(f, vectors))
+        _write_atomic(f"{prefix}.rows.json", lambda f: f.write(json.dumps(rows).encode("utf-8")))
+        return _Segment(ids, np.load(f"{prefix}.vectors.npy", mmap_mode="r"), rows, number)
+
+    def _remove_segment_files(self, segment: _Segment) -> None:
+        if segment.number is not None:
+            for suffix in SEGMENT_SUFFIXES:
+                (self.path / f"seg_{segment.number:06d}.{suffix}").unlink(missing_ok=True)
+
+    def _save_manifest(self) -> None:
+        # the commit point of every seal, delete and compaction: written last and renamed into place
+        manifest = {
+            "segments": [segment.number for segment in self.segments],
+            "deleted": sorted(self.deleted),
+            "wal": self._wal
+        }
+        _write_atomic(self.path / "manifest.json", lambda f: f.write(json.dumps(manifest).encode("utf-8")))
+
+    def _wal_path(self) -> Path:
+        return self.path / f"wal_{self._wal:06d}.bin"
+
+    def _read_wal(self) -> List[Tuple[int, np.ndarray, Dict]]:
+        wal_path = self._wal_path()
+        if not wal_path.exists():
+            return []
+        data = wal_path.read_bytes()
+        entries = []
+        offset = 0
+        while offset < len(data):
+            if offset + WAL_HEADER.size > len(data):
+                break
+            length, checksum = WAL_HEADER.unpack_from(data, offset)
+            body = data[offset + WAL_HEADER.size:offset + WAL_HEADER.size + length]
+            if len(body) < length or zlib.crc32(body) != checksum:
+                break
+            vector_end = WAL_ID.size + 4 * self.dim
+            entries.append((
+                WAL_ID.unpack_from(body)[0],
+                np.frombuffer(body[WAL_ID.size:vector_end], dtype="<f4").astype(np.float32),
+                json.loads(body[vector_end:])
+            ))
+            offset += WAL_HEADER.size + length
+        if offset < len(data):
+            # a torn final write, cut off so that later appends stay readable
+            logger.warning(f"Dropping {len(data) - offset} bytes of a torn write at the end of {wal_path}")
+            with open(wal_path, "r+b") as f:
+                f.truncate(offset)
+        return entries
+
+
+class _RowIterator:
+    def __init__(self, rows: Iterator[Dict], batch_size: int) -> None:
+        self._rows = rows
+        self.batch_size = batch_size
+
+    def next(self) -> List[Dict]:
+        batch = []
+        for row in self._rows:
+            batch.append(row)
+            if len(batch) >= self.batch_size:
+                break
+        return batch
+
+    def close(self) -> None:
+        self._rows = iter(())
+
+
+class LocalVectorClient(VectorClient):
+    """In-process vector store with exact, vectorized search, for running without a Milvus server.
+
+    Each collection is a directory of sealed segments (ids, a float32 vector matrix that is
+    memory-mapped on open, and the scalar fields as JSON), a manifest naming the live segments
+    and deleted ids, and a binary write-ahead log of rows not sealed yet. With no path everything stays in memory. Any index type is accepted and
+    searched exactly with the index's metric, so recall is always 1.0.
+    """
+
+    def __init__(self, path: Optional[str] = None, segment_rows: int = SEGMENT_ROWS) -> None:
+        self.path = Path(path) if path else None
+        self.segment_rows = segment_rows
+        self._collections: Dict[str, _Collection] = {}
+        self._lock = threading.RLock()
+        if self.path is not None:
+            self.path.mkdir(parents=True, exist_ok=True)
+            for meta_path in sorted(self.path.glob("*/meta.json")):
+                name = meta_path.parent.name
+                collection = _Collection(name, meta_path.parent, json.loads(meta_path.read_text()), segment_rows)
+                collection.open()
+                self._collections[name] = collection
+
+    def list_collections(self, **kwargs) -> List[str]:
+        with self._lock:
+            return list(self._collections)
+
+    def create_collection(self, collection_name: str, schema=None, index_params=None, **kwargs) -> None:
+        if schema is None:
+            raise ValueError("The local vector store needs a schema to create a collection")
+        with self._lock:
+            if collection_name in self._collections:
+                raise ValueError(f"Collection {collection_name} already exists")
+            primary = next(field.name for field in schema.fields if field.is_primary)
+            vector = next(field for field in schema.fields if field.dtype == DataType.FLOAT_VECTOR)
+            index = next(iter(index_params or []), None) or {"index_type": "FLAT", "metric_type": "L2"}
+            meta = {
+                "auto_id": schema.auto_id,
+                "primary_field": primary,
+                "vector_field": vector.name,
+                "dim": int(vector.params["dim"]),
+                "index": {
+                    "index_type": index["index_type"],
+                    "metric_type": index.get("metric_type") or "L2",
+                    # pymilvus copies index_type and metric_type into params as well
+                    "params": {
+                        name: value for name, value in (index.get("params") or {}).items()
+                        if name not in ("index_type", "metric_type")
+                    }
+                }
+            }
+            path = None
+            if self.path is not None:
+                path = self.path / collection_name
+                path.mkdir()
+                _write_atomic(path / "meta.json", lambda f: f.write(json.dumps(meta).encode("utf-8")))
+            self._collections[collection_name] = _Collection(collection_name, path, meta, self.segment_rows)
+
+    def drop_collection(self, collection_name: str, **kwargs) -> None:
+        with self._lock:
+            collection = self._collections.pop(collection_name, None)
+            if collection is not None and collection.path is not None:
+                shutil.rmtree(collection.path)
+
+    def describe_index(self, collection_name: str, index_name: str, **kwargs) -> Dict:
+        index = self._get(collection_name).meta["index"]
+        return {
+            "index_type": index["index_type"],
+            "metric_type": index["metric_type"],
+            **{name: str(value) for name, value in index["params"].items()},
+            "field_name": self._get(collection_name).meta["vector_field"],
+            "index_name": index_name,
+        }
+
+    def load_collection(self, collection_name: str, **kwargs) -> None:
+        # segments are opened with the client, there is nothing to load
+        self._get(collection_name)
+
+    def release_collection(self, collection_name: str, **kwargs) -> None:
+        self._get(collection_name)
+
+    def get_load_state(self, collection_name: str, **kwargs) -> Dict:
+        self._get(collection_name)
+        return {"state": LoadState.Loaded}
+
+    def insert(self, collection_name: str, data: List[Dict], **kwargs) -> Dict:
+        rows = data if isinstance(data, list) else [data]
+        with self._lock:
+            ids = self._get(collection_name).insert(rows)
+        return {"insert_count": len(ids), "ids": ids}
+
+    def delete(self, collection_name: str, filter: str = "", **kwargs) -> Dict:
+        with self._lock:
+            count = self._get(collection_name).delete(_parse_filter(filter))
+        return {"delete_count": count}
+
+    def flush(self, collection_name: str, **kwargs) -> None:
+        with self._lock:
+            self._get(collection_name).seal()
+
+    def search(
+        self,
+        collection_name: str,
+        data: List[List[float]],
+        filter: str = "",
+        limit: int = 10,
+        output_fields: Optional[List[str]] = None,
+        search_params: Optional[Dict] = None,
+        **kwargs
+    ) -> List[List[Dict]]:
+        collection = self._get(collection_name)
+        metric = collection.metric_type
+        requested = (search_params or {}).get("metric_type")
+        if requested and requested.upper() != metric:
+            raise ValueError(f"{collection_name} is indexed with {metric}, can't search it with {requested}")
+        parsed = _parse_filter(filter)
+        queries = np.asarray(data, dtype=np.float32).reshape(len(data), -1)
+        if queries.shape[1] != collection.dim:
+            raise ValueError(f"Expected {collection.dim} dimensional query vectors, got {queries.shape[1]}")
+        with self._lock:
+            segments = collection.snapshot()
+        # the arrays of a snapshot are never modified in place except live masks, so scoring runs unlocked
+        results = []
+        for start in range(0, len(queries), QUERY_BLOCK):
+            results.extend(self._search_block(
+                collection, segments, queries[start:start + QUERY_BLOCK], parsed, limit, output_fields or []
+            ))
+        return results
+
+    def _search_block(
+        self,
+        collection: _Collection,
+        segments: List[_Segment],
+        queries: np.ndarray,
+        parsed: Filter,
+        limit: int,
+        output_fields: List[str],
+    ) -> List[List[Dict]]:
+        metric = collection.metric_type
+        query_norms = np.einsum("ij,ij->i", queries, queries)
+        keys, owners, positions = [], [], []
+        for number, segment in enumerate(segments):
+            selected = np.flatnonzero(segment.mask(parsed))
+            if not len(selected):
+                continue
+            everything = len(selected) == len(segment.ids)
+            vectors = segment.vectors if everything else segment.vectors[selected]
+            norms = segment.norms if everything else segment.norms[selected]
+            segment_keys = _score_keys(queries, query_norms, vectors, norms, metric)
+            k = min(limit, segment_keys.shape[1])
+            top = np.argpartition(segment_keys, k - 1, axis=1)[:, :k]
+            keys.append(np.take_along_axis(segment_keys, top, axis=1))
+            owners.append(np.full(top.shape, number))
+            positions.append(selected[top])
+        if not keys:
+            return [[] for _ in queries]
+
+        keys = np.concatenate(keys, axis=1)
+        owners = np.concatenate(owners, axis=1)
+        positions = np.concatenate(positions, axis=1)
+        order = np.argsort(keys, axis=1, kind="stable")[:, :limit]
+        results = []
+        for row_order, row_keys, row_owners, row_positions in zip(order, keys, owners, positions):
+            hits = []
+            for column in row_order:
+                segment = segments[row_owners[column]]
+                position = int(row_positions[column])
+                key = float(row_keys[column])
+                hits.append({
+                    "id": int(segment.ids[position]),
+                    # Milvus reports squared L2 distances and raw IP / cosine similarities
+                    "distance": key if metric == "L2" else -key,
+                    "entity": _entity(collection, segment, position, output_fields)
+                })
+            results.append(hits)
+        return results
+
+    def get(self, collection_name: str, ids: List[int], output_fields: Optional[List[str]] = None, **kwargs) -> List[Dict]:
+        collection = self._get(collection_name)
+        fields = (output_fields or ["*"]) + [collection.meta["primary_field"]]
+        with self._lock:
+            segments = collection.snapshot()
+        rows = []
+        for row_id in ids:
+            for segment in segments:
+                position = segment.positions.get(int(row_id))
+                if position is not None and segment.live[position]:
+                    rows.append(_entity(collection, segment, position, fields))
+                    break
+        return rows
+
+    def query_iterator(
+        self, collection_name: str, batch_size: int = 1000, output_fields: Optional[List[str]] = None, filter: str = "", **kwargs
+    ):
+        collection = self._get(collection_name)
+        parsed = _parse_filter(filter)
+        with self._lock:
+            segments = collection.snapshot()
+
+        def rows():
+            for segment in segments:
+                for position in np.flatnonzero(segment.mask(parsed)):
+                    yield _entity(collection, segment, int(position), output_fields or ["*"])
+
+        return _RowIterator(rows(), batch_size)
+
+    def close(self) -> None:
+        # unsealed rows are already in the log, nothing is lost by not sealing them here
+        with self._lock:
+            self._collections.clear()
+
+    def _get(self, collection_name: str) -> _Collection:
+        collection = self._collections.get(collection_name)
+        if collection is None:
+            raise ValueError(f"Collection {collection_name} doesn't exist")
+        return collection
+
+
+def _score_keys(queries: np.ndarray, query_norms: np.ndarray, vectors: np.ndarray, norms: np.ndarray, metric: str) -> np.ndarray:
+    # lower is better for every metric, similarities are negated
+    dots = queries @ vectors.T
+    if metric == "L2":
+        return np.maximum(query_norms[:, None] - 2 * dots + norms[None, :], 0)
+    if metric == "IP":
+        return -dots
+    scale = np.sqrt(query_norms)[:, None] * np.sqrt(norms)[None, :]
+    return -dots / np.maximum(scale, 1e-12)
+
+
+def _entity(collection: _Collection, segment: _Segment, position: int, output_fields: List[str]) -> Dict:
+    row = segment.rows[position]
+    primary, vector_field = collection.meta["primary_field"], collection.meta["vector_field"]
+    if "*" in output_fields:
+        return {primary: int(segment.ids[position]), **row, vector_field: segment.vectors[position].tolist()}
+    entity = {}
+    for field in output_fields:
+        if field == primary:
+            entity[field] = int(segment.ids[position])
+        elif field == vector_field:
+            entity[field] = segment.vectors[position].tolist()
+        elif field in row:
+            entity[field] = row[field]
+    return entity
+
+
+def _wal_record(row_id: int, vector: np.ndarray, row: Dict) -> bytes:
+    body = WAL_ID.pack(row_id) + vector.astype("<f4").tobytes() + json.dumps(row).encode("utf-8")
+    return WAL_HEADER.pack(len(body), zlib.crc32(body)) + body
+
+
+def _parse_filter(expression: str) -> Filter:
+    # only the expressions UragEngine builds: `field == value` and `field in [values]`
+    if not expression or not expression.strip():
+        return None
+    match = FILTER_PATTERN.fullmatch(expression)
+    if match is None:
+        raise ValueError(f"Unsupported filter expression: {expression}")
+    field, op, value = match.groups()
+    try:
+        value = json.loads(value)
+    except ValueError:
+        raise ValueError(f"Unsupported filter value in: {expression}")
+    if op == "in" and not isinstance(value, list):
+        raise ValueError(f"Expected a list after `in` in: {expression}")
+    return field, set(value) if op == "in" else {value}
+
+
+def _write_atomic(path, write) -> None:
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        write(f)
+    os.replace(tmp, path)
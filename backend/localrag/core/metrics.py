@@ -0,0 +1,37 @@
+from collections import defaultdict, deque
+from typing import Deque, Dict
+import threading
+
+
+class LatencyTracker:
+    """Keeps the most recent samples per metric name and reports percentiles in milliseconds."""
+
+    def __init__(self, max_samples: int = 1000) -> None:
+        self.max_samples = max_samples
+        self._samples: Dict[str, Deque[float]] = defaultdict(lambda: deque(maxlen=self.max_samples))
+        self._counts: Dict[str, int] = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def record(self, name: str, seconds: float) -> None:
+        with self._lock:
+            self._samples[name].append(seconds)
+            self._counts[name] += 1
+
+    def summary(self) -> Dict[str, Dict]:
+        with self._lock:
+            snapshot = {name: sorted(samples) for name, samples in self._samples.items()}
+            counts = dict(self._counts)
+        return {
+            name: {
+                "count": counts[name],
+                "p50_ms": _percentile(samples, 0.50) * 1000,
+                "p95_ms": _percentile(samples, 0.95) * 1000,
+                "p99_ms": _percentile(samples, 0.99) * 1000,
+                "max_ms": samples[-1] * 1000,
+            }
+            for name, samples in snapshot.items() if samples
+        }
+
+
+def _percentile(samples, fraction: float) -> float:
+    return samples[min(len(samples) - 1, int(len(samples) * fraction))]
@@ -0,0 +1,99 @@
+from typing import Dict, List, Optional
+import logging
+import time
+
+import numpy as np
+
+from .embedding_batcher import TokenCounter, default_token_counter
+
+logger = logging.getLogger(__name__)
+
+
+class Reranker:
+    """Picks the chunks that go into the prompt from an over-fetched candidate list.
+
+    Exact and near-duplicate chunks (cosine similarity above dedup_similarity) are dropped,
+    the rest are ordered by maximal marginal relevance and added until `limit` chunks or
+    `token_budget` tokens. Once `budget_ms` is spent the remaining picks are made in
+    relevance order without the diversity term, which keeps the stage bounded for large
+    candidate lists.
+    """
+
+    def __init__(
+        self,
+        limit: int = 8,
+        token_budget: int = 3000,
+        dedup_similarity: float = 0.95,
+        mmr_lambda: float = 0.7,
+        budget_ms: float = 50,
+        token_counter: Optional[TokenCounter] = None,
+    ) -> None:
+        self.limit = limit
+        self.token_budget = token_budget
+        self.dedup_similarity = dedup_similarity
+        self.mmr_lambda = mmr_lambda
+        self.budget_ms = budget_ms
+        self.token_counter = token_counter or default_token_counter
+
+    def rerank(self, query_embedding: List[float], candidates: List[Dict]) -> List[Dict]:
+        # candidates come best first; hits carrying an "embedding" are compared by vector
+        deadline = time.perf_counter() + self.budget_ms / 1000
+        unique: Dict[tuple, Dict] = {}
+        for hit in candidates:
+            unique.setdefault((hit.get("filename"), hit["content"]), hit)
+        candidates = list(unique.values())
+        if not candidates:
+            return []
+        tokens = self.token_counter.count([hit["content"] for hit in candidates])
+        vectors, has_vector, relevance = _vectors_and_relevance(query_embedding, candidates)
+
+        selected: List[int] = []
+        # highest similarity of each candidate to anything selected so far
+        redundancy = np.full(len(candidates), -1.0, dtype=np.float32)
+        remaining = np.ones(len(candidates), dtype=bool)
+        spent = 0
+        while remaining.any() and len(selected) < self.limit:
+            if time.perf_counter() < deadline:
+                scores = self.mmr_lambda * relevance - (1 - self.mmr_lambda) * np.maximum(redundancy, 0)
+            else:
+                scores = relevance
+            best = int(np.argmax(np.where(remaining, scores, -np.inf)))
+            remaining[best] = False
+            if redundancy[best] >= self.dedup_similarity or spent + tokens[best] > self.token_budget:
+                continue
+            selected.append(best)
+            spent += tokens[best]
+            if has_vector[best]:
+                similarity = np.where(has_vector, vectors @ vectors[best], -1.0)
+                redundancy = np.maximum(redundancy, similarity)
+
+        logger.info(f"Reranked {len(candidates)} candidates to {len(selected)} chunks, {spent} tokens")
+        return [{key: value for key, value in candidates[i].items() if key != "embedding"} for i in selected]
+
+
+def _vectors_and_relevance(query_embedding: List[float], candidates: List[Dict]):
+    # unit vectors, zero rows for hits without one
+    has_vector = np.array([bool(hit.get("embedding")) for hit in candidates])
+    dim = len(next((hit["embedding"] for hit in candidates if hit.get("embedding")), query_embedding or [0]))
+    vectors = np.zeros((len(candidates), dim), dtype=np.float32)
+    if has_vector.any():
+        vectors[has_vector] = [hit["embedding"] for hit in candidates if hit.get("embedding")]
+        vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+    if query_embedding and has_vector.all():
+        query = np.asarray(query_embedding, dtype=np.float32)
+        relevance = vectors @ (query / max(float(np.linalg.norm(query)), 1e-12))
+    else:
+        # Some hits, like lexical-only matches of a hybrid search, have no vector: the incoming
+        # order is the relevance signal then and vectors only add the duplicate and diversity checks
+        relevance = 1 - np.arange(len(candidates), dtype=np.float32) / len(candidates)
+    return vectors, has_vector, relevance
+
+
+def build_reranker(settings) -> Reranker:
+    return Reranker(
+        limit=settings.search_rerank_limit,
+        token_budget=settings.search_context_token_budget,
+        dedup_similarity=settings.search_rerank_dedup_similarity,
+        mmr_lambda=settings.search_rerank_mmr_lambda,
+        budget_ms=settings.search_rerank_budget_ms,
+    )
@@ -0,0 +1,69 @@
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional
+
+
+class VectorClient(ABC):
+    """The part of MilvusClient that UragEngine uses, so other backends can stand in for Milvus.
+
+    Calls take and return the same shapes as pymilvus: search returns one list of
+    {"id", "distance", "entity"} hits per query vector, filters are the expressions
+    UragEngine builds (`filename == "a"`, `filename in ["a", "b"]`, `id == 1`, `id in [1, 2]`),
+    and describe_index flattens the build params next to index_type and metric_type.
+    """
+
+    @abstractmethod
+    def list_collections(self, **kwargs) -> List[str]:
+        ...
+
+    @abstractmethod
+    def create_collection(self, collection_name: str, schema=None, index_params=None, **kwargs) -> None:
+        ...
+
+    @abstractmethod
+    def drop_collection(self, collection_name: str, **kwargs) -> None:
+        ...
+
+    @abstractmethod
+    def describe_index(self, collection_name: str, index_name: str, **kwargs) -> Dict:
+        ...
+
+    @abstractmethod
+    def load_collection(self, collection_name: str, **kwargs) -> None:
+        ...
+
+    @abstractmethod
+    def get_load_state(self, collection_name: str, **kwargs) -> Dict:
+        ...
+
+    @abstractmethod
+    def insert(self, collection_name: str, data: List[Dict], **kwargs) -> Dict:
+        ...
+
+    @abstractmethod
+    def delete(self, collection_name: str, filter: str = "", **kwargs) -> Dict:
+        ...
+
+    @abstractmethod
+    def search(
+        self,
+        collection_name: str,
+        data: List[List[float]],
+        filter: str = "",
+        limit: int = 10,
+        output_fields: Optional[List[str]] = None,
+        search_params: Optional[Dict] = None,
+        **kwargs
+    ) -> List[List[Dict]]:
+        ...
+
+    @abstractmethod
+    def get(self, collection_name: str, ids: List[int], output_fields: Optional[List[str]] = None, **kwargs) -> List[Dict]:
+        # rows with these primary keys, ids that don't exist are left out
+        ...
+
+    @abstractmethod
+    def query_iterator(
+        self, collection_name: str, batch_size: int = 1000, output_fields: Optional[List[str]] = None, filter: str = "", **kwargs
+    ):
+        # an object with next(), returning an empty list once exhausted, and close(), over the rows matching filter
+        ...
@@ -1,124 +1,654 @@
 from pymilvus import MilvusClient
 from pymilvus import DataType
-from typing import List, Dict
+from typing import Iterator, List, Dict, Optional, Tuple, Union
 from pymilvus.client.types import LoadState
+from pymilvus.exceptions import MilvusException, MilvusUnavailableException
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
 
 from fastapi import FastAPI
+import grpc
 import json
 import logging
+import re
+import threading
+import time
+
+from .index_profiles import IndexConfig, resolve_index_config
+from .local_vectors import LocalVectorClient
+from .vector_client import VectorClient
 
 logger = logging.getLogger(__name__)
 
+# Milvus rejects searches asking for more than this many hits per query
+MAX_SEARCH_LIMIT = 16384
+# size of the text-embedding-3-small vectors DocumentProcessor produces
+EMBEDDING_DIM = 1536
+# Milvus error code for searching a released collection
+COLLECTION_NOT_LOADED = 101
+# Milvus error codes an insert is retried on: connection failed / service unavailable,
+# request limit exceeded and rate limited. Everything else, a timeout included, could
+# fail the same way again or may already have been applied, and retrying would duplicate rows.
+TRANSIENT_ERROR_CODES = {2, 4, 8}
+# Reindexing builds "<collection>__g<n>" next to the serving collection and swaps it in
+GENERATION_SEPARATOR = "__g"
+# ids per `id in [...]` delete expression
+DELETE_ID_BATCH = 1000
+
+class BulkInsertError(Exception):
+    def __init__(self, message: str, ids: List[Optional[int]], failed_batches: List[Tuple[int, int]]) -> None:
+        super().__init__(message)
+        # ids of rows that made it in, None for rows of batches that failed
+        self.ids = ids
+        self.failed_batches = failed_batches
+
+class ReindexError(Exception):
+    pass
+
+class _SharedLock:
+    """Many holders in shared mode, or a single one in exclusive mode."""
+
+    def __init__(self) -> None:
+        self._cond = threading.Condition()
+        self._shared = 0
+        self._exclusive = False
+
+    @contextmanager
+    def shared(self):
+        with self._cond:
+            while self._exclusive:
+                self._cond.wait()
+            self._shared += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._shared -= 1
+                self._cond.notify_all()
+
+    @contextmanager
+    def exclusive(self):
+        with self._cond:
+            while self._exclusive or self._shared:
+                self._cond.wait()
+            self._exclusive = True
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._exclusive = False
+                self._cond.notify_all()
+
 class UragEngine:
-    def __init__(self, client: MilvusClient, collection: str) -> None:
+    def __init__(
+        self,
+        client: Union[MilvusClient, VectorClient],
+        collection: str,
+        insert_batch_size: int = 256,
+        insert_batch_bytes: int = 4 * 1024 * 1024,
+        insert_concurrency: int = 4,
+        insert_max_retries: int = 3,
+        search_batch_size: int = 512,
+        index_config: Optional[IndexConfig] = None,
+        dim: int = EMBEDDING_DIM,
+    ) -> None:
         self._client = client
-        self._collection = collection
+        # vector size of collections this engine creates, an existing collection keeps its own
+        self.dim = dim
+        self._base_collection = collection
+        self.insert_batch_size = insert_batch_size
+        self.insert_batch_bytes = insert_batch_bytes
+        self.insert_concurrency = insert_concurrency
+        self.insert_max_retries = insert_max_retries
+        self.search_batch_size = search_batch_size
+        # Load state is tracked here instead of asked for on every search. The watchdog
+        # refreshes it and a not-loaded search error resets it, either way the next
+        # search reloads the collection.
+        self._loaded = False
+        self._load_lock = threading.Lock()
+        self._watchdog: Optional[threading.Thread] = None
+        self._watchdog_stop = threading.Event()
+        # Writes hold the lock shared; a reindex takes it exclusively to swap collections
+        self._writes = _SharedLock()
+        self._reindex_lock = threading.Lock()
+        self._shadow: Optional[str] = None
+        self._shadow_ids = set()
+        self._shadow_deletes: List[str] = []
+        self._shadow_error: Optional[Exception] = None
+        self._id_lock = threading.Lock()
+        self._last_id = 0
+        self.reindex_status: Optional[Dict] = None
+        configured = index_config or resolve_index_config()
         try:
-            collections = client.list_collections()
-            if self.collection in collections:
-                client.load_collection(collection_name=collection)
+            generations = _generations(client.list_collections(), collection)
+            if generations:
+                # the oldest generation is the one that was serving, newer ones are builds
+                # of a reindex that never finished
+                serving = generations[0][1]
+                for _, leftover in generations[1:]:
+                    logger.warning(f"Ignoring {leftover}, left behind by an unfinished reindex")
+                client.load_collection(collection_name=serving)
+                description = client.describe_index(serving, "embedding")
+                index = IndexConfig.from_description(description)
+                if (index.index_type, index.metric_type) == (configured.index_type, configured.metric_type):
+                    index = IndexConfig(index.index_type, index.metric_type, index.build_params, configured.search_params)
+                else:
+                    logger.warning(
+                        f"{serving} has a {index.index_type}/{index.metric_type} index but "
+                        f"{configured.index_type}/{configured.metric_type} is configured, reindex to switch"
+                    )
             else:
-                create_personal_collection(client, collection)
+                serving = collection
+                index = configured
+                # created with an index, so Milvus loads it right away
+                create_personal_collection(client, collection, index, dim=dim)
+            self._serving = (serving, index)
+            self._loaded = True
         except Exception as e:
             logger.error(f"Error in UragEngine: {e}")
             raise
 
     @property
-    def client(self) -> MilvusClient:
+    def client(self) -> Union[MilvusClient, VectorClient]:
         return self._client
 
     @property
     def collection(self) -> str:
-        return self._collection
+        return self._serving[0]
+
+    @property
+    def index_config(self) -> IndexConfig:
+        return self._serving[1]
+
+    @property
+    def reindex_running(self) -> bool:
+        return self._reindex_lock.locked()
+
+    @property
+    def auto_id(self) -> bool:
+        # only the original collection assigns its own ids, reindexed ones keep the copied ids
+        return self.collection == self._base_collection
     
     def add(self, filenames: List[str], texts: List[str], embeddings: List[List[float]], metadata: List[Dict]) -> List[int]:
+        return self.bulk_add(filenames, texts, embeddings, metadata)
+
+    def bulk_add(
+        self,
+        filenames: List[str],
+        texts: List[str],
+        embeddings: List[List[float]],
+        metadata: List[Dict],
+        batch_size: Optional[int] = None,
+        max_batch_bytes: Optional[int] = None,
+        concurrency: Optional[int] = None,
+    ) -> List[int]:
         if not texts or not embeddings:
             return []
-        
-        ret = []
-        for i in range(len(texts)):
-            ret.append(self.client.insert(collection_name=self.collection, data={
-                'filename': filenames[i],
-                'content': texts[i],
-                'embedding': embeddings[i],
-                'metadata': json.dumps(metadata[i])
-            })['ids'][0])
-        return ret
+        if not (len(filenames) == len(texts) == len(embeddings) == len(metadata)):
+            raise ValueError("filenames, texts, embeddings and metadata must have the same length")
+
+        rows = [{
+            'filename': filenames[i],
+            'content': texts[i],
+            'embedding': embeddings[i],
+            'metadata': json.dumps(metadata[i])
+        } for i in range(len(texts))]
+
+        batches = _plan_batches(
+            [_row_size(row) for row in rows],
+            batch_size or self.insert_batch_size,
+            max_batch_bytes or self.insert_batch_bytes,
+        )
+        logger.info(f"Inserting {len(rows)} rows into {self.collection} in {len(batches)} batches")
+
+        ids: List[Optional[int]] = [None] * len(rows)
+        failed = []
+        workers = max(1, min(concurrency or self.insert_concurrency, len(batches)))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = [
+                (start, end, pool.submit(self._insert_batch, rows[start:end]))
+                for start, end in batches
+            ]
+            for start, end, future in futures:
+                try:
+                    ids[start:end] = future.result()
+                except Exception as e:
+                    logger.error(f"Batch [{start}, {end}) failed after retries: {e}")
+                    failed.append((start, end))
+
+        if failed:
+            raise BulkInsertError(f"{len(failed)} of {len(batches)} insert batches failed", ids, failed)
+        return ids
+
+    def _insert_batch(self, rows: List[Dict]) -> List[int]:
+        attempt = 0
+        while True:
+            try:
+                with self._writes.shared():
+                    return self._write_rows(rows)
+            except Exception as e:
+                if attempt >= self.insert_max_retries or not _is_transient(e):
+                    raise
+                delay = 0.2 * (2 ** attempt)
+                logger.warning(f"Insert of {len(rows)} rows failed ({e}), retrying in {delay:.1f}s")
+                time.sleep(delay)
+                attempt += 1
     
-    def similarity_search(self, query_embedding: List[float], limit: int = 5, metadata_filter: str = '', similarity_threshold: float = 0.3) -> List[Dict]:
+    def _write_rows(self, rows: List[Dict]) -> List[int]:
+        if self.auto_id:
+            res = self.client.insert(collection_name=self.collection, data=rows)
+            batch_ids = list(res['ids'])
+            if len(batch_ids) != len(rows):
+                raise RuntimeError(f"Expected {len(rows)} ids from insert, got {len(batch_ids)}")
+        else:
+            batch_ids = self._allocate_ids(len(rows))
+            self.client.insert(collection_name=self.collection, data=_with_ids(rows, batch_ids))
+        if self._shadow is not None and self._shadow_error is None:
+            # Rows written during a reindex also go to the collection being built. A failure
+            # there fails the reindex rather than this insert, which already went through.
+            try:
+                self.client.insert(collection_name=self._shadow, data=_with_ids(rows, batch_ids))
+                self._shadow_ids.update(batch_ids)
+            except Exception as e:
+                logger.error(f"Insert into {self._shadow} failed, the reindex will be aborted: {e}")
+                self._shadow_error = e
+        return batch_ids
+
+    def _allocate_ids(self, count: int) -> List[int]:
+        # Same layout as Milvus' auto ids (milliseconds << 18 plus a counter), so ids
+        # handed out here are always larger than the auto ids of older rows
+        with self._id_lock:
+            start = max(self._last_id + 1, int(time.time() * 1000) << 18)
+            self._last_id = start + count - 1
+        return list(range(start, start + count))
+
+    def similarity_search(
+        self,
+        query_embedding: List[float],
+        limit: int = 5,
+        metadata_filter: str = '',
+        similarity_threshold: float = 0.3,
+        output_vectors: bool = False
+    ) -> List[Dict]:
         if not query_embedding:
             logger.warning("Empty query embedding received")
             return []
-        
-        try:
-            state = self.client.get_load_state(self.collection)
-            if not state or "state" not in state or state["state"] != LoadState.Loaded:
-                self.client.load_collection(self.collection)
-            res = self.client.search(
-                collection_name=self.collection,
-                data=[query_embedding],
-                filter=metadata_filter,
-                limit=limit,
-                output_fields=['filename', 'content'],
-                search_params={
-                    'metric_type': 'L2',
-                    'params': {
-                        'nprobe': 10,
-                        'ef': 64,
-                    }
-                }
-            )
-            
-            hits = []
-            logger.info(f"Found {len(res[0])} results")
-            
-            for hit in res[0]:
-                filename = hit['entity'].get('filename', '')
-                content = hit['entity'].get('content', '')
-                score = hit['distance']
-                
-                
-                hits.append({
-                    'content': content,
-                    'score': score,
-                    'filename': filename
-                })
-            
-            hits.sort(key=lambda x: x['score'])
-            return hits
+        hits = self.batch_similarity_search([query_embedding], limit, metadata_filter, output_vectors)[0]
+        logger.info(f"Found {len(hits)} results")
+        return hits
 
+    def batch_similarity_search(
+        self, query_embeddings: List[List[float]], limit: int = 5, metadata_filter: str = '', output_vectors: bool = False
+    ) -> List[List[Dict]]:
+        # One request per search_batch_size query vectors, results split back per query
+        if not query_embeddings:
+            return []
+        try:
+            self._ensure_loaded()
+            results = []
+            for start in range(0, len(query_embeddings), self.search_batch_size):
+                res, index = self._search(query_embeddings[start:start + self.search_batch_size], metadata_filter, limit, output_vectors)
+                results.extend(_to_hits(hits, index) for hits in res)
+            return results
         except Exception as e:
             logger.error(f"Error in similarity search: {str(e)}")
             raise
+
+    def search_files(
+        self, query_embeddings: List[List[float]], filenames: List[str], limit: int = 5, output_vectors: bool = False
+    ) -> List[Dict[str, List[Dict]]]:
+        # Top `limit` hits per query and per file. All files go in one `filename in [...]` request
+        # asking for limit * len(files) hits; a file left with fewer than `limit` hits while the
+        # request came back full may have lost out to the other files, so only those are re-queried
+        # on their own. Results match searching every file separately.
+        filenames = list(dict.fromkeys(filenames))
+        results: List[Dict[str, List[Dict]]] = [{filename: [] for filename in filenames} for _ in query_embeddings]
+        if not query_embeddings or not filenames:
+            return results
+        try:
+            self._ensure_loaded()
+            underfilled: Dict[str, List[int]] = {}
+            files_per_request = max(1, MAX_SEARCH_LIMIT // limit)
+            for group_start in range(0, len(filenames), files_per_request):
+                group = filenames[group_start:group_start + files_per_request]
+                group_limit = limit * len(group)
+                for start in range(0, len(query_embeddings), self.search_batch_size):
+                    res, index = self._search(
+                        query_embeddings[start:start + self.search_batch_size], _filename_filter(group), group_limit, output_vectors
+                    )
+                    for offset, hits in enumerate(res):
+                        per_file = results[start + offset]
+                        for hit in _to_hits(hits, index):
+                            bucket = per_file.get(hit['filename'])
+                            if bucket is not None and len(bucket) < limit:
+                                bucket.append(hit)
+                        if len(hits) == group_limit:
+                            for filename in group:
+                                if len(per_file[filename]) < limit:
+                                    underfilled.setdefault(filename, []).append(start + offset)
+
+            for filename, indexes in underfilled.items():
+                for start in range(0, len(indexes), self.search_batch_size):
+                    part = indexes[start:start + self.search_batch_size]
+                    res, index = self._search([query_embeddings[i] for i in part], _filename_filter([filename]), limit, output_vectors)
+                    for i, hits in zip(part, res):
+                        results[i][filename] = _to_hits(hits, index)
+            return results
+        except Exception as e:
+            logger.error(f"Error in file scoped search: {str(e)}")
+            raise
+
+    def _ensure_loaded(self) -> None:
+        if self._loaded:
+            return
+        with self._load_lock:
+            if not self._loaded:
+                logger.info(f"Loading collection {self.collection}")
+                self.client.load_collection(self.collection)
+                self._loaded = True
+
+    def _search(
+        self, query_embeddings: List[List[float]], metadata_filter: str, limit: int, output_vectors: bool = False
+    ) -> Tuple[List[List[Dict]], IndexConfig]:
+        # returns the index searched along with the hits, a reindex may swap it between calls
+        serving = self._serving
+        try:
+            return self._search_once(serving, query_embeddings, metadata_filter, limit, output_vectors), serving[1]
+        except MilvusException as e:
+            if not _is_not_loaded(e):
+                raise
+            logger.warning(f"Collection {serving[0]} was released, reloading: {e}")
+            self._loaded = False
+            self._ensure_loaded()
+            serving = self._serving
+            return self._search_once(serving, query_embeddings, metadata_filter, limit, output_vectors), serving[1]
+
+    def _search_once(
+        self,
+        serving: Tuple[str, IndexConfig],
+        query_embeddings: List[List[float]],
+        metadata_filter: str,
+        limit: int,
+        output_vectors: bool = False
+    ) -> List[List[Dict]]:
+        collection, index = serving
+        return self.client.search(
+            collection_name=collection,
+            data=query_embeddings,
+            filter=metadata_filter,
+            limit=limit,
+            output_fields=['filename', 'content', 'embedding'] if output_vectors else ['filename', 'content'],
+            search_params=index.milvus_search_params(limit)
+        )
+
+    def refresh_load_state(self) -> bool:
+        state = self.client.get_load_state(self.collection)
+        self._loaded = bool(state) and state.get("state") == LoadState.Loaded
+        return self._loaded
+
+    def start_watchdog(self, interval: float) -> None:
+        if interval <= 0 or self._watchdog is not None:
+            return
+        self._watchdog_stop.clear()
+        self._watchdog = threading.Thread(
+            target=self._watch_load_state,
+            args=(interval,),
+            name=f"milvus-load-watchdog-{self.collection}",
+            daemon=True
+        )
+        self._watchdog.start()
+        logger.info(f"Watching load state of {self.collection} every {interval}s")
+
+    def stop_watchdog(self) -> None:
+        if self._watchdog is None:
+            return
+        self._watchdog_stop.set()
+        self._watchdog.join(timeout=5)
+        self._watchdog = None
+
+    def _watch_load_state(self, interval: float) -> None:
+        while not self._watchdog_stop.wait(interval):
+            try:
+                if not self.refresh_load_state():
+                    logger.warning(f"Collection {self.collection} is not loaded, it will be reloaded on the next search")
+            except Exception as e:
+                logger.warning(f"Could not check load state of {self.collection}: {e}")
     
+    def reindex(self, index_config: IndexConfig, batch_size: int = 1000, drain_seconds: float = 2.0) -> Dict:
+        """Rebuild the collection under a new index and swap it in while searches keep running.
+
+        The new generation is filled from the serving collection while inserts and deletes
+        go to both. Only the swap itself holds writes back, for up to drain_seconds so
+        searches still running on the old collection finish before it is dropped.
+        """
+        if not self._reindex_lock.acquire(blocking=False):
+            raise ReindexError("A reindex is already running")
+        source = self.collection
+        generations = _generations(self.client.list_collections(), self._base_collection)
+        target = f"{self._base_collection}{GENERATION_SEPARATOR}{generations[-1][0] + 1}"
+        status = self.reindex_status = {
+            "state": "running",
+            "source": source,
+            "target": target,
+            "index": index_config.to_dict(),
+            "copied": 0,
+            "started_at": datetime.utcnow().isoformat(),
+            "finished_at": None,
+            "error": None
+        }
+        try:
+            for _, leftover in generations:
+                if leftover != source:
+                    logger.warning(f"Dropping {leftover}, left behind by an unfinished reindex")
+                    self.client.drop_collection(leftover)
+            logger.info(f"Reindexing {source} into {target} with {index_config}")
+            create_personal_collection(self.client, target, index_config, auto_id=False, dim=self.dim)
+            with self._writes.exclusive():
+                self._shadow = target
+                self._shadow_ids = set()
+                self._shadow_deletes = []
+                self._shadow_error = None
+
+            iterator = self.client.query_iterator(self.collection, batch_size=batch_size, output_fields=['*'])
+            try:
+                while True:
+                    rows = iterator.next()
+                    if not rows:
+                        break
+                    # rows already written to both collections since the copy started are skipped
+                    rows = [row for row in rows if row['id'] not in self._shadow_ids]
+                    if rows:
+                        self.client.insert(collection_name=target, data=rows)
+                    status["copied"] += len(rows)
+                    if self._shadow_error is not None:
+                        raise self._shadow_error
+            finally:
+                iterator.close()
+
+            with self._writes.exclusive():
+                if self._shadow_error is not None:
+                    raise self._shadow_error
+                # a delete can land between a row being read and copied, so they're applied again
+                for metadata_filter in self._shadow_deletes:
+                    self.client.delete(collection_name=target, filter=metadata_filter)
+                self._serving = (target, index_config)
+                self._loaded = True
+                self._shadow = None
+                time.sleep(drain_seconds)
+                try:
+                    self.client.drop_collection(source)
+                except Exception as e:
+                    # left in place it would be picked up again on restart as the older generation
+                    logger.error(f"Could not drop {source} after the reindex, drop it before restarting: {e}")
+            status["state"] = "succeeded"
+            logger.info(f"Reindex done, {target} is now serving ({status['copied']} rows copied)")
+        except Exception as e:
+            logger.error(f"Reindex into {target} failed: {e}", exc_info=True)
+            status["state"] = "failed"
+            status["error"] = str(e)
+            with self._writes.exclusive():
+                self._shadow = None
+            if self.collection != target and target in self.client.list_collections():
+                self.client.drop_collection(target)
+            raise ReindexError(f"Reindex into {target} failed: {e}") from e
+        finally:
+            self._shadow_ids = set()
+            self._shadow_deletes = []
+            status["finished_at"] = datetime.utcnow().isoformat()
+            self._reindex_lock.release()
+        return status
+
+    def iter_rows(self, output_fields: List[str], batch_size: int = 1000, metadata_filter: str = "") -> Iterator[List[Dict]]:
+        iterator = self.client.query_iterator(
+            self.collection, batch_size=batch_size, filter=metadata_filter, output_fields=output_fields
+        )
+        try:
+            while True:
+                rows = iterator.next()
+                if not rows:
+                    break
+                yield rows
+        finally:
+            iterator.close()
+
+    def get_chunks(self, ids: List[int]) -> Dict[int, Dict]:
+        # {"filename", "content"} by chunk id, chunks deleted since are left out
+        ids = list(dict.fromkeys(int(chunk_id) for chunk_id in ids))
+        if not ids:
+            return {}
+        self._ensure_loaded()
+        rows = self.client.get(self.collection, ids=ids, output_fields=["filename", "content"])
+        return {row["id"]: {"filename": row.get("filename", ""), "content": row.get("content", "")} for row in rows}
+
+    def ids_by_filename(self, filename: str) -> List[int]:
+        return [row["id"] for rows in self.iter_rows(["id"], metadata_filter=_filename_filter([filename])) for row in rows]
+
+    def delete_by_ids(self, ids: List[int]) -> bool:
+        # in batches, so the filter expression stays within Milvus' length limit
+        deleted = False
+        for start in range(0, len(ids), DELETE_ID_BATCH):
+            deleted = self._delete(f"id in {json.dumps([int(row_id) for row_id in ids[start:start + DELETE_ID_BATCH]])}") or deleted
+        return deleted
+
     def delete_by_id(self, id: int) -> bool:
         if not id:
             return False
-        ret = self.client.delete(collection_name=self.collection, filter=f'id == {id}')
-        return True if ret else False
+        return self._delete(f'id == {id}')
     
     def delete_by_filename(self, filename: str) -> bool:
         if not filename:
             return False
-        ret = self.client.delete(collection_name=self.collection, filter=f'filename == "{filename}"')
+        return self._delete(f'filename == "{filename}"')
+
+    def _delete(self, metadata_filter: str) -> bool:
+        with self._writes.shared():
+            ret = self.client.delete(collection_name=self.collection, filter=metadata_filter)
+            if self._shadow is not None:
+                self.client.delete(collection_name=self._shadow, filter=metadata_filter)
+                self._shadow_deletes.append(metadata_filter)
         return True if ret else False
     
-def create_personal_collection(client: MilvusClient, collection_name: str):
+def _is_transient(error: Exception) -> bool:
+    if isinstance(error, MilvusUnavailableException):
+        return True
+    if isinstance(error, MilvusException):
+        return error.code in TRANSIENT_ERROR_CODES
+    if isinstance(error, grpc.RpcError):
+        return error.code() == grpc.StatusCode.UNAVAILABLE
+    # refused or reset before the request got through; TimeoutError isn't a ConnectionError
+    return isinstance(error, ConnectionError)
+
+def _is_not_loaded(error: MilvusException) -> bool:
+    return error.code == COLLECTION_NOT_LOADED or "not loaded" in str(error).lower()
+
+def _generations(collections: List[str], base: str) -> List[Tuple[int, str]]:
+    # the original collection is generation 0
+    pattern = re.compile(re.escape(base) + re.escape(GENERATION_SEPARATOR) + r"(\d+)")
+    generations = []
+    for name in collections:
+        if name == base:
+            generations.append((0, name))
+        else:
+            match = pattern.fullmatch(name)
+            if match:
+                generations.append((int(match.group(1)), name))
+    return sorted(generations)
+
+def _with_ids(rows: List[Dict], ids: List[int]) -> List[Dict]:
+    return [{**row, 'id': row_id} for row, row_id in zip(rows, ids)]
+
+def _to_hits(res: List[Dict], index: IndexConfig) -> List[Dict]:
+    hits = []
+    for hit in res:
+        hits.append({
+            'id': hit['id'],
+            'content': hit['entity'].get('content', ''),
+            'score': hit['distance'],
+            'filename': hit['entity'].get('filename', '')
+        })
+        if 'embedding' in hit['entity']:
+            hits[-1]['embedding'] = hit['entity']['embedding']
+    hits.sort(key=lambda x: x['score'], reverse=index.higher_is_better)
+    return hits
+
+def _filename_filter(filenames: List[str]) -> str:
+    if len(filenames) == 1:
+        return f'filename == {json.dumps(filenames[0], ensure_ascii=False)}'
+    return f'filename in {json.dumps(filenames, ensure_ascii=False)}'
+
+def _row_size(row: Dict) -> int:
+    # float32 vector plus the utf-8 payload of the scalar fields
+    return (
+        4 * len(row['embedding'])
+        + len(row['content'].encode('utf-8'))
+        + len(row['filename'].encode('utf-8'))
+        + len(row['metadata'].encode('utf-8'))
+    )
+
+def _plan_batches(sizes: List[int], batch_size: int, max_batch_bytes: int) -> List[Tuple[int, int]]:
+    batches = []
+    start = 0
+    current_bytes = 0
+    for i, size in enumerate(sizes):
+        full = i - start >= batch_size or current_bytes + size > max_batch_bytes
+        if i > start and full:
+            batches.append((start, i))
+            start = i
+            current_bytes = 0
+        current_bytes += size
+    if start < len(sizes):
+        batches.append((start, len(sizes)))
+    return batches
+
+def create_personal_collection(
+    client: MilvusClient,
+    collection_name: str,
+    index_config: Optional[IndexConfig] = None,
+    auto_id: bool = True,
+    dim: int = EMBEDDING_DIM
+):
+    index_config = index_config or resolve_index_config()
     try:
         logger.info("Starting collection creation...")
         
         logger.info("Creating schema...")
-        schema = MilvusClient.create_schema(auto_id=True, enable_dynamic_field=True)
+        schema = MilvusClient.create_schema(auto_id=auto_id, enable_dynamic_field=True)
         schema.add_field(field_name='id', datatype=DataType.INT64, is_primary=True)
         schema.add_field(field_name='filename', datatype=DataType.VARCHAR, max_length=512)
         schema.add_field(field_name='content', datatype=DataType.VARCHAR, max_length=65535)
-        schema.add_field(field_name='embedding', datatype=DataType.FLOAT_VECTOR, dim=1536)
+        schema.add_field(field_name='embedding', datatype=DataType.FLOAT_VECTOR, dim=dim)
         schema.add_field(field_name='metadata', datatype=DataType.VARCHAR, max_length=512)
         logger.info("Schema created successfully")
 
         logger.info("Preparing index parameters...")
         index_params = MilvusClient.prepare_index_params()
-        index_params.add_index(field_name='embedding', index_type='IVF_FLAT', metric_type='L2', nlist=1024)
+        index_params.add_index(
+            field_name='embedding',
+            index_type=index_config.index_type,
+            metric_type=index_config.metric_type,
+            params=dict(index_config.build_params)
+        )
         # index_params.add_index(field_name='filename')
         # index_params.add_index(field_name='metadata')
         logger.info("Index parameters prepared")
@@ -135,10 +665,25 @@ def create_personal_collection(client: MilvusClient, collection_name: str):
         logger.error(f"Failed to create collection: {str(e)}")
         raise
 
-def bind_milvus(app: FastAPI, uri: str, collection_name: str) -> UragEngine:
+def build_vector_client(settings, uri: str) -> Union[MilvusClient, VectorClient]:
+    if settings.vector_backend == "milvus":
+        logger.info(f"Binding Milvus to {uri}")
+        return MilvusClient(uri=uri)
+    if settings.vector_backend == "local":
+        logger.info(f"Using the local vector store at {settings.local_vector_path or 'memory'}")
+        return LocalVectorClient(settings.local_vector_path, settings.local_vector_segment_rows)
+    raise ValueError(f"Unknown vector backend {settings.vector_backend!r}, expected 'milvus' or 'local'")
+
+def bind_milvus(
+    app: FastAPI,
+    uri: str,
+    collection_name: str,
+    client: Optional[Union[MilvusClient, VectorClient]] = None,
+    **engine_options
+) -> UragEngine:
     try:
-        client = MilvusClient(uri=uri)
-        engine = UragEngine(client, collection_name)
+        client = client or MilvusClient(uri=uri)
+        engine = UragEngine(client, collection_name, **engine_options)
         app.state.vector_db = engine
         return engine
     except Exception as e:
@@ -1,18 +1,26 @@
 from exa_py import Exa
 from openai import OpenAI
+import asyncio
 import json
 from typing import List, Dict, Optional
 import logging
+from .client_pool import ClientPool
 
 logger = logging.getLogger(__name__)
 
 class WebSearchEngine:
-    def __init__(self, x_openai_key: str, x_exa_key: str):
-        self.client = OpenAI(api_key=x_openai_key)
-        self.exa = Exa(api_key=x_exa_key)
+    def __init__(self, x_openai_key: str, x_exa_key: str, client_pool: Optional[ClientPool] = None):
+        if client_pool is not None:
+            self.client = client_pool.openai(x_openai_key)
+            self.exa = client_pool.exa(x_exa_key)
+        else:
+            self.client = OpenAI(api_key=x_openai_key)
+            self.exa = Exa(api_key=x_exa_key)
 
     async def search_web(self, query: str) -> List[Dict]:
-        response = self.exa.search_and_contents(
+        # The Exa and OpenAI clients are synchronous, keep them off the event loop
+        response = await asyncio.to_thread(
+            self.exa.search_and_contents,
             query,
             type="auto", 
             num_results=5,
@@ -46,7 +54,8 @@ class WebSearchEngine:
         } """},
         {"role": "user", "content": f"Question:\n{query}\n\nContext:\n{context}\n\n{user_defined_web_context}\n\nAnswer in the specified JSON format:"}
         ]
-        response = self.client.chat.completions.create(
+        response = await asyncio.to_thread(
+            self.client.chat.completions.create,
             model="gpt-4o-mini-2024-07-18",
             messages=messages,
             temperature=0.7,
@@ -57,7 +66,7 @@ class WebSearchEngine:
         return response_content.get("need_web", False)
     
     async def search_url(self, urls: List[str]) -> List[Dict]:
-        response = self.exa.get_contents(urls, text=True, highlights=True)
+        response = await asyncio.to_thread(self.exa.get_contents, urls, text=True, highlights=True)
         formatted_results = []
         for result in response.results:
             result_dict = {
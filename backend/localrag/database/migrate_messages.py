@@ -0,0 +1,68 @@
+"""Moves chat messages out of the chat documents into the messages collection.
+
+Each chat's embedded `messages` array becomes one document per message, in the same order,
+with sources that carry a chunk id stored as references. The array is removed and
+message_count set in a single update per chat, so the tool can be stopped and run again:
+messages copied by an interrupted run are recognized by their `migrated` flag and replaced.
+Messages appended by the server while the migration runs are kept.
+
+Run from backend/: python -m localrag.database.migrate_messages [--dry-run]
+"""
+import argparse
+import asyncio
+import logging
+from typing import Dict
+
+from .mongodb import db, get_chat_collection, get_message_collection, stored_message
+
+logger = logging.getLogger(__name__)
+
+
+async def migrate_messages(dry_run: bool = False) -> Dict:
+    chats = await get_chat_collection()
+    messages = await get_message_collection()
+    stats = {"chats": 0, "messages": 0, "source_references": 0, "inline_sources": 0}
+    async for chat in chats.find({"messages": {"$exists": True}}, {"messages": 1, "last_updated": 1}):
+        documents = []
+        for message in chat["messages"] or []:
+            # legacy messages without a timestamp sort by the chat's last update, ties keep the array order
+            message = {"created_at": chat.get("last_updated") or chat["_id"].generation_time, **message}
+            document = stored_message(chat["_id"], message)
+            document["migrated"] = True
+            documents.append(document)
+            for source in document.get("sources") or []:
+                stats["inline_sources" if "content" in source else "source_references"] += 1
+        stats["chats"] += 1
+        stats["messages"] += len(documents)
+        if dry_run:
+            continue
+        await messages.delete_many({"chat_id": chat["_id"], "migrated": True})
+        if documents:
+            await messages.insert_many(documents, ordered=True)
+        await chats.update_one(
+            {"_id": chat["_id"]},
+            {"$unset": {"messages": ""}, "$inc": {"message_count": len(documents)}}
+        )
+        logger.info(f"Moved {len(documents)} messages of chat {chat['_id']}")
+    return stats
+
+
+async def run(dry_run: bool) -> None:
+    await db.connect_to_mongo()
+    try:
+        stats = await migrate_messages(dry_run)
+    finally:
+        await db.close_mongo_connection()
+    prefix = "Would move" if dry_run else "Moved"
+    print(
+        f"{prefix} {stats['messages']} messages of {stats['chats']} chats, "
+        f"{stats['source_references']} sources as chunk references, {stats['inline_sources']} kept inline"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dry-run", action="store_true", help="count what would be moved without writing")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(run(args.dry_run))
@@ -1,13 +1,18 @@
 from motor.motor_asyncio import AsyncIOMotorClient
 from ..config import get_settings
 from bson import ObjectId
+from pymongo.errors import ExecutionTimeout, OperationFailure
 from datetime import datetime
+from typing import Optional, Tuple
 import logging
+import re
 
 logger = logging.getLogger(__name__)
 
 settings = get_settings()
 
+LEGACY_CHAT_TEXT_INDEX = "title_text_messages.content_text"
+
 class MongoDB:
     client: AsyncIOMotorClient = None
     db = None
@@ -17,10 +22,24 @@ class MongoDB:
         self.db = self.client[settings.mongodb_db_name]
         
         collection = await get_chat_collection()
-        await collection.create_index([
-            ("title", "text"),
-            ("messages.content", "text")
-        ])
+        # the text index used to cover embedded messages as well, a collection only takes one
+        if LEGACY_CHAT_TEXT_INDEX in await collection.index_information():
+            await collection.drop_index(LEGACY_CHAT_TEXT_INDEX)
+        await collection.create_index([("title", "text")])
+        # newest-first chat listing, _id breaks ties between chats updated at the same time
+        await collection.create_index([("last_updated", -1), ("_id", -1)])
+        if await collection.find_one({"messages": {"$exists": True}}, {"_id": 1}):
+            logger.warning(
+                "Found chats with embedded messages, run `python -m localrag.database.migrate_messages` to move them"
+            )
+
+        messages = await get_message_collection()
+        # _id breaks ties between messages of one exchange, which often share a created_at
+        await messages.create_index([("chat_id", 1), ("created_at", 1), ("_id", 1)])
+        await messages.create_index([("content", "text")])
+
+        jobs = await get_ingest_job_collection()
+        await jobs.create_index("status")
 
     async def close_mongo_connection(self):
         if self.client:
@@ -31,100 +50,278 @@ db = MongoDB()
 async def get_chat_collection():
     return db.db.chats
 
+async def get_message_collection():
+    return db.db.messages
+
+async def get_ingest_job_collection():
+    return db.db.ingest_jobs
+
+# Messages live in their own collection, one document each, in the order of
+# (created_at, _id) within a chat. The chat document keeps the title, last_updated,
+# message_count and the rolling history summary.
+MESSAGE_ORDER = [("created_at", 1), ("_id", 1)]
+MESSAGE_PROJECTION = {"_id": 0, "chat_id": 0, "migrated": 0}
+
 async def create_chat(chat_data: dict):
     collection = await get_chat_collection()
-    result = await collection.insert_one(chat_data)
+    chat_data = dict(chat_data)
+    messages = chat_data.pop("messages", [])
+    chat_data.pop("id", None)
+    result = await collection.insert_one({**chat_data, "message_count": 0})
+    if messages:
+        await update_chat(str(result.inserted_id), messages)
     return str(result.inserted_id)
 
 async def get_chat(chat_id: str):
+    # the whole chat with all its messages, in order
     collection = await get_chat_collection()
-    return await collection.find_one({"_id": ObjectId(chat_id)})
+    chat = await collection.find_one({"_id": ObjectId(chat_id)})
+    if chat is None:
+        return None
+    messages = await get_message_collection()
+    cursor = messages.find({"chat_id": chat["_id"]}, MESSAGE_PROJECTION).sort(MESSAGE_ORDER)
+    chat["messages"] = await cursor.to_list(length=None)
+    return chat
 
-async def get_chats():
+async def chat_exists(chat_id: str) -> bool:
     collection = await get_chat_collection()
-    cursor = collection.find().sort("last_updated", -1)
-    return await cursor.to_list(length=None)
+    return await collection.find_one({"_id": ObjectId(chat_id)}, {"_id": 1}) is not None
+
+async def get_chat_page(limit: int, before: Optional[Tuple[datetime, ObjectId]] = None):
+    # Keyset pagination on (last_updated, _id), newest first
+    collection = await get_chat_collection()
+    match = {}
+    if before is not None:
+        last_updated, chat_id = before
+        match = {"$or": [
+            {"last_updated": {"$lt": last_updated}},
+            {"last_updated": last_updated, "_id": {"$lt": chat_id}}
+        ]}
+    cursor = collection.find(match, {"title": 1, "last_updated": 1, "message_count": 1})
+    cursor = cursor.sort([("last_updated", -1), ("_id", -1)]).limit(limit)
+    return await cursor.to_list(length=limit)
+
+async def get_chat_message_page(chat_id: str, skip: int, limit: int):
+    collection = await get_chat_collection()
+    chat = await collection.find_one({"_id": ObjectId(chat_id)}, {"message_count": 1})
+    if chat is None:
+        return None
+    chat["messages"] = await _find_messages(chat["_id"], skip, limit)
+    return chat
+
+async def get_chat_window(chat_id: str, limit: int):
+    # the last `limit` messages, only role and content, with the rolling summary and message count
+    collection = await get_chat_collection()
+    chat = await collection.find_one({"_id": ObjectId(chat_id)}, {"history_summary": 1, "message_count": 1})
+    if chat is None:
+        return None
+    chat["messages"] = []
+    if limit > 0:
+        messages = await get_message_collection()
+        cursor = messages.find({"chat_id": chat["_id"]}, {"_id": 0, "role": 1, "content": 1})
+        cursor = cursor.sort([(field, -1) for field, _ in MESSAGE_ORDER]).limit(limit)
+        chat["messages"] = (await cursor.to_list(length=limit))[::-1]
+    chat.setdefault("message_count", 0)
+    return chat
+
+async def get_chat_messages(chat_id: str, skip: int, limit: int):
+    return await _find_messages(ObjectId(chat_id), skip, limit, {"_id": 0, "role": 1, "content": 1})
+
+async def _find_messages(chat_id: ObjectId, skip: int, limit: int, projection: Optional[dict] = None):
+    if limit <= 0:
+        return []
+    messages = await get_message_collection()
+    cursor = messages.find({"chat_id": chat_id}, projection or MESSAGE_PROJECTION)
+    cursor = cursor.sort(MESSAGE_ORDER).skip(skip).limit(limit)
+    return await cursor.to_list(length=limit)
+
+async def update_chat_summary(chat_id: str, summary: dict, previous_through: int) -> bool:
+    # only applies on top of the summary it extends, a concurrent update wins otherwise
+    collection = await get_chat_collection()
+    expected = {"history_summary.through": previous_through} if previous_through else {"history_summary": {"$exists": False}}
+    result = await collection.update_one(
+        {"_id": ObjectId(chat_id), **expected},
+        {"$set": {"history_summary": summary}}
+    )
+    return result.modified_count == 1
 
 async def update_chat(chat_id: str, new_messages: list):
+    # Appends are one insert plus a counter bump, whatever the length of the chat. Messages go
+    # in first so message_count never runs ahead of the messages a reader can see.
+    chat_id = ObjectId(chat_id)
+    messages = await get_message_collection()
+    await messages.insert_many([stored_message(chat_id, message) for message in new_messages], ordered=True)
     collection = await get_chat_collection()
     await collection.update_one(
-        {"_id": ObjectId(chat_id)},
+        {"_id": chat_id},
         {
-            "$push": {"messages": {"$each": new_messages}},
+            "$inc": {"message_count": len(new_messages)},
             "$set": {"last_updated": datetime.utcnow()}
         }
     )
 
+def stored_message(chat_id: ObjectId, message: dict) -> dict:
+    # Sources that carry a chunk id are stored as a reference to the chunk, without its text
+    stored = {**message, "chat_id": chat_id}
+    stored.setdefault("created_at", datetime.utcnow())
+    if stored.get("sources"):
+        stored["sources"] = [_source_reference(source) for source in stored["sources"]]
+    return stored
+
+def _source_reference(source: dict) -> dict:
+    if source.get("id") is None:
+        return {key: value for key, value in source.items() if key != "id"}
+    return {"id": source["id"], "filename": source.get("filename", ""), "score": source.get("score", 1.0)}
+
 async def delete_chat(chat_id: str):
+    messages = await get_message_collection()
+    await messages.delete_many({"chat_id": ObjectId(chat_id)})
     collection = await get_chat_collection()
     await collection.delete_one({"_id": ObjectId(chat_id)})
 
-async def search_chats(query: str, limit: int = 10):
-    logger.info(f"Searching for '{query}' with limit {limit}")
+async def delete_all_chats():
+    messages = await get_message_collection()
+    await messages.delete_many({})
     collection = await get_chat_collection()
-    
-    pipeline = [
-        {
-            "$match": {
-                "$or": [
-                    {"title": {"$regex": query, "$options": "i"}},
-                    {"messages.content": {"$regex": query, "$options": "i"}}
-                ]
-            }
-        },
-        {
-            "$addFields": {
-                "relevantMessages": {
-                    "$filter": {
-                        "input": "$messages",
-                        "as": "message",
-                        "cond": {
-                            "$regexMatch": {
-                                "input": "$$message.content",
-                                "regex": query,
-                                "options": "i"
-                            }
-                        }
-                    }
-                }
-            }
-        },
+    await collection.delete_many({})
+
+async def search_chats(
+    query: str,
+    limit: int = 10,
+    offset: int = 0,
+    max_candidates: int = 200,
+    fallback_timeout_ms: int = 500
+):
+    # Ranked by the text indexes on message content and chat titles. The regex scan is only a
+    # fallback for queries the text index can't answer: word fragments while the user is still
+    # typing, or a database where the indexes aren't built yet.
+    logger.info(f"Searching for '{query}' with limit {limit}, offset {offset}")
+    try:
+        matches = await _text_search_chats(query, max_candidates)
+        mode = "text"
+    except OperationFailure as e:
+        logger.warning(f"Text search failed, falling back to a regex scan: {e}")
+        matches = {}
+    if not matches:
+        mode = "regex"
+        try:
+            matches = await _regex_search_chats(query, max_candidates, fallback_timeout_ms)
+        except ExecutionTimeout:
+            logger.warning(f"Regex search for '{query}' ran over {fallback_timeout_ms}ms, returning no results")
+
+    ranked = sorted(matches.values(), key=lambda match: (-match["score"], -match["last_updated"].timestamp()))
+    page = ranked[offset:offset + limit]
+    results = [
         {
-            "$project": {
-                "_id": 1,
-                "title": 1,
-                "last_updated": 1,
-                "matchedMessages": {
-                    "$slice": ["$relevantMessages", 2]  
-                },
-                "messageCount": {"$size": "$messages"},
-                "matchCount": {"$size": "$relevantMessages"}
-            }
-        },
-        {"$sort": {"last_updated": -1}},
-        {"$limit": limit}
+            "id": str(match["_id"]),
+            "title": match["title"],
+            "last_updated": match["last_updated"],
+            "total_messages": match.get("message_count", 0),
+            "match_count": match.get("match_count", 0),
+            "score": match["score"],
+            "preview_messages": match.get("preview_messages", [])
+        }
+        for match in page
     ]
-    
-    cursor = collection.aggregate(pipeline)
-    results = await cursor.to_list(length=None)
-    
-    # Format results
-    formatted_results = []
-    for result in results:
-        formatted_result = {
-            "id": str(result["_id"]),
-            "title": result["title"],
-            "last_updated": result["last_updated"],
-            "total_messages": result["messageCount"],
-            "match_count": result["matchCount"],
+    return {
+        "results": results,
+        "total": len(ranked),
+        "next_offset": offset + limit if offset + limit < len(ranked) else None,
+        "mode": mode
+    }
+
+async def _text_search_chats(query: str, max_candidates: int) -> dict:
+    messages = await get_message_collection()
+    cursor = messages.aggregate([
+        {"$match": {"$text": {"$search": query}}},
+        {"$addFields": {"score": {"$meta": "textScore"}}},
+        {"$group": {
+            "_id": "$chat_id",
+            "score": {"$max": "$score"},
+            "match_count": {"$sum": 1},
+            "preview_messages": {"$topN": {
+                "n": 2,
+                "sortBy": {"score": -1},
+                "output": {"content": "$content", "created_at": "$created_at"}
+            }}
+        }},
+        {"$sort": {"score": -1}},
+        {"$limit": max_candidates}
+    ])
+    by_chat = {match["_id"]: match for match in await cursor.to_list(length=max_candidates)}
+
+    collection = await get_chat_collection()
+    cursor = collection.find(
+        {"$text": {"$search": query}},
+        {"title": 1, "last_updated": 1, "message_count": 1, "title_score": {"$meta": "textScore"}}
+    ).sort([("title_score", {"$meta": "textScore"})]).limit(max_candidates)
+    titles = {chat["_id"]: chat for chat in await cursor.to_list(length=max_candidates)}
+    chats = await _chats_by_id([chat_id for chat_id in by_chat if chat_id not in titles])
+    chats.update(titles)
+    return _merge_matches(by_chat, chats)
+
+async def _regex_search_chats(query: str, max_candidates: int, timeout_ms: int) -> dict:
+    pattern = {"$regex": re.escape(query), "$options": "i"}
+    messages = await get_message_collection()
+    cursor = messages.aggregate([
+        {"$match": {"content": pattern}},
+        {"$sort": {"chat_id": 1, "created_at": 1, "_id": 1}},
+        {"$group": {
+            "_id": "$chat_id",
+            "match_count": {"$sum": 1},
+            "preview_messages": {"$firstN": {"n": 2, "input": {"content": "$content", "created_at": "$created_at"}}}
+        }},
+        {"$limit": max_candidates}
+    ], maxTimeMS=timeout_ms)
+    by_chat = {match["_id"]: match for match in await cursor.to_list(length=max_candidates)}
+
+    collection = await get_chat_collection()
+    cursor = collection.find({"title": pattern}, {"title": 1, "last_updated": 1, "message_count": 1})
+    cursor = cursor.limit(max_candidates).max_time_ms(timeout_ms)
+    chats = {chat["_id"]: chat for chat in await cursor.to_list(length=max_candidates)}
+    chats.update(await _chats_by_id([chat_id for chat_id in by_chat if chat_id not in chats]))
+    return _merge_matches(by_chat, chats)
+
+async def _chats_by_id(chat_ids: list) -> dict:
+    if not chat_ids:
+        return {}
+    collection = await get_chat_collection()
+    cursor = collection.find({"_id": {"$in": chat_ids}}, {"title": 1, "last_updated": 1, "message_count": 1})
+    return {chat["_id"]: chat for chat in await cursor.to_list(length=len(chat_ids))}
+
+def _merge_matches(message_matches: dict, chats: dict) -> dict:
+    # A chat scores its best matching message plus its title match, so a chat matching in both
+    # ranks above one matching in either. Chats deleted since their messages matched are dropped.
+    merged = {}
+    for chat_id, chat in chats.items():
+        match = message_matches.get(chat_id, {})
+        merged[chat_id] = {
+            **chat,
+            "_id": chat_id,
+            "last_updated": chat.get("last_updated") or chat_id.generation_time.replace(tzinfo=None),
+            "score": match.get("score", 0.0) + chat.get("title_score", 0.0),
+            "match_count": match.get("match_count", 0),
             "preview_messages": [
-                {
-                    "content": msg["content"],
-                    "created_at": msg["created_at"]
-                }
-                for msg in result.get("matchedMessages", [])
+                {"content": message["content"], "created_at": message["created_at"]}
+                for message in match.get("preview_messages", [])
             ]
         }
-        formatted_results.append(formatted_result)
-    
-    return formatted_results 
\ No newline at end of file
+    return merged
+
+async def create_ingest_job(job_data: dict):
+    collection = await get_ingest_job_collection()
+    await collection.insert_one({"_id": job_data["id"], **job_data})
+    return job_data["id"]
+
+async def get_ingest_job(job_id: str):
+    collection = await get_ingest_job_collection()
+    return await collection.find_one({"_id": job_id}, {"_id": 0})
+
+async def update_ingest_job(job_id: str, fields: dict):
+    collection = await get_ingest_job_collection()
+    await collection.update_one({"_id": job_id}, {"$set": fields})
+
+async def get_ingest_jobs_by_status(statuses: list):
+    collection = await get_ingest_job_collection()
+    cursor = collection.find({"status": {"$in": statuses}}, {"_id": 0})
+    return await cursor.to_list(length=None)
@@ -4,6 +4,7 @@ from pydantic import BaseModel, Field
 from bson import ObjectId
 
 class Source(BaseModel):
+    id: Optional[int] = None # chunk id in the vector store
     content: str # source content
     score: float = Field(default=1.0)
     filename: str
@@ -0,0 +1,10 @@
+from typing import Dict, Optional
+from pydantic import BaseModel, Field
+
+class ReindexRequest(BaseModel):
+    # a named profile, with any of its fields overridden
+    profile: str = "default"
+    index_type: Optional[str] = None
+    metric_type: Optional[str] = None
+    build_params: Dict = Field(default_factory=dict)
+    search_params: Dict = Field(default_factory=dict)
@@ -0,0 +1,31 @@
+from datetime import datetime
+from typing import Dict, Optional
+from pydantic import BaseModel, Field
+from uuid import uuid4
+
+STAGES = ("load", "chunk", "embed", "insert")
+
+class StageProgress(BaseModel):
+    status: str = "pending" # pending, running, done, failed
+    done: int = 0
+    total: int = 0
+    seconds: float = 0.0
+
+class IngestJob(BaseModel):
+    id: str = Field(default_factory=lambda: uuid4().hex)
+    filename: str
+    file_type: str
+    size: int = 0
+    chunk_size: int = 1000
+    chunk_overlap: int = 200
+    chunk_unit: str = "chars"
+    status: str = "queued" # queued, running, succeeded, failed, interrupted
+    stages: Dict[str, StageProgress] = Field(default_factory=lambda: {stage: StageProgress() for stage in STAGES})
+    chunks: int = 0
+    chunks_reused: int = 0
+    chunks_embedded: int = 0
+    error: Optional[str] = None
+    attempts: int = 0
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
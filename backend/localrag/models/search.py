@@ -0,0 +1,10 @@
+from typing import List, Optional
+from pydantic import BaseModel, Field
+
+class BatchSearchRequest(BaseModel):
+    # either query texts, embedded server side, or precomputed embeddings
+    queries: Optional[List[str]] = None
+    embeddings: Optional[List[List[float]]] = None
+    # restrict to these files, hits are then returned per file
+    filenames: Optional[List[str]] = None
+    limit: int = Field(default=5, ge=1, le=100)
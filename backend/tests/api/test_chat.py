@@ -0,0 +1,209 @@
+from datetime import datetime, timedelta
+
+import httpx
+import pytest
+from bson import ObjectId
+
+from localrag import create_app
+from localrag.api.routes import chat
+from localrag.core.vector_store import UragEngine
+from localrag.database import mongodb
+from localrag.database.mongodb import stored_message
+from tests.utils import FakeMilvusClient
+
+
+@pytest.fixture
+def chat_app(monkeypatch):
+    # five chats, two of them updated at the same time so the _id tie-break is exercised
+    start = datetime(2024, 1, 1)
+    docs = [
+        {"_id": ObjectId(), "title": f"chat {i}", "last_updated": start + timedelta(minutes=min(i, 3)),
+         "messages": [{"role": "user", "content": f"question {j}"} for j in range(i)]}
+        for i in range(5)
+    ]
+    pages = []
+
+    async def get_chat_page(limit, before=None):
+        pages.append(before)
+        ordered = sorted(docs, key=lambda doc: (doc["last_updated"], doc["_id"]), reverse=True)
+        if before is not None:
+            ordered = [doc for doc in ordered if (doc["last_updated"], doc["_id"]) < before]
+        return [
+            {"_id": doc["_id"], "title": doc["title"], "last_updated": doc["last_updated"], "message_count": len(doc["messages"])}
+            for doc in ordered[:limit]
+        ]
+
+    async def get_chat_message_page(chat_id, skip, limit):
+        chat_id = ObjectId(chat_id)
+        doc = next((doc for doc in docs if doc["_id"] == chat_id), None)
+        if doc is None:
+            return None
+        return {"_id": chat_id, "message_count": len(doc["messages"]), "messages": doc["messages"][skip:skip + limit]}
+
+    monkeypatch.setattr(chat, "get_chat_page", get_chat_page)
+    monkeypatch.setattr(chat, "get_chat_message_page", get_chat_message_page)
+    app = create_app()
+    app.state.docs = docs
+    app.state.pages = pages
+    yield app
+    app.state.process_pool.shutdown()
+
+
+async def _get(app, url, **params):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        return await client.get(url, params=params)
+
+
+async def test_chat_list_pages_with_cursor(chat_app):
+    seen = []
+    cursor = None
+    for _ in range(3):
+        params = {"limit": 2}
+        if cursor:
+            params["cursor"] = cursor
+        body = (await _get(chat_app, "/api/chat/", **params)).json()
+        seen.extend(body["chats"])
+        cursor = body["next_cursor"]
+        if cursor is None:
+            break
+
+    assert [chat["title"] for chat in seen] == ["chat 4", "chat 3", "chat 2", "chat 1", "chat 0"]
+    assert cursor is None
+    assert seen[0]["message_count"] == 4 and "messages" not in seen[0]
+    # the second page starts after the last chat of the first
+    last_updated, chat_id = chat_app.state.pages[1]
+    assert last_updated.isoformat() == seen[1]["last_updated"] and chat_id == ObjectId(seen[1]["id"])
+
+
+async def test_chat_list_has_no_cursor_on_last_page(chat_app):
+    body = (await _get(chat_app, "/api/chat/", limit=5)).json()
+    assert len(body["chats"]) == 5 and body["next_cursor"] is None
+
+
+async def test_chat_list_rejects_invalid_cursor(chat_app):
+    res = await _get(chat_app, "/api/chat/", cursor="not-a-cursor")
+    assert res.status_code == 400
+
+
+async def test_chat_messages_are_paged(chat_app):
+    chat_id = str(chat_app.state.docs[4]["_id"])
+    body = (await _get(chat_app, f"/api/chat/{chat_id}/messages", offset=1, limit=2)).json()
+    assert body["total"] == 4 and body["offset"] == 1
+    assert [message["content"] for message in body["messages"]] == ["question 1", "question 2"]
+
+
+async def test_delete_all_chats_empties_both_collections(chat_app, monkeypatch):
+    class FakeCollection:
+        def __init__(self, docs):
+            self.docs = docs
+
+        async def delete_many(self, query):
+            assert query == {}
+            self.docs.clear()
+
+    chats = FakeCollection([{"_id": ObjectId(), "title": "chat"}])
+    messages = FakeCollection([{"chat_id": chats.docs[0]["_id"], "content": "question"}])
+
+    async def get_chat_collection():
+        return chats
+
+    async def get_message_collection():
+        return messages
+
+    monkeypatch.setattr(mongodb, "get_chat_collection", get_chat_collection)
+    monkeypatch.setattr(mongodb, "get_message_collection", get_message_collection)
+    transport = httpx.ASGITransport(app=chat_app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        res = await client.delete("/api/chat/all")
+
+    assert res.status_code == 200 and res.json() == {"success": True}
+    assert chats.docs == [] and messages.docs == []
+
+
+async def test_chat_messages_of_unknown_chat(chat_app):
+    assert (await _get(chat_app, f"/api/chat/{ObjectId()}/messages")).status_code == 404
+    assert (await _get(chat_app, "/api/chat/not-an-id/messages")).status_code == 404
+
+
+async def test_chat_sources_are_read_back_from_the_vector_store(chat_app, monkeypatch):
+    client = FakeMilvusClient()
+    engine = UragEngine(client, "docs")
+    ids = engine.add(["a.pdf", "c.pdf"], ["chunk a", "chunk c"], [[0.0] * 4, [1.0] * 4], [{}] * 2)
+    chat_app.state.vector_db = engine
+    answer = {"role": "assistant", "content": "answer", "created_at": datetime(2024, 1, 1), "sources": [
+        {"id": ids[0], "content": "chunk a", "filename": "a.pdf", "score": 0.9},
+        {"id": ids[1], "content": "chunk c", "filename": "c.pdf", "score": 0.8},
+        {"content": "pasted text", "filename": "b.pdf", "score": 0.5},
+    ]}
+    stored = stored_message(ObjectId(), answer)
+    assert stored["sources"] == [
+        {"id": ids[0], "filename": "a.pdf", "score": 0.9},
+        {"id": ids[1], "filename": "c.pdf", "score": 0.8},
+        {"content": "pasted text", "filename": "b.pdf", "score": 0.5},
+    ]
+    engine.delete_by_filename("c.pdf")
+
+    async def get_chat_message_page(chat_id, skip, limit):
+        return {"message_count": 1, "messages": [{key: value for key, value in stored.items() if key != "chat_id"}]}
+
+    monkeypatch.setattr(chat, "get_chat_message_page", get_chat_message_page)
+    body = (await _get(chat_app, f"/api/chat/{ObjectId()}/messages")).json()
+    # the deleted chunk keeps its filename and score, without text
+    assert [(source["content"], source["filename"]) for source in body["messages"][0]["sources"]] == [
+        ("chunk a", "a.pdf"), ("", "c.pdf"), ("pasted text", "b.pdf")
+    ]
+    assert client.calls.count("get") == 1
+
+
+async def test_chat_search_skips_short_queries(chat_app, monkeypatch):
+    calls = []
+
+    async def search_chats(query, limit, offset, **kwargs):
+        calls.append((query, limit, offset))
+        return {"results": [], "total": 0, "next_offset": None, "mode": "text"}
+
+    monkeypatch.setattr(chat, "search_chats", search_chats)
+    assert (await _get(chat_app, "/api/chat/search", q=" e ")).json()["mode"] == "none"
+    assert (await _get(chat_app, "/api/chat/search", q=" embedding ", limit=5, offset=10)).json()["mode"] == "text"
+    assert calls == [("embedding", 5, 10)]
+
+
+async def test_chat_search_ranks_pages_and_falls_back(monkeypatch):
+    chats = {
+        ObjectId(): {"title": f"chat {i}", "last_updated": datetime(2024, 1, 1 + i), "message_count": 4}
+        for i in range(3)
+    }
+    first, second, third = chats
+    chats[second]["title_score"] = 1.0
+    message_matches = {
+        first: {"score": 1.5, "match_count": 2, "preview_messages": [{"content": "hit", "created_at": datetime(2024, 1, 1)}]},
+        second: {"score": 1.5, "match_count": 1, "preview_messages": []},
+        third: {"score": 1.5, "match_count": 1, "preview_messages": []},
+    }
+    calls = []
+
+    async def text_search(query, max_candidates):
+        calls.append("text")
+        return mongodb._merge_matches(message_matches, chats) if query == "hit" else {}
+
+    async def regex_search(query, max_candidates, timeout_ms):
+        calls.append("regex")
+        return mongodb._merge_matches({}, {third: chats[third]})
+
+    monkeypatch.setattr(mongodb, "_text_search_chats", text_search)
+    monkeypatch.setattr(mongodb, "_regex_search_chats", regex_search)
+
+    page = await mongodb.search_chats("hit", limit=2)
+    # title and message match first, then the newer of two equal scores
+    assert [result["title"] for result in page["results"]] == ["chat 1", "chat 2"]
+    assert page["results"][0]["score"] == 2.5
+    assert page["next_offset"] == 2 and page["total"] == 3 and page["mode"] == "text"
+    page = await mongodb.search_chats("hit", limit=2, offset=2)
+    assert [result["title"] for result in page["results"]] == ["chat 0"] and page["next_offset"] is None
+    assert page["results"][0]["preview_messages"][0]["content"] == "hit"
+    assert calls == ["text", "text"]
+
+    page = await mongodb.search_chats("hi", limit=2)
+    assert page["mode"] == "regex" and [result["title"] for result in page["results"]] == ["chat 2"]
+    assert calls[-2:] == ["text", "regex"]
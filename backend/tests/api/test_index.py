@@ -0,0 +1,44 @@
+import httpx
+import pytest
+
+from localrag import create_app
+from localrag.config import get_settings
+from localrag.core.vector_store import UragEngine
+from tests.utils import FakeMilvusClient
+
+
+@pytest.fixture
+def index_app(monkeypatch):
+    monkeypatch.setattr(get_settings(), "milvus_reindex_drain_seconds", 0)
+    client = FakeMilvusClient()
+    engine = UragEngine(client, "docs")
+    engine.add(["a.pdf"] * 3, ["a", "b", "c"], [[float(i)] * 4 for i in range(3)], [{}] * 3)
+    app = create_app()
+    app.state.vector_db = engine
+    yield app
+    app.state.process_pool.shutdown()
+
+
+async def _request(app, method, url, **kwargs):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        return await client.request(method, url, **kwargs)
+
+
+async def test_reindex_runs_in_background(index_app):
+    res = await _request(index_app, "GET", "/api/index")
+    assert res.json()["index"]["index_type"] == "IVF_FLAT" and res.json()["reindex"] is None
+
+    res = await _request(index_app, "POST", "/api/index/reindex", json={"profile": "exact", "metric_type": "COSINE"})
+    assert res.status_code == 202
+    await index_app.state.reindex_task
+
+    body = (await _request(index_app, "GET", "/api/index")).json()
+    assert body["collection"] == "docs__g1"
+    assert body["index"]["index_type"] == "FLAT" and body["index"]["metric_type"] == "COSINE"
+    assert body["reindex"]["state"] == "succeeded" and body["reindex"]["copied"] == 3
+
+
+async def test_reindex_rejects_unknown_profile(index_app):
+    res = await _request(index_app, "POST", "/api/index/reindex", json={"profile": "fastest"})
+    assert res.status_code == 400
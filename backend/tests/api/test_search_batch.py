@@ -0,0 +1,81 @@
+import random
+
+import httpx
+import pytest
+
+from localrag import create_app
+from localrag.config import get_settings
+from localrag.core.document_processor import DocumentProcessor
+from localrag.core.vector_store import UragEngine
+from tests.utils import FakeMilvusClient
+
+
+async def _fake_embed_texts(self, texts):
+    return [[float(len(text))] + [0.0] * 3 for text in texts]
+
+
+@pytest.fixture
+def batch_app(monkeypatch):
+    monkeypatch.setattr(DocumentProcessor, "aembed_texts", _fake_embed_texts)
+    rng = random.Random(1)
+    client = FakeMilvusClient()
+    engine = UragEngine(client, "docs", search_batch_size=50)
+    for filename in ["a.pdf", "b.pdf"]:
+        engine.add(
+            [filename] * 10,
+            [f"{filename}-{i}" for i in range(10)],
+            [[rng.random() * 10 for _ in range(4)] for _ in range(10)],
+            [{}] * 10
+        )
+    app = create_app()
+    app.state.vector_db = engine
+    app.state.milvus_client = client
+    yield app
+    app.state.process_pool.shutdown()
+
+
+async def _post(app, payload):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        return await client.post("/api/search/batch", json=payload, headers={"X-OpenAI-Key": "test"})
+
+
+async def test_batch_of_embeddings_is_one_request(batch_app):
+    rng = random.Random(2)
+    embeddings = [[rng.random() * 10 for _ in range(4)] for _ in range(120)]
+    client = batch_app.state.milvus_client
+    client.calls.clear()
+
+    response = await _post(batch_app, {"embeddings": embeddings, "limit": 3})
+
+    assert response.status_code == 200, response.text
+    results = response.json()["results"]
+    assert [result["query"] for result in results] == list(range(120))
+    assert results[7]["hits"] == batch_app.state.vector_db.similarity_search(embeddings[7], limit=3)
+    assert client.search_sizes[:3] == [50, 50, 20]
+
+
+async def test_batch_of_queries_scoped_to_files(batch_app):
+    response = await _post(batch_app, {"queries": ["short", "a longer query"], "filenames": ["a.pdf", "b.pdf"], "limit": 2})
+
+    assert response.status_code == 200, response.text
+    results = response.json()["results"]
+    assert [result["query"] for result in results] == ["short", "a longer query"]
+    for result in results:
+        assert set(result["files"]) == {"a.pdf", "b.pdf"}
+        assert all(hit["filename"] == "a.pdf" for hit in result["files"]["a.pdf"])
+        assert len(result["files"]["b.pdf"]) == 2
+
+
+@pytest.mark.parametrize("payload, status", [
+    ({"limit": 3}, 400),
+    ({"queries": ["q"], "embeddings": [[0.0] * 4]}, 400),
+    ({"embeddings": [[0.0] * 4]} , 200),
+])
+async def test_batch_validation(batch_app, payload, status):
+    assert (await _post(batch_app, payload)).status_code == status
+
+
+async def test_batch_size_is_capped(batch_app, monkeypatch):
+    monkeypatch.setattr(get_settings(), "search_batch_max_queries", 2)
+    assert (await _post(batch_app, {"queries": ["a", "b", "c"]})).status_code == 413
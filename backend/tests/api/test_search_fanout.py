@@ -0,0 +1,188 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import httpx
+import pytest
+from openai.resources.chat.completions import AsyncCompletions
+
+from localrag import create_app
+from localrag.api.routes import search
+from localrag.config import get_settings
+from localrag.core import chat_history
+from localrag.core.document_processor import DocumentProcessor
+from localrag.core.lexical_index import LexicalIndex
+from localrag.core.web_search import WebSearchEngine
+
+DELAY = 0.3
+
+
+class SlowEngine:
+    """Blocking vector store, one result per search, `slow_filters` never answer in time."""
+
+    def __init__(self, slow_filters=()):
+        self.slow_filters = slow_filters
+        self.filters = []
+        self.chunks = {}
+
+    def similarity_search(self, query_embedding, limit=5, metadata_filter="", similarity_threshold=0.3, output_vectors=False):
+        self.filters.append(metadata_filter)
+        time.sleep(DELAY * 4 if metadata_filter in self.slow_filters else DELAY)
+        return [{"content": f"hit for {metadata_filter or 'all'}", "metadata": {}, "score": 0.5}]
+
+    def search_files(self, query_embeddings, filenames, limit=5, output_vectors=False):
+        self.filters.append(tuple(filenames))
+        time.sleep(DELAY * 4 if any(name in self.slow_filters for name in filenames) else DELAY)
+        return [{name: [{"content": f"hit for {name}", "metadata": {}, "score": 0.5}] for name in filenames}]
+
+    def get_chunks(self, ids):
+        return {chunk_id: self.chunks[chunk_id] for chunk_id in ids if chunk_id in self.chunks}
+
+
+async def _fake_query_embedding(self, text):
+    return [0.0] * 8
+
+
+async def _fake_search_url(self, urls):
+    await asyncio.sleep(DELAY)
+    return [{"score": None, "title": url, "url": url, "text": f"page {url}", "highlights": []} for url in urls]
+
+
+async def _fake_get_chat_window(chat_id, limit):
+    await asyncio.sleep(DELAY)
+    return {"message_count": 1, "messages": [{"role": "user", "content": "earlier question"}]}
+
+
+async def _fake_update_chat(chat_id, messages):
+    return True
+
+
+async def _completion(self, **kwargs):
+    _completion.messages = kwargs["messages"]
+    message = SimpleNamespace(content='{"answer": "ok", "used_context": true, "used_web": true}')
+    return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+
+@pytest.fixture
+def fanout_app(monkeypatch):
+    monkeypatch.setattr(chat_history, "get_chat_window", _fake_get_chat_window)
+    monkeypatch.setattr(search, "update_chat", _fake_update_chat)
+    monkeypatch.setattr(DocumentProcessor, "get_embedding", _fake_query_embedding)
+    monkeypatch.setattr(WebSearchEngine, "search_url", _fake_search_url)
+    monkeypatch.setattr(AsyncCompletions, "create", _completion)
+    app = create_app()
+    yield app
+    app.state.process_pool.shutdown()
+
+
+async def _search(app, references, **fields):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        started = time.perf_counter()
+        response = await client.post(
+            "/api/search",
+            json={"query": "compare these", "chatId": "chat-1", "references": references, **fields},
+            headers={"X-OpenAI-Key": "test", "X-OpenAI-Model": "test", "X-Exa-Key": "test"},
+        )
+        return response, time.perf_counter() - started
+
+
+async def test_retrieval_branches_run_concurrently(fanout_app):
+    fanout_app.state.vector_db = engine = SlowEngine()
+    references = [
+        {"type": "file", "source": "a.pdf"},
+        {"type": "file", "source": "b.pdf"},
+        {"type": "web", "source": "https://example.com/x"},
+        {"type": "web", "source": "https://example.com/y"},
+    ]
+    response, elapsed = await _search(fanout_app, references)
+
+    assert response.status_code == 200, response.text
+    body = response.json()
+    # sequentially this would be 2 vector searches, 2 fetches and the history load
+    assert elapsed < DELAY * 3
+    assert sorted(engine.filters, key=str) == ["", ("a.pdf", "b.pdf")]
+    # the two file hits are fewer than 3, so the unscoped results are appended after them
+    assert [source["content"] for source in body["sources"]] == ["hit for a.pdf", "hit for b.pdf", "hit for all"]
+    assert [source["url"] for source in body["web_sources"]] == ["https://example.com/x", "https://example.com/y"]
+    assert "earlier question" in _completion.messages[1]["content"]
+
+
+async def test_slow_source_is_dropped_after_timeout(fanout_app, monkeypatch):
+    monkeypatch.setattr(get_settings(), "search_vector_timeout_seconds", DELAY * 2)
+    fanout_app.state.vector_db = SlowEngine(slow_filters=("slow.pdf",))
+    references = [{"type": "file", "source": "slow.pdf"}, {"type": "web", "source": "https://example.com/x"}]
+    response, elapsed = await _search(fanout_app, references)
+
+    assert response.status_code == 200, response.text
+    assert elapsed < DELAY * 4
+    assert [source["content"] for source in response.json()["sources"]] == ["hit for all"]
+    assert len(response.json()["web_sources"]) == 1
+
+
+async def test_hybrid_search_fuses_lexical_hits(fanout_app):
+    engine = fanout_app.state.vector_db = SlowEngine()
+    rows = [
+        {"id": 1, "filename": "a.pdf", "content": "Retry when the proxy returns ERR_CONN_RESET"},
+        {"id": 2, "filename": "b.pdf", "content": "Unrelated release notes"},
+    ]
+    engine.chunks = {row["id"]: {"filename": row["filename"], "content": row["content"]} for row in rows}
+    lexical_index = fanout_app.state.lexical_index = LexicalIndex()
+    lexical_index.load([rows])
+    references = [{"type": "file", "source": "a.pdf"}]
+
+    response, _ = await _search(fanout_app, references, query="what is ERR_CONN_RESET", hybrid=True)
+    assert response.status_code == 200, response.text
+    contents = [source["content"] for source in response.json()["sources"]]
+    assert contents[:2] == ["hit for a.pdf", "Retry when the proxy returns ERR_CONN_RESET"]
+    assert "Unrelated release notes" not in contents
+
+    response, _ = await _search(fanout_app, references, query="what is ERR_CONN_RESET")
+    contents = [source["content"] for source in response.json()["sources"]]
+    assert "Retry when the proxy returns ERR_CONN_RESET" not in contents
+
+
+class CandidateEngine:
+    """Over-fetch target: near-duplicate chunks of a.pdf plus one distinct chunk."""
+
+    def __init__(self):
+        self.calls = []
+
+    def _hits(self, filename, limit, output_vectors):
+        hits = [
+            {"content": "install with pip", "filename": filename, "score": 0.1, "embedding": [1.0, 0.0] + [0.0] * 6},
+            {"content": "install it with pip", "filename": filename, "score": 0.11, "embedding": [0.999, 0.01] + [0.0] * 6},
+            {"content": "configure the proxy", "filename": filename, "score": 0.4, "embedding": [0.6, 0.8] + [0.0] * 6},
+        ][:limit]
+        if not output_vectors:
+            for hit in hits:
+                del hit["embedding"]
+        return hits
+
+    def similarity_search(self, query_embedding, limit=5, metadata_filter="", similarity_threshold=0.3, output_vectors=False):
+        self.calls.append(("all", limit, output_vectors))
+        return self._hits("other.pdf", limit, output_vectors)
+
+    def search_files(self, query_embeddings, filenames, limit=5, output_vectors=False):
+        self.calls.append((tuple(filenames), limit, output_vectors))
+        return [{name: self._hits(name, limit, output_vectors) for name in filenames}]
+
+
+async def test_rerank_drops_near_duplicates(fanout_app, monkeypatch):
+    monkeypatch.setattr(get_settings(), "search_rerank_candidates", 12)
+    fanout_app.state.vector_db = engine = CandidateEngine()
+    references = [{"type": "file", "source": "a.pdf"}]
+
+    response, _ = await _search(fanout_app, references, rerank=True)
+    assert response.status_code == 200, response.text
+    sources = response.json()["sources"]
+    assert sorted(engine.calls, key=str) == [("all", 12, True), (("a.pdf",), 12, True)]
+    # a.pdf returned 3 hits, so the unscoped ones aren't candidates
+    assert [source["content"] for source in sources] == ["install with pip", "configure the proxy"]
+    assert all("embedding" not in source for source in sources)
+    assert "rerank" in fanout_app.state.search_metrics.summary()
+
+    engine.calls = []
+    response, _ = await _search(fanout_app, references)
+    assert sorted(engine.calls, key=str) == [("all", 5, False), (("a.pdf",), 5, False)]
+    assert len(response.json()["sources"]) == 3
@@ -0,0 +1,136 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import httpx
+import pytest
+from openai.resources.chat.completions import AsyncCompletions
+
+from localrag import create_app
+from localrag.api.routes import search
+from localrag.core.document_processor import DocumentProcessor
+
+ANSWER = 'Streaming "works" 😀'
+
+
+class FakeEngine:
+    def similarity_search(self, query_embedding, limit=5, metadata_filter="", similarity_threshold=0.3, output_vectors=False):
+        return [{"content": "chunk text", "metadata": {"filename": "a.pdf"}, "score": 0.9}]
+
+
+async def _fake_query_embedding(self, text):
+    return [0.0] * 8
+
+
+async def _stream_completion(self, **kwargs):
+    assert kwargs["stream"] is True
+    document = json.dumps({"answer": ANSWER, "used_context": True})
+
+    async def chunks():
+        for i in range(0, len(document), 5):
+            await asyncio.sleep(0)
+            delta = SimpleNamespace(content=document[i:i + 5])
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=delta)])
+
+    return chunks()
+
+
+def _parse_events(body):
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.split("\n"))
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+@pytest.fixture
+def stream_app(monkeypatch):
+    saved = []
+
+    async def fake_create_chat(chat):
+        saved.append(chat)
+        return "chat-id"
+
+    monkeypatch.setattr(search, "create_chat", fake_create_chat)
+    monkeypatch.setattr(DocumentProcessor, "get_embedding", _fake_query_embedding)
+    monkeypatch.setattr(AsyncCompletions, "create", _stream_completion)
+    app = create_app()
+    app.state.vector_db = FakeEngine()
+    app.state.saved_chats = saved
+    yield app
+    app.state.process_pool.shutdown()
+
+
+async def test_stream_sends_sources_then_tokens_and_persists(stream_app):
+    transport = httpx.ASGITransport(app=stream_app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        response = await client.post(
+            "/api/search/stream",
+            json={"query": "what is in a.pdf?", "initial": True},
+            headers={"X-OpenAI-Key": "test", "X-OpenAI-Model": "test"},
+        )
+        metrics = (await client.get("/api/search/metrics")).json()
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = _parse_events(response.text)
+    names = [name for name, _ in events]
+    assert names[0] == "retrieval" and names[-1] == "done"
+    assert set(names[1:-1]) == {"token"} and len(names) > 3
+    assert events[0][1]["sources"][0]["content"] == "chunk text"
+    assert "".join(data["text"] for name, data in events if name == "token") == ANSWER
+
+    done = events[-1][1]
+    assert done["chat_id"] == "chat-id"
+    assert done["answer"] == ANSWER
+    assert done["ttft_ms"] is not None and done["ttft_ms"] <= done["total_ms"]
+    assert stream_app.state.saved_chats[0]["messages"][1]["content"] == ANSWER
+    assert metrics["ttft"]["count"] == 1
+
+
+async def test_follow_up_without_chat_id_is_rejected(stream_app):
+    transport = httpx.ASGITransport(app=stream_app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        response = await client.post(
+            "/api/search/stream",
+            json={"query": "and then?"},
+            headers={"X-OpenAI-Key": "test", "X-OpenAI-Model": "test"},
+        )
+    assert response.status_code == 400
+
+
+async def test_repeated_question_is_answered_from_cache(stream_app, monkeypatch):
+    completions = []
+
+    async def counting_completion(self, **kwargs):
+        completions.append(kwargs)
+        return await _stream_completion(self, **kwargs)
+
+    async def unit_embedding(self, text):
+        return [1.0] + [0.0] * 7
+
+    monkeypatch.setattr(AsyncCompletions, "create", counting_completion)
+    monkeypatch.setattr(DocumentProcessor, "get_embedding", unit_embedding)
+    stream_app.state.vector_db.similarity_search = lambda *args, **kwargs: [
+        {"id": 7, "content": "chunk text", "filename": "a.pdf", "score": 0.9}
+    ]
+    transport = httpx.ASGITransport(app=stream_app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        async def ask():
+            response = await client.post(
+                "/api/search/stream",
+                json={"query": "what is in a.pdf?", "initial": True},
+                headers={"X-OpenAI-Key": "test", "X-OpenAI-Model": "test"},
+            )
+            return _parse_events(response.text)
+
+        first, second = await ask(), await ask()
+        stream_app.state.answer_cache.invalidate_filename("a.pdf")
+        third = await ask()
+
+    assert len(completions) == 2
+    assert [event[1]["cached"] for event in (first[-1], second[-1], third[-1])] == [False, True, False]
+    assert second[-1][1]["answer"] == ANSWER
+    assert second[-1][1]["sources"][0]["id"] == 7
+    assert len(stream_app.state.saved_chats) == 3
+    assert stream_app.state.answer_cache.stats()["hits"] == 1
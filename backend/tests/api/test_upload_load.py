@@ -0,0 +1,126 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import httpx
+import pytest
+from openai.resources.chat.completions import AsyncCompletions
+
+from localrag import create_app
+from localrag.api.routes import documents, search
+from localrag.core.document_processor import DocumentProcessor
+from localrag.core.ingest_jobs import IngestJobManager, MemoryJobStore
+from tests.utils import make_pdf
+
+UPLOADS = 4
+PAGES_PER_UPLOAD = 300
+
+
+class SlowEngine:
+    """Vector store whose writes block like a remote RPC would."""
+
+    def add(self, filenames, texts, embeddings, metadata):
+        time.sleep(0.3)
+        return list(range(len(texts)))
+
+    def ids_by_filename(self, filename):
+        return []
+
+    def delete_by_ids(self, ids):
+        return True
+
+    def similarity_search(self, query_embedding, limit=5, metadata_filter="", similarity_threshold=0.3, output_vectors=False):
+        return []
+
+
+async def _completion(*args, **kwargs):
+    message = SimpleNamespace(content='{"answer": "ok", "used_context": false}')
+    return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+
+async def _fake_embed_texts(self, texts):
+    await asyncio.sleep(0.05)
+    return [[0.0] * 8 for _ in texts]
+
+
+async def _fake_query_embedding(self, text):
+    return [0.0] * 8
+
+
+async def _fake_create_chat(chat):
+    return "chat-id"
+
+
+def _p99(samples):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+
+
+@pytest.fixture
+async def load_app(monkeypatch, tmp_path):
+    monkeypatch.setattr(documents, "UPLOAD_DIR", tmp_path)
+    monkeypatch.setattr(search, "create_chat", _fake_create_chat)
+    monkeypatch.setattr(DocumentProcessor, "aembed_texts", _fake_embed_texts)
+    monkeypatch.setattr(DocumentProcessor, "get_embedding", _fake_query_embedding)
+    monkeypatch.setattr(AsyncCompletions, "create", _completion)
+    app = create_app()
+    app.state.vector_db = SlowEngine()
+    app.state.chunk_index = None
+    app.state.ingest_jobs = IngestJobManager(
+        MemoryJobStore(), app.state.vector_db, tmp_path, process_pool=app.state.process_pool, max_concurrent_jobs=UPLOADS
+    )
+    await app.state.ingest_jobs.start()
+    yield app
+    await app.state.ingest_jobs.stop()
+    app.state.process_pool.shutdown()
+
+
+async def _search_latencies(client, count):
+    latencies = []
+    for _ in range(count):
+        start = time.perf_counter()
+        response = await client.post(
+            "/api/search",
+            json={"query": "what is in my documents?", "initial": True},
+            headers={"X-OpenAI-Key": "test", "X-OpenAI-Model": "test"},
+        )
+        latencies.append(time.perf_counter() - start)
+        assert response.status_code == 200
+        await asyncio.sleep(0.01)
+    return latencies
+
+
+async def _upload(client, index, pdf):
+    response = await client.post(
+        "/api/documents/upload",
+        files={"file": (f"large-{index}.pdf", pdf, "application/pdf")},
+        headers={"X-OpenAI-Key": "test"},
+    )
+    assert response.status_code == 202, response.text
+    job_id = response.json()["job_id"]
+    while True:
+        job = (await client.get(f"/api/documents/jobs/{job_id}")).json()
+        if job["status"] not in ("queued", "running"):
+            break
+        await asyncio.sleep(0.1)
+    assert job["status"] == "succeeded", job
+    return job
+
+
+@pytest.mark.load
+async def test_search_p99_flat_during_large_uploads(load_app):
+    pdf = make_pdf(PAGES_PER_UPLOAD)
+    transport = httpx.ASGITransport(app=load_app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        # warm up the worker processes so spawn cost is not measured as load
+        await _upload(client, "warmup", make_pdf(1))
+        idle = await _search_latencies(client, 50)
+
+        uploads = asyncio.gather(*(_upload(client, i, pdf) for i in range(UPLOADS)))
+        loaded = await _search_latencies(client, 50)
+        await uploads
+
+    idle_p99, loaded_p99 = _p99(idle), _p99(loaded)
+    assert loaded_p99 < idle_p99 + 0.25, (
+        f"search p99 idle={idle_p99 * 1000:.1f}ms under load={loaded_p99 * 1000:.1f}ms"
+    )
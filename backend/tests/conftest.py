@@ -1,6 +1,14 @@
 import pytest
 from fastapi.testclient import TestClient
 from localrag import create_app
+from localrag.config import get_settings
+
+@pytest.fixture(autouse=True)
+def data_paths(monkeypatch, tmp_path):
+    # apps built by tests keep their on-disk state in the test's own directory, not in backend/data
+    settings = get_settings()
+    monkeypatch.setattr(settings, "chunk_index_path", str(tmp_path / "chunk_embeddings.sqlite"))
+    monkeypatch.setattr(settings, "local_vector_path", str(tmp_path / "vectors"))
 
 @pytest.fixture
 def app():
@@ -0,0 +1,12 @@
+import pytest
+from tests.utils import FakeMilvusClient
+
+
+@pytest.fixture
+def make_fake_client():
+    return FakeMilvusClient
+
+
+@pytest.fixture
+def fake_client(make_fake_client):
+    return make_fake_client()
@@ -0,0 +1,51 @@
+import time
+
+from localrag.core.answer_cache import AnswerCache, chunk_ids
+
+HITS = [{"id": 1, "filename": "a.pdf", "content": "x"}, {"id": 2, "filename": "b.pdf", "content": "y"}]
+
+
+def test_hit_needs_similar_query_and_same_chunks():
+    cache = AnswerCache(min_similarity=0.95)
+    cache.set([1.0, 0.0], chunk_ids(HITS), {"a.pdf", "b.pdf"}, {"answer": "cached"}, scope="gpt")
+
+    assert cache.get([0.99, 0.05], chunk_ids(HITS), "gpt") == {"answer": "cached"}
+    assert cache.get([0.6, 0.8], chunk_ids(HITS), "gpt") is None
+    assert cache.get([1.0, 0.0], chunk_ids(HITS[:1]), "gpt") is None
+    assert cache.get([1.0, 0.0], chunk_ids(HITS), "other-model") is None
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 3
+    assert cache.stats()["hit_rate"] == 0.25
+
+
+def test_chunk_ids_fall_back_to_content_hash():
+    assert chunk_ids(HITS) == frozenset({"1", "2"})
+    without_ids = chunk_ids([{"filename": "a.pdf", "content": "x"}])
+    assert without_ids == chunk_ids([{"filename": "a.pdf", "content": "x", "score": 0.3}])
+    assert without_ids != chunk_ids([{"filename": "b.pdf", "content": "x"}])
+
+
+def test_invalidate_filename_drops_contributing_entries():
+    cache = AnswerCache()
+    cache.set([1.0, 0.0], chunk_ids(HITS), {"a.pdf", "b.pdf"}, {"answer": "both"})
+    cache.set([0.0, 1.0], chunk_ids(HITS[1:]), {"b.pdf"}, {"answer": "b only"})
+
+    assert cache.invalidate_filename("a.pdf") == 1
+    assert cache.get([1.0, 0.0], chunk_ids(HITS)) is None
+    assert cache.get([0.0, 1.0], chunk_ids(HITS[1:])) == {"answer": "b only"}
+    assert cache.invalidate_filename("b.pdf") == 1
+    assert len(cache) == 0 and cache.stats()["invalidations"] == 2
+
+
+def test_lru_and_ttl_eviction():
+    cache = AnswerCache(max_entries=2)
+    for i in range(3):
+        cache.set([1.0, float(i)], frozenset({str(i)}), {"a.pdf"}, {"answer": i})
+    assert cache.get([1.0, 0.0], frozenset({"0"})) is None
+    assert cache.get([1.0, 1.0], frozenset({"1"})) == {"answer": 1}
+    assert cache.stats()["evictions"] == 1
+
+    expiring = AnswerCache(ttl_seconds=0.01)
+    expiring.set([1.0], frozenset(), set(), {"answer": "old"})
+    time.sleep(0.02)
+    assert expiring.get([1.0], frozenset()) is None
+    assert len(expiring) == 0
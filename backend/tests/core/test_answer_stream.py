@@ -0,0 +1,45 @@
+import json
+import random
+
+import pytest
+from localrag.core.answer_stream import JsonStringFieldStreamer
+
+ANSWERS = [
+    "Plain answer.",
+    "Line one\nLine two with \"quotes\" and a back\\slash",
+    "Unicode: café, 東京, emoji 😀 and tab\tend",
+    "",
+]
+
+
+def stream(document, rng):
+    streamer = JsonStringFieldStreamer("answer")
+    pieces = []
+    i = 0
+    while i < len(document):
+        step = rng.randint(1, 6)
+        pieces.append(streamer.feed(document[i:i + step]))
+        i += step
+    return "".join(pieces), streamer
+
+
+@pytest.mark.parametrize("ensure_ascii", [True, False])
+@pytest.mark.parametrize("answer", ANSWERS)
+def test_streamed_answer_matches_full_parse(answer, ensure_ascii):
+    rng = random.Random(0)
+    for used_first in (False, True):
+        payload = {"used_context": True, "answer": answer} if used_first else {"answer": answer, "used_context": True}
+        document = json.dumps(payload, ensure_ascii=ensure_ascii, indent=rng.choice([None, 2]))
+        for _ in range(50):
+            text, streamer = stream(document, rng)
+            assert text == answer
+            assert streamer.finished
+
+
+def test_nothing_is_emitted_before_the_field():
+    streamer = JsonStringFieldStreamer("answer")
+    assert streamer.feed('{"used_web": false, ') == ""
+    assert streamer.feed('"answer": "Hel') == "Hel"
+    assert streamer.feed('lo\\') == "lo"
+    assert streamer.feed('n"}') == "\n"
+    assert streamer.feed("trailing") == ""
@@ -0,0 +1,99 @@
+from types import SimpleNamespace
+
+import pytest
+
+from localrag.core import chat_history
+from localrag.core.chat_history import ChatHistory
+
+
+class WordCounter:
+    def count(self, texts):
+        return [len(text.split()) for text in texts]
+
+
+class FakeChats:
+    """The chat_history database calls over an in-memory chat, windows sliced like $slice."""
+
+    def __init__(self, messages, summary=None):
+        self.messages = messages
+        self.summary = summary
+        self.windows = []
+
+    async def get_chat_window(self, chat_id, limit):
+        self.windows.append(limit)
+        chat = {"message_count": len(self.messages), "messages": self.messages[-limit:] if limit else []}
+        if self.summary is not None:
+            chat["history_summary"] = self.summary
+        return chat
+
+    async def get_chat_messages(self, chat_id, skip, limit):
+        return self.messages[skip:skip + limit]
+
+    async def update_chat_summary(self, chat_id, summary, previous_through):
+        if (self.summary or {}).get("through", 0) != previous_through:
+            return False
+        self.summary = summary
+        return True
+
+
+class FakeClient:
+    def __init__(self):
+        self.prompts = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    async def create(self, **kwargs):
+        self.prompts.append(kwargs["messages"][1]["content"])
+        message = SimpleNamespace(content=f" summary {len(self.prompts)} ")
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+
+def _messages(count):
+    return [{"role": "user" if i % 2 == 0 else "assistant", "content": f"message {i}"} for i in range(count)]
+
+
+@pytest.fixture
+def chats(monkeypatch):
+    def install(messages, summary=None):
+        fake = FakeChats(messages, summary)
+        for name in ("get_chat_window", "get_chat_messages", "update_chat_summary"):
+            monkeypatch.setattr(chat_history, name, getattr(fake, name))
+        return fake
+    return install
+
+
+async def test_load_reads_window_and_skips_summarized_messages(chats):
+    fake = chats(_messages(20), {"text": "earlier things", "through": 13})
+    history = ChatHistory(window_messages=4, summary_batch_messages=3, token_counter=WordCounter())
+
+    text = await history.load("chat")
+    assert fake.windows == [7]
+    assert text.startswith("\nPrevious conversation:\nSummary of the earlier conversation: earlier things\n")
+    # messages 13-19: the window plus the ones not summarized yet
+    assert "Assistant: message 13" in text and "Assistant: message 19" in text
+    assert "message 12" not in text
+
+
+async def test_format_keeps_newest_messages_within_budget():
+    history = ChatHistory(token_budget=7, token_counter=WordCounter())
+    text = history.format("old summary", _messages(6))
+    # each line is 3 words: the last two fit, the summary doesn't anymore
+    assert text == "\nPrevious conversation:\nUser: message 4\nAssistant: message 5\n\n"
+    assert history.format("", []) == ""
+
+
+async def test_update_summary_folds_messages_out_of_the_window(chats):
+    fake = chats(_messages(12))
+    client = FakeClient()
+    history = ChatHistory(window_messages=4, summary_batch_messages=3)
+
+    assert await history.update_summary("chat", client, "model")
+    assert fake.summary["text"] == "summary 1" and fake.summary["through"] == 8
+    assert "message 7" in client.prompts[0] and "message 8" not in client.prompts[0]
+
+    fake.messages = _messages(14)
+    # only 2 more messages left the window, fewer than a batch
+    assert not await history.update_summary("chat", client, "model")
+    fake.messages = _messages(16)
+    assert await history.update_summary("chat", client, "model")
+    assert fake.summary == {**fake.summary, "text": "summary 2", "through": 12}
+    assert "summary 1" in client.prompts[1] and "message 8" in client.prompts[1]
@@ -0,0 +1,98 @@
+import random
+
+import pytest
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from localrag.core.chunker import Chunker
+from localrag.core.document_processor import DocumentLoader
+from tests.utils import make_text
+
+SEPARATORS = ["\n\n", "\n", " ", ""]
+ALPHABET = ["a", "bb", "word", "\n", "\n\n", "\n\n\n", " ", "  ", "\t", "ccc", "é", "."]
+
+
+class WordEncoding:
+    # Stand-in for tiktoken so token mode runs offline: one token per word
+    def encode(self, text, disallowed_special=()):
+        return text.split() or ([0] if text else [])
+
+
+def make_document(seed):
+    rng = random.Random(seed)
+    paragraphs = []
+    for i in range(rng.randint(5, 40)):
+        lines = [make_text(rng.randint(1, 60), seed=seed * 1000 + i * 10 + j) for j in range(rng.randint(1, 6))]
+        paragraphs.append("\n".join(lines))
+    return "\n\n".join(paragraphs)
+
+
+def reference_splitter(chunk_size, chunk_overlap, length_function=len):
+    return RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        length_function=length_function,
+        separators=SEPARATORS
+    )
+
+
+def test_default_config_matches_langchain():
+    reference = reference_splitter(1000, 200)
+    chunker = Chunker()
+    for seed in range(20):
+        text = make_document(seed)
+        assert chunker.split_text(text) == reference.split_text(text)
+
+
+def test_small_configs_match_langchain_on_random_text():
+    rng = random.Random(99)
+    for _ in range(3000):
+        chunk_size = rng.randint(1, 40)
+        chunk_overlap = rng.randint(0, chunk_size)
+        text = "".join(rng.choice(ALPHABET) for _ in range(rng.randint(0, 80)))
+        expected = reference_splitter(chunk_size, chunk_overlap).split_text(text)
+        assert Chunker(chunk_size, chunk_overlap).split_text(text) == expected, (chunk_size, chunk_overlap, text)
+
+
+def test_token_mode_matches_langchain_length_function():
+    encoding = WordEncoding()
+    rng = random.Random(7)
+    for _ in range(1000):
+        chunk_size = rng.randint(1, 10)
+        chunk_overlap = rng.randint(0, chunk_size)
+        text = "".join(rng.choice(ALPHABET) for _ in range(rng.randint(0, 80)))
+        reference = reference_splitter(chunk_size, chunk_overlap, lambda s: len(encoding.encode(s)))
+        chunker = Chunker(chunk_size, chunk_overlap, unit="tokens")
+        chunker._encoding = encoding
+        assert chunker.split_text(text) == reference.split_text(text), (chunk_size, chunk_overlap, text)
+
+
+def test_offsets_slice_the_source_text():
+    text = make_document(3)
+    chunker = Chunker(300, 50)
+    offsets = chunker.split_offsets(text)
+    assert offsets
+    assert [text[start:end] for start, end in offsets] == chunker.split_text(text)
+    assert all(start < next_start for (start, _), (next_start, _) in zip(offsets, offsets[1:]))
+
+
+@pytest.mark.parametrize("kwargs", [
+    {"chunk_size": 0},
+    {"chunk_overlap": -1},
+    {"chunk_size": 100, "chunk_overlap": 101},
+    {"unit": "words"},
+])
+def test_invalid_options_raise(kwargs):
+    with pytest.raises(ValueError):
+        Chunker(**kwargs)
+
+
+def test_loader_uses_chunk_options(tmp_path):
+    path = tmp_path / "notes.txt"
+    path.write_text(make_document(5), encoding="utf-8")
+    small = DocumentLoader(chunk_size=200, chunk_overlap=0).load_document(path)
+    default = DocumentLoader().load_document(path)
+    assert len(small) > len(default)
+    assert all(len(chunk['content']) <= 200 for chunk in small)
+    text = DocumentLoader().read_txt(path)[0]['content']
+    for chunk in small:
+        meta = chunk['metadata']
+        assert text[meta['start']:meta['end']] == chunk['content']
@@ -0,0 +1,60 @@
+import pytest
+from localrag.core import client_pool as client_pool_module
+from localrag.core.client_pool import ClientPool, PooledExa, hash_key
+from localrag.core.document_processor import DocumentProcessor
+from tests.utils import StubServer
+
+
+@pytest.fixture
+async def pool():
+    pool = ClientPool(max_entries=2, idle_seconds=60)
+    yield pool
+    await pool.aclose()
+
+
+async def test_clients_are_reused_per_key(pool):
+    assert pool.openai("key-a") is pool.openai("key-a")
+    assert pool.async_openai("key-a") is pool.async_openai("key-a")
+    assert pool.openai("key-a") is not pool.openai("key-b")
+    assert pool.openai("key-a").api_key == "key-a"
+    # all keys share one transport
+    assert pool.openai("key-a")._client is pool.openai("key-b")._client is pool.http_client
+    assert "key-a" not in pool._entries
+    assert hash_key("key-a") in pool._entries
+
+
+async def test_embeddings_wrap_pooled_clients(pool):
+    embeddings = pool.embeddings("key-a", "text-embedding-3-small")
+    assert embeddings is pool.embeddings("key-a", "text-embedding-3-small")
+    assert embeddings.async_client is pool.async_openai("key-a").embeddings
+    assert isinstance(pool.exa("exa-key"), PooledExa)
+
+
+async def test_idle_and_excess_keys_are_evicted(pool, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(client_pool_module.time, "monotonic", lambda: now[0])
+    first = pool.openai("key-a")
+    pool.openai("key-b")
+    pool.openai("key-c")
+    assert len(pool._entries) == 2
+    assert hash_key("key-a") not in pool._entries
+
+    now[0] += 61
+    pool.openai("key-d")
+    assert list(pool._entries) == [hash_key("key-d")]
+    assert pool.openai("key-a") is not first
+
+
+async def test_processor_uses_pool_and_keeps_connections_alive():
+    with StubServer() as server:
+        pool = ClientPool(openai_base_url=f"{server.url}/v1")
+        try:
+            for key in ["key-a", "key-b", "key-a"]:
+                processor = DocumentProcessor(key, client_pool=pool)
+                assert await processor.aembed_texts(["hello", "world"]) == [[0.1] * 8, [0.1] * 8]
+                processor.client.chat.completions.create(model="stub", messages=[{"role": "user", "content": "hi"}])
+        finally:
+            await pool.aclose()
+        assert server.requests == 6
+        # one connection for the async transport, one for the sync one
+        assert server.connections == 2
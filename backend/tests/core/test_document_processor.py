@@ -1,6 +1,8 @@
 import pytest
 from pathlib import Path
-from localrag.core.document_processor import DocumentProcessor
+from localrag.core.document_processor import DocumentProcessor, DocumentLoader, load_document_chunks
+from concurrent.futures import ProcessPoolExecutor
+from tests.utils import make_pdf
 import os
 from dotenv import load_dotenv
 
@@ -27,4 +29,55 @@ async def test_process_and_embed(processor, tmp_path):
     
     assert len(chunks) > 0
     assert len(embeddings) == len(chunks)
-    assert all(isinstance(e, list) for e in embeddings)
\ No newline at end of file
+    assert all(isinstance(e, list) for e in embeddings)
+
+def test_load_document_chunks_in_process_pool(tmp_path):
+    test_file = tmp_path / "test.txt"
+    test_file.write_text("word " * 1000)
+
+    with ProcessPoolExecutor(max_workers=1) as pool:
+        chunks = pool.submit(load_document_chunks, str(test_file)).result()
+
+    assert chunks == DocumentLoader().load_document(test_file)
+
+
+@pytest.mark.asyncio
+async def test_chunk_batches_stream_whole_document(tmp_path):
+    pdf_file = tmp_path / "large.pdf"
+    pdf_file.write_bytes(make_pdf(25))
+    processor = DocumentProcessor("test-key")
+
+    batches = []
+    async for chunks, progress in processor.aiter_chunk_batches(pdf_file, page_batch_size=4, batch_size=10):
+        batches.append(chunks)
+        assert progress['total_pages'] == 25
+
+    assert max(len(batch) for batch in batches) == 10
+    assert progress['pages'] == 25
+    assert [chunk for batch in batches for chunk in batch] == processor.load_document(pdf_file)
+
+
+def test_read_pdf_parallel_matches_serial(tmp_path):
+    pdf_file = tmp_path / "large.pdf"
+    pdf_file.write_bytes(make_pdf(30))
+    loader = DocumentLoader()
+
+    with ProcessPoolExecutor(max_workers=2) as pool:
+        pages = loader.read_pdf_parallel(pdf_file, pool, pages_per_task=7)
+
+    assert pages == loader.read_pdf(pdf_file)
+    assert [page['page'] for page in pages] == list(range(1, 31))
+
+
+@pytest.mark.asyncio
+async def test_chunk_batches_prefetch_keeps_page_order(tmp_path):
+    pdf_file = tmp_path / "large.pdf"
+    pdf_file.write_bytes(make_pdf(20))
+    processor = DocumentProcessor("test-key")
+
+    with ProcessPoolExecutor(max_workers=2) as pool:
+        chunks = []
+        async for batch, _ in processor.aiter_chunk_batches(pdf_file, pool, page_batch_size=3, prefetch=3):
+            chunks.extend(batch)
+
+    assert chunks == processor.load_document(pdf_file)
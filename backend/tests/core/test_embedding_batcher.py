@@ -0,0 +1,103 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+from openai import RateLimitError
+from localrag.core.document_processor import DocumentProcessor
+from localrag.core.embedding_batcher import EmbeddingBatcher, RateLimiter, TokenCounter, pack_batches
+
+
+class WordCounter(TokenCounter):
+    def count(self, texts):
+        return [len(text.split()) for text in texts]
+
+
+class FakeEndpoint:
+    def __init__(self, fail_first=0, delay=0.0):
+        self.batches = []
+        self.fail_first = fail_first
+        self.delay = delay
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def __call__(self, texts):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            # later batches finish first so results come back out of order
+            await asyncio.sleep(self.delay / (len(self.batches) + 1))
+            self.batches.append(list(texts))
+            if self.fail_first:
+                self.fail_first -= 1
+                request = httpx.Request("POST", "https://api.openai.com/v1/embeddings")
+                response = httpx.Response(429, headers={"retry-after-ms": "10"}, request=request)
+                raise RateLimitError("Rate limit reached", response=response, body=None)
+            return [[float(len(text)), 0.0] for text in texts]
+        finally:
+            self.in_flight -= 1
+
+
+def test_pack_batches_respects_token_and_item_limits():
+    counts = [3, 4, 2, 8, 1, 1, 1, 1, 1]
+    batches = pack_batches(counts, max_tokens=8, max_items=3)
+    assert [i for batch in batches for i in batch] == list(range(len(counts)))
+    assert batches == [[0, 1], [2], [3], [4, 5, 6], [7, 8]]
+    for batch in batches:
+        assert len(batch) <= 3
+        assert sum(counts[i] for i in batch) <= 8 or len(batch) == 1
+
+
+def test_pack_batches_sends_oversized_text_alone():
+    assert pack_batches([2, 20, 2], max_tokens=10) == [[0], [1], [2]]
+
+
+def test_token_counter_falls_back_to_bytes():
+    counter = TokenCounter("no-such-encoding")
+    assert counter.count(["abc", "é"]) == [3, 2]
+
+
+async def test_batcher_packs_by_tokens_and_keeps_order():
+    endpoint = FakeEndpoint(delay=0.02)
+    batcher = EmbeddingBatcher(endpoint, WordCounter(), max_batch_tokens=6, max_batch_items=100, concurrency=2)
+    texts = [" ".join(["word"] * (i % 4 + 1)) + f" {i}" for i in range(20)]
+
+    embeddings = await batcher.embed(texts)
+
+    assert embeddings == [[float(len(text)), 0.0] for text in texts]
+    assert sorted(text for batch in endpoint.batches for text in batch) == sorted(texts)
+    assert all(sum(len(text.split()) for text in batch) <= 6 for batch in endpoint.batches)
+    assert len(endpoint.batches) < len(texts)
+    assert endpoint.max_in_flight <= 2
+
+
+async def test_batcher_retries_rate_limited_requests():
+    endpoint = FakeEndpoint(fail_first=2)
+    limiter = RateLimiter(requests_per_minute=6000, tokens_per_minute=100000)
+    batcher = EmbeddingBatcher(endpoint, WordCounter(), rate_limiter=limiter, max_retries=3)
+
+    assert await batcher.embed(["a b", "c"]) == [[3.0, 0.0], [1.0, 0.0]]
+    assert len(endpoint.batches) == 3
+
+
+async def test_batcher_gives_up_after_max_retries():
+    batcher = EmbeddingBatcher(FakeEndpoint(fail_first=5), WordCounter(), max_retries=1)
+    with pytest.raises(RateLimitError):
+        await batcher.embed(["a"])
+
+
+async def test_rate_limiter_spaces_requests_once_bucket_is_empty():
+    limiter = RateLimiter(requests_per_minute=600, tokens_per_minute=1000000)
+    limiter._requests = 0
+    started = time.monotonic()
+    await limiter.acquire(10)
+    await limiter.acquire(10)
+    # 600 rpm refills one request every 0.1s
+    assert time.monotonic() - started >= 0.18
+
+
+async def test_processor_embeds_through_batcher():
+    processor = DocumentProcessor("test-key")
+    endpoint = processor._embed_batch = FakeEndpoint()
+    assert await processor.aembed_texts(["one", "three"]) == [[3.0, 0.0], [5.0, 0.0]]
+    assert endpoint.batches == [["one", "three"]]
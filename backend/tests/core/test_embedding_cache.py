@@ -0,0 +1,167 @@
+import numpy as np
+import pytest
+from localrag.core.embedding_cache import (
+    DiskEmbeddingCache,
+    EmbeddingCache,
+    MemoryEmbeddingCache,
+    TieredEmbeddingCache,
+    make_key,
+)
+from localrag.core.document_processor import DocumentProcessor
+
+MODEL = "text-embedding-3-small"
+
+
+def test_key_normalizes_whitespace_and_case():
+    assert make_key(MODEL, "  What is  RAG?\n") == make_key(MODEL, "what is rag?")
+    assert make_key(MODEL, "what is rag?") != make_key("other-model", "what is rag?")
+
+
+def test_memory_cache_stores_float32_and_counts():
+    cache = MemoryEmbeddingCache(max_entries=10)
+    assert cache.get(MODEL, "q") is None
+    cache.set(MODEL, "q", [0.1, 0.2, 0.3])
+
+    vector = cache.get(MODEL, "Q ")
+    assert vector.dtype == np.float32
+    assert np.allclose(vector, [0.1, 0.2, 0.3])
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_memory_cache_lru_eviction():
+    cache = MemoryEmbeddingCache(max_entries=2)
+    cache.set(MODEL, "a", [1.0])
+    cache.set(MODEL, "b", [2.0])
+    cache.get(MODEL, "a")
+    cache.set(MODEL, "c", [3.0])
+
+    assert cache.get(MODEL, "b") is None
+    assert cache.get(MODEL, "a") is not None
+    assert len(cache) == 2
+
+
+def test_memory_cache_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("localrag.core.embedding_cache.time.time", lambda: now[0])
+    cache = MemoryEmbeddingCache(ttl_seconds=10)
+    cache.set(MODEL, "a", [1.0])
+    now[0] += 11
+
+    assert cache.get(MODEL, "a") is None
+
+
+def test_disk_cache_persists(tmp_path):
+    path = tmp_path / "embeddings.sqlite"
+    cache = DiskEmbeddingCache(path)
+    cache.set(MODEL, "a", [1.0, 2.0])
+    cache.close()
+
+    reopened = DiskEmbeddingCache(path)
+    assert np.array_equal(reopened.get(MODEL, "a"), np.array([1.0, 2.0], dtype=np.float32))
+
+
+def test_disk_cache_size_eviction(tmp_path):
+    cache = DiskEmbeddingCache(tmp_path / "embeddings.sqlite", max_entries=3)
+    for i in range(5):
+        cache.set(MODEL, str(i), [float(i)])
+    assert len(cache) == 3
+
+
+def test_disk_cache_evicts_least_recently_read(tmp_path):
+    cache = DiskEmbeddingCache(tmp_path / "embeddings.sqlite", max_entries=20)
+    for i in range(20):
+        cache.set(MODEL, str(i), [float(i)])
+    # a read is only buffered, the eviction flushes it first
+    changes = cache._conn.total_changes
+    assert cache.get(MODEL, "0") is not None
+    assert cache._conn.total_changes == changes
+
+    # evicts once past the slack, down to max_entries
+    cache.set(MODEL, "20", [20.0])
+    assert len(cache) == 21
+    cache.set(MODEL, "21", [21.0])
+    assert len(cache) == 20
+    assert cache.get(MODEL, "0") is not None
+    assert cache.get(MODEL, "1") is None and cache.get(MODEL, "2") is None
+
+
+def test_disk_cache_flushes_reads_on_close(tmp_path):
+    path = tmp_path / "embeddings.sqlite"
+    cache = DiskEmbeddingCache(path, max_entries=3)
+    for text in "abc":
+        cache.set(MODEL, text, [1.0])
+    cache.get(MODEL, "a")
+    cache.close()
+
+    reopened = DiskEmbeddingCache(path, max_entries=3)
+    reopened.set(MODEL, "d", [4.0])
+    reopened.set(MODEL, "e", [5.0])
+    assert len(reopened) == 3
+    assert reopened.get(MODEL, "a") is not None
+    assert reopened.get(MODEL, "b") is None and reopened.get(MODEL, "c") is None
+
+
+def test_tiered_cache_promotes_disk_hits(tmp_path):
+    disk = DiskEmbeddingCache(tmp_path / "embeddings.sqlite")
+    disk.set(MODEL, "a", [1.0])
+    cache = TieredEmbeddingCache(MemoryEmbeddingCache(), disk)
+
+    assert cache.get(MODEL, "a") is not None
+    assert len(cache.memory) == 1
+
+
+def test_cache_requires_get_set_and_len():
+    class PartialCache(EmbeddingCache):
+        def _get(self, key):
+            return None
+
+    with pytest.raises(TypeError):
+        PartialCache()
+
+
+class CountingEmbeddings:
+    def __init__(self):
+        self.calls = 0
+
+    async def aembed_query(self, text):
+        self.calls += 1
+        return [0.5, 0.25]
+
+
+@pytest.mark.asyncio
+async def test_get_embedding_uses_cache():
+    processor = DocumentProcessor("test-key", MemoryEmbeddingCache())
+    processor.embeddings = CountingEmbeddings()
+
+    first = await processor.get_embedding("hello world")
+    second = await processor.get_embedding("Hello   world")
+
+    assert first == second == [0.5, 0.25]
+    assert processor.embeddings.calls == 1
+
+
+class RecordingEmbedder:
+    def __init__(self):
+        self.batches = []
+
+    async def __call__(self, texts):
+        self.batches.append(list(texts))
+        return [[float(len(text)), 1.0] for text in texts]
+
+
+@pytest.mark.asyncio
+async def test_embed_chunks_reuses_known_chunks(tmp_path):
+    index = DiskEmbeddingCache(tmp_path / "chunks.sqlite", normalize=False)
+    processor = DocumentProcessor("test-key", chunk_index=index)
+    embedder = processor.aembed_texts = RecordingEmbedder()
+
+    first, stats = await processor.embed_chunks(["alpha", "beta", "alpha"])
+    assert stats == {"reused": 1, "embedded": 2}
+    assert embedder.batches == [["alpha", "beta"]]
+    assert first[0] == first[2]
+
+    second, stats = await processor.embed_chunks(["beta", "gamma", "Alpha"])
+    assert stats == {"reused": 1, "embedded": 2}
+    assert embedder.batches[-1] == ["gamma", "Alpha"]
+    assert second[0] == first[1]
@@ -0,0 +1,51 @@
+import pytest
+from localrag.core.index_profiles import INDEX_PROFILES, IndexConfig, resolve_index_config
+
+
+def test_default_profile_matches_legacy_index():
+    config = resolve_index_config()
+    assert (config.index_type, config.metric_type) == ("IVF_FLAT", "L2")
+    assert config.build_params == {"nlist": 1024}
+    assert config.milvus_search_params(5) == {"metric_type": "L2", "params": {"nprobe": 10}}
+
+
+@pytest.mark.parametrize("profile", list(INDEX_PROFILES))
+def test_profiles_only_send_their_own_search_params(profile):
+    config = resolve_index_config(profile)
+    params = config.milvus_search_params(5)["params"]
+    expected = {"IVF": {"nprobe"}, "HNS": {"ef"}, "DIS": {"search_list"}}.get(config.index_type[:3], set())
+    assert set(params) == expected
+
+
+def test_limit_bound_params_grow_with_limit():
+    config = resolve_index_config("low_latency")
+    assert config.milvus_search_params(10)["params"] == {"ef": 64}
+    assert config.milvus_search_params(200)["params"] == {"ef": 200}
+    assert resolve_index_config("disk").milvus_search_params(500)["params"] == {"search_list": 500}
+
+
+def test_overrides_replace_profile_fields():
+    config = resolve_index_config("low_latency", metric_type="cosine", build_params={"M": 32}, search_params={"ef": 128})
+    assert config.metric_type == "COSINE" and config.higher_is_better
+    assert config.build_params == {"M": 32, "efConstruction": 200}
+    assert config.search_params == {"ef": 128}
+    # another index type doesn't inherit the profile's build params
+    assert resolve_index_config("low_latency", index_type="IVF_FLAT").build_params == {}
+
+
+def test_invalid_configs_are_rejected():
+    with pytest.raises(ValueError):
+        resolve_index_config("fastest")
+    with pytest.raises(ValueError):
+        resolve_index_config(index_type="SCANN_X")
+    with pytest.raises(ValueError):
+        resolve_index_config(metric_type="HAMMING")
+
+
+def test_from_description_parses_flattened_params():
+    description = {
+        "index_type": "HNSW", "metric_type": "IP", "M": "16", "efConstruction": "200",
+        "field_name": "embedding", "index_name": "embedding", "total_rows": 0, "state": "Finished"
+    }
+    config = IndexConfig.from_description(description)
+    assert config == IndexConfig("HNSW", "IP", {"M": 16, "efConstruction": 200})
@@ -0,0 +1,206 @@
+import asyncio
+import itertools
+import pytest
+from localrag.core.document_processor import DocumentProcessor
+from localrag.core.ingest_jobs import IngestJobManager, JobStore, MemoryJobStore, QueueFullError
+from localrag.core.lexical_index import LexicalIndex
+from localrag.core.answer_cache import AnswerCache
+from localrag.models.ingest_job import IngestJob
+
+
+class RecordingEngine:
+    def __init__(self, fail_inserts=0, fail_after=0):
+        # rows by id, as (filename, text, metadata)
+        self.rows = {}
+        self.deleted = []
+        self.fail_inserts = fail_inserts
+        # inserts that go through before the failing ones
+        self.fail_after = fail_after
+        self._ids = itertools.count(1)
+
+    def add(self, filenames, texts, embeddings, metadata):
+        if self.fail_inserts and not self.fail_after:
+            self.fail_inserts -= 1
+            raise ConnectionError("milvus unavailable")
+        self.fail_after = max(self.fail_after - 1, 0)
+        ids = [next(self._ids) for _ in texts]
+        self.rows.update(zip(ids, zip(filenames, texts, metadata)))
+        return ids
+
+    def ids_by_filename(self, filename):
+        return [row_id for row_id, row in self.rows.items() if row[0] == filename]
+
+    def delete_by_ids(self, ids):
+        self.deleted.extend(ids)
+        for row_id in ids:
+            self.rows.pop(row_id, None)
+        return True
+
+
+async def _fake_embed_texts(self, texts):
+    return [[0.0, 1.0] for _ in texts]
+
+
+@pytest.fixture(autouse=True)
+def fake_embeddings(monkeypatch):
+    monkeypatch.setattr(DocumentProcessor, "aembed_texts", _fake_embed_texts)
+
+
+async def _wait(manager, job_id):
+    for _ in range(200):
+        job = await manager.get(job_id)
+        if job["status"] not in ("queued", "running"):
+            return job
+        await asyncio.sleep(0.01)
+    raise AssertionError("job did not finish")
+
+
+def _write_doc(manager, name="notes.txt", text="paragraph of text. "):
+    job = IngestJob(filename=name, file_type=".txt")
+    path = manager.staged_path(job)
+    path.parent.mkdir(parents=True)
+    path.write_text(text * 400)
+    return job
+
+
+async def test_job_runs_all_stages(tmp_path):
+    engine = RecordingEngine()
+    answer_cache = AnswerCache()
+    answer_cache.set([1.0], frozenset({"1"}), {"notes.txt"}, {"answer": "from the previous upload"})
+    manager = IngestJobManager(MemoryJobStore(), engine, tmp_path, embed_batch_size=3, answer_cache=answer_cache)
+    await manager.start()
+    job = await manager.submit(_write_doc(manager), "key")
+    result = await _wait(manager, job.id)
+    await manager.stop()
+
+    assert result["status"] == "succeeded"
+    assert result["chunks"] == len(engine.rows) > 0
+    assert result["chunks_embedded"] + result["chunks_reused"] == result["chunks"]
+    for name in ("load", "chunk", "embed", "insert"):
+        stage = result["stages"][name]
+        assert stage["status"] == "done"
+        assert stage["done"] == stage["total"]
+    assert engine.rows[2][2]["chunk_index"] == 1
+    assert len(answer_cache) == 0
+    # published for listing, nothing left staged
+    assert (tmp_path / "notes.txt").exists() and list(manager.staging_dir.iterdir()) == []
+
+
+async def test_failed_job_cleans_up_and_can_be_retried(tmp_path):
+    engine = RecordingEngine(fail_inserts=1)
+    lexical_index = LexicalIndex()
+    manager = IngestJobManager(MemoryJobStore(), engine, tmp_path, lexical_index=lexical_index)
+    await manager.start()
+    job = await manager.submit(_write_doc(manager), "key")
+    failed = await _wait(manager, job.id)
+
+    assert failed["status"] == "failed"
+    assert failed["stages"]["insert"]["status"] == "failed"
+    assert "milvus unavailable" in failed["error"]
+    assert engine.rows == {}
+    assert len(lexical_index) == 0
+    assert not (tmp_path / "notes.txt").exists()
+
+    await manager.retry(job.id, "key")
+    retried = await _wait(manager, job.id)
+    await manager.stop()
+
+    assert retried["status"] == "succeeded"
+    assert retried["attempts"] == 2
+    assert len(lexical_index) == len(engine.rows)
+    assert lexical_index.search("paragraph")[0]["filename"] == "notes.txt"
+
+
+async def test_restart_marks_unfinished_jobs_interrupted(tmp_path):
+    store = MemoryJobStore()
+    await store.create(IngestJob(filename="a.txt", file_type=".txt", status="running").model_dump())
+    manager = IngestJobManager(store, RecordingEngine(), tmp_path)
+    await manager.start()
+    jobs = await store.find(["interrupted"])
+    await manager.stop()
+
+    assert len(jobs) == 1
+
+
+async def test_submit_rejects_when_queue_full(tmp_path):
+    manager = IngestJobManager(MemoryJobStore(), RecordingEngine(), tmp_path, max_concurrent_jobs=0, queue_size=1)
+    await manager.start()
+    await manager.submit(_write_doc(manager), "key")
+
+    with pytest.raises(QueueFullError):
+        await manager.submit(_write_doc(manager, "other.txt"), "key")
+
+
+
+def test_job_store_requires_every_method():
+    class PartialStore(JobStore):
+        async def create(self, job):
+            pass
+
+    with pytest.raises(TypeError):
+        PartialStore()
+
+
+async def test_failed_reupload_keeps_the_earlier_upload(tmp_path):
+    engine = RecordingEngine()
+    lexical_index = LexicalIndex()
+    manager = IngestJobManager(MemoryJobStore(), engine, tmp_path, embed_batch_size=3, lexical_index=lexical_index)
+    await manager.start()
+    first = await manager.submit(_write_doc(manager, text="first version. "), "key")
+    await _wait(manager, first.id)
+    earlier = dict(engine.rows)
+
+    # the second upload gets two batches in before an insert fails
+    engine.fail_inserts, engine.fail_after = 1, 2
+    failed = await manager.submit(_write_doc(manager, text="second version. "), "key")
+    assert (await _wait(manager, failed.id))["status"] == "failed"
+    assert engine.rows == earlier
+    assert len(lexical_index) == len(earlier)
+    assert (tmp_path / "notes.txt").read_text().startswith("first version")
+
+    await manager.retry(failed.id, "key")
+    assert (await _wait(manager, failed.id))["status"] == "succeeded"
+    await manager.stop()
+
+    assert not set(engine.rows) & set(earlier)
+    assert all("second" in text and "first" not in text for _, text, _ in engine.rows.values())
+    assert len(lexical_index) == len(engine.rows)
+    assert lexical_index.search("first") == []
+    assert (tmp_path / "notes.txt").read_text().startswith("second version")
+
+
+async def test_concurrent_uploads_of_one_file_replace_each_other(tmp_path):
+    engine = RecordingEngine()
+    lexical_index = LexicalIndex()
+    manager = IngestJobManager(
+        MemoryJobStore(), engine, tmp_path, embed_batch_size=3, lexical_index=lexical_index, max_concurrent_jobs=2
+    )
+    await manager.start()
+    first = await manager.submit(_write_doc(manager, text="first version. "), "key")
+    second = await manager.submit(_write_doc(manager, text="second version. "), "key")
+    for job in (first, second):
+        assert (await _wait(manager, job.id))["status"] == "succeeded"
+    await manager.stop()
+
+    assert all("second" in text for _, text, _ in engine.rows.values())
+    assert len(lexical_index) == len(engine.rows) == (await manager.get(second.id))["chunks"]
+    assert manager._file_locks == {}
+
+
+async def test_concurrent_submits_do_not_overflow_the_queue(tmp_path, monkeypatch):
+    store = MemoryJobStore()
+    create = store.create
+
+    async def slow_create(job):
+        await asyncio.sleep(0.01)
+        await create(job)
+
+    monkeypatch.setattr(store, "create", slow_create)
+    manager = IngestJobManager(store, RecordingEngine(), tmp_path, max_concurrent_jobs=0, queue_size=2)
+    await manager.start()
+    results = await asyncio.gather(
+        *(manager.submit(_write_doc(manager, f"{i}.txt"), "key") for i in range(4)), return_exceptions=True
+    )
+
+    assert sum(isinstance(result, QueueFullError) for result in results) == 2
+    assert manager._queue.qsize() == 2
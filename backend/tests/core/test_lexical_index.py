@@ -0,0 +1,87 @@
+import pytest
+
+from localrag.core.lexical_index import LexicalIndex, reciprocal_rank_fusion, tokenize
+
+
+def _index(**kwargs):
+    index = LexicalIndex(**kwargs)
+    index.add(
+        ["errors.md", "errors.md", "guide.md", "notes.md"],
+        [
+            "The client fails with ERR_CONN_RESET when the proxy drops the connection",
+            "ERR_TIMEOUT is raised after 30 seconds",
+            "Install version v2.3.1 and restart the service",
+            "The service restarts on its own after a crash, the service is supervised",
+        ],
+        [1, 2, 3, 4]
+    )
+    return index
+
+
+def test_tokenize_keeps_identifiers_whole_and_split():
+    assert tokenize("Got ERR_CONN_RESET from v2.3.1, see app/main.py.") == [
+        "got", "err_conn_reset", "from", "v2.3.1", "see", "app/main.py",
+        "err", "conn", "reset", "v2", "3", "1", "app", "main", "py"
+    ]
+
+
+def test_exact_identifier_ranks_first():
+    hits = _index().search("what does ERR_CONN_RESET mean", limit=2)
+    assert hits[0]["filename"] == "errors.md" and hits[0]["id"] == 1
+    # only ids come back, the text is fetched from the vector store
+    assert "content" not in hits[0]
+    assert all(hit["score"] > 0 for hit in hits)
+
+
+def test_term_frequency_and_filters():
+    index = _index()
+    assert [hit["filename"] for hit in index.search("service")] == ["notes.md", "guide.md"]
+    assert [hit["filename"] for hit in index.search("service", filenames=["guide.md"])] == ["guide.md"]
+    assert index.search("nothing matches this") == []
+
+    per_file = index.search_files("service restart", ["guide.md", "errors.md", "missing.md"], limit=1)
+    assert [hit["filename"] for hit in per_file["guide.md"]] == ["guide.md"]
+    assert per_file["errors.md"] == [] and per_file["missing.md"] == []
+
+
+def test_remove_filename_and_compaction():
+    index = _index()
+    assert index.remove_filename("errors.md") == 2
+    assert index.search("ERR_CONN_RESET") == []
+    assert len(index) == 2
+    # half of the chunks were deleted, so the postings were rewritten without them
+    assert index.stats()["postings"] == sum(len(set(tokenize(text))) for text in [
+        "Install version v2.3.1 and restart the service",
+        "The service restarts on its own after a crash, the service is supervised",
+    ])
+    assert [hit["filename"] for hit in index.search("service")] == ["notes.md", "guide.md"]
+
+    index.add(["errors.md"], ["ERR_CONN_RESET again"], [5])
+    assert [hit["id"] for hit in index.search("ERR_CONN_RESET")] == [5]
+    assert index.remove_filename("never-added.md") == 0
+
+
+def test_remove_ids_keeps_the_rest_of_the_file():
+    index = LexicalIndex()
+    index.add(["a.md"] * 3, ["old alpha", "old beta", "new alpha"], [1, 2, 3])
+    assert index.remove_ids("a.md", [1, 2, 99]) == 2
+    assert [hit["id"] for hit in index.search("alpha")] == [3]
+    assert index.search("old") == []
+    assert index.remove_ids("b.md", [3]) == 0
+    assert index.remove_filename("a.md") == 1 and len(index) == 0
+
+
+def test_load_marks_ready():
+    index = LexicalIndex()
+    assert not index.ready
+    index.load([[{"filename": "a.md", "content": "alpha"}], [{"filename": "b.md", "content": "beta"}]])
+    assert index.ready
+    assert index.stats() == {"ready": True, "chunks": 2, "terms": 2, "postings": 2}
+
+
+def test_reciprocal_rank_fusion():
+    vector = [{"filename": "a", "content": "x", "score": 0.1}, {"filename": "b", "content": "y", "score": 0.2}]
+    lexical = [{"filename": "b", "content": "y", "score": 7.0}, {"filename": "c", "content": "z", "score": 3.0}]
+    fused = reciprocal_rank_fusion([vector, lexical], limit=2, k=60)
+    assert [hit["content"] for hit in fused] == ["y", "x"]
+    assert fused[0]["score"] == pytest.approx(1 / 62 + 1 / 61)
@@ -0,0 +1,224 @@
+import random
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from localrag.config import Settings
+from localrag.core.index_profiles import resolve_index_config
+from localrag.core.local_vectors import LocalVectorClient
+from localrag.core.vector_client import VectorClient
+from localrag.core.vector_store import BulkInsertError, UragEngine, build_vector_client
+from tests.utils import FakeMilvusClient
+
+
+def _fill(engine, files=("a.pdf", "b.pdf", "c.pdf"), rows=30, dim=1536, seed=0):
+    rng = random.Random(seed)
+    for filename in files:
+        engine.add(
+            [filename] * rows,
+            [f"{filename}-{i}" for i in range(rows)],
+            [[rng.gauss(0, 1) for _ in range(dim)] for _ in range(rows)],
+            [{"page": i} for i in range(rows)]
+        )
+    return [[rng.gauss(0, 1) for _ in range(dim)] for _ in range(8)]
+
+
+def _contents(results):
+    return [[hit["content"] for hit in hits] for hits in results]
+
+
+@pytest.mark.parametrize("metric", ["L2", "IP", "COSINE"])
+def test_search_matches_brute_force(metric):
+    config = resolve_index_config("exact", metric_type=metric)
+    local = UragEngine(LocalVectorClient(segment_rows=16), "docs", index_config=config)
+    reference = UragEngine(FakeMilvusClient(), "docs", index_config=config)
+    queries = _fill(local)
+    _fill(reference)
+
+    for metadata_filter in ["", 'filename == "b.pdf"', 'filename in ["a.pdf", "c.pdf"]']:
+        expected = reference.batch_similarity_search(queries, limit=7, metadata_filter=metadata_filter)
+        results = local.batch_similarity_search(queries, limit=7, metadata_filter=metadata_filter)
+        assert _contents(results) == _contents(expected)
+        for hits, expected_hits in zip(results, expected):
+            assert [hit["score"] for hit in hits] == pytest.approx([hit["score"] for hit in expected_hits], rel=1e-4)
+    per_file = local.search_files(queries, ["a.pdf", "c.pdf"], limit=3)
+    expected_per_file = reference.search_files(queries, ["a.pdf", "c.pdf"], limit=3)
+    assert [{name: [hit["content"] for hit in hits] for name, hits in result.items()} for result in per_file] == [
+        {name: [hit["content"] for hit in hits] for name, hits in result.items()} for result in expected_per_file
+    ]
+
+
+def test_segments_survive_reopen(tmp_path):
+    client = LocalVectorClient(str(tmp_path), segment_rows=40)
+    engine = UragEngine(client, "docs")
+    queries = _fill(engine)
+    engine.delete_by_filename("b.pdf")
+    before = engine.batch_similarity_search(queries, limit=5)
+    # a.pdf and b.pdf were sealed together once past 40 rows, c.pdf is only in the write-ahead log
+    assert len(client._get("docs").segments) == 1
+    assert len(client._get("docs").growing) == 30
+
+    reopened = LocalVectorClient(str(tmp_path), segment_rows=40)
+    collection = reopened._get("docs")
+    assert all(isinstance(segment.vectors, np.memmap) for segment in collection.segments)
+    engine = UragEngine(reopened, "docs")
+    assert engine.batch_similarity_search(queries, limit=5) == before
+    assert all(hit["filename"] != "b.pdf" for hits in before for hit in hits)
+    assert engine.add(["d.pdf"], ["d"], [[0.0] * 1536], [{}])[0] == 91
+
+
+def test_mostly_deleted_segment_is_compacted(tmp_path):
+    client = LocalVectorClient(str(tmp_path), segment_rows=30)
+    engine = UragEngine(client, "docs")
+    queries = _fill(engine, files=("a.pdf", "b.pdf"), rows=30)
+    collection = client._get("docs")
+    assert len(collection.segments) == 2
+
+    engine.delete_by_id(5)
+    assert collection.deleted == {5}
+    engine.delete_by_filename("a.pdf")
+
+    assert [len(segment.ids) for segment in collection.segments] == [0, 30]
+    assert collection.deleted == set()
+    hits = engine.batch_similarity_search(queries, limit=40)
+    assert all(len(result) == 30 and {hit["filename"] for hit in result} == {"b.pdf"} for result in hits)
+    assert len(list(tmp_path.glob("docs/seg_*.rows.json"))) == 2
+
+
+def test_get_chunks_by_id(tmp_path):
+    local = UragEngine(LocalVectorClient(str(tmp_path), segment_rows=16), "docs")
+    reference = UragEngine(FakeMilvusClient(), "docs")
+    _fill(local, rows=10)
+    _fill(reference, rows=10)
+    local.delete_by_filename("b.pdf")
+    reference.delete_by_filename("b.pdf")
+
+    # sealed, growing, deleted and unknown ids
+    ids = [3, 12, 25, 3, 999]
+    assert local.get_chunks(ids) == reference.get_chunks(ids) == {
+        3: {"filename": "a.pdf", "content": "a.pdf-2"},
+        25: {"filename": "c.pdf", "content": "c.pdf-4"},
+    }
+    assert local.get_chunks([]) == {}
+
+
+def test_ids_by_filename_and_delete_by_ids(tmp_path):
+    local = UragEngine(LocalVectorClient(str(tmp_path), segment_rows=16), "docs")
+    reference = UragEngine(FakeMilvusClient(), "docs")
+    _fill(local, rows=10)
+    _fill(reference, rows=10)
+
+    for engine in (local, reference):
+        ids = engine.ids_by_filename("b.pdf")
+        assert sorted(ids) == list(range(11, 21))
+        assert engine.delete_by_ids(ids[:4])
+        assert sorted(engine.ids_by_filename("b.pdf")) == sorted(ids[4:])
+        assert engine.ids_by_filename("missing.pdf") == []
+    assert local.get_chunks(range(1, 31)) == reference.get_chunks(range(1, 31))
+
+
+def test_reindex_on_local_backend(tmp_path):
+    client = LocalVectorClient(str(tmp_path), segment_rows=16)
+    engine = UragEngine(client, "docs")
+    queries = _fill(engine)
+    before = _contents(engine.batch_similarity_search(queries, limit=5))
+
+    engine.reindex(resolve_index_config("low_latency", metric_type="L2"), batch_size=7, drain_seconds=0)
+
+    assert client.list_collections() == ["docs__g1"]
+    assert _contents(engine.batch_similarity_search(queries, limit=5)) == before
+    assert UragEngine(LocalVectorClient(str(tmp_path)), "docs").index_config.index_type == "HNSW"
+
+
+def test_collection_created_with_engine_dim():
+    engine = UragEngine(LocalVectorClient(), "docs", dim=8)
+    queries = _fill(engine, dim=8)
+    assert len(engine.batch_similarity_search(queries, limit=3)[0]) == 3
+    with pytest.raises(BulkInsertError):
+        engine.add(["d.pdf"], ["d"], [[0.0] * 1536], [{}])
+
+
+def test_rejects_filters_it_cannot_evaluate():
+    engine = UragEngine(LocalVectorClient(), "docs")
+    queries = _fill(engine)
+    with pytest.raises(ValueError):
+        engine.batch_similarity_search(queries, metadata_filter='content like "a%"')
+
+
+def test_backend_selected_by_settings(tmp_path):
+    assert isinstance(
+        build_vector_client(Settings(vector_backend="local", local_vector_path=str(tmp_path)), "unused"),
+        LocalVectorClient
+    )
+    with pytest.raises(ValueError):
+        build_vector_client(Settings(vector_backend="faiss"), "unused")
+
+
+def test_crash_before_manifest_keeps_old_segments(tmp_path, monkeypatch):
+    client = LocalVectorClient(str(tmp_path), segment_rows=30)
+    engine = UragEngine(client, "docs")
+    queries = _fill(engine, files=("a.pdf", "b.pdf"), rows=30)
+    before = engine.batch_similarity_search(queries, limit=40)
+
+    def crash(self):
+        raise OSError("disk full")
+
+    # the compacted segment is written, the manifest pointing at it never is
+    monkeypatch.setattr(type(client._get("docs")), "_save_manifest", crash)
+    with pytest.raises(OSError):
+        engine.delete_by_filename("a.pdf")
+    monkeypatch.undo()
+
+    reopened = UragEngine(LocalVectorClient(str(tmp_path), segment_rows=30), "docs")
+    assert reopened.batch_similarity_search(queries, limit=40) == before
+    assert len(list(tmp_path.glob("docs/seg_*.rows.json"))) == 2
+
+
+def test_crash_before_log_removal_keeps_growing_deletes(tmp_path, monkeypatch):
+    client = LocalVectorClient(str(tmp_path), segment_rows=30)
+    engine = UragEngine(client, "docs")
+    _fill(engine, files=("a.pdf",), rows=20)
+    engine.delete_by_id(5)
+    unlink = Path.unlink
+
+    def crash_on_log(path, *args, **kwargs):
+        if path.name.startswith("wal_"):
+            raise OSError("crashed")
+        return unlink(path, *args, **kwargs)
+
+    # the seal commits its manifest, the old log is never removed
+    monkeypatch.setattr(Path, "unlink", crash_on_log)
+    with pytest.raises(OSError):
+        client._get("docs").seal()
+    monkeypatch.undo()
+
+    reopened = LocalVectorClient(str(tmp_path), segment_rows=30)
+    collection = reopened._get("docs")
+    assert collection.growing == [] and collection.deleted == set()
+    assert [len(segment.ids) for segment in collection.segments] == [19]
+    assert UragEngine(reopened, "docs").get_chunks([5]) == {}
+    # the stale log is cleaned up, the new one is only created by the next insert
+    assert list(tmp_path.glob("docs/wal_*.bin")) == []
+
+
+def test_torn_log_tail_is_dropped(tmp_path):
+    engine = UragEngine(LocalVectorClient(str(tmp_path)), "docs")
+    _fill(engine, files=("a.pdf",), rows=5)
+    wal = tmp_path / "docs" / "wal_000000.bin"
+    wal.write_bytes(wal.read_bytes()[:-10])
+
+    reopened = LocalVectorClient(str(tmp_path))
+    assert [row_id for row_id, _, _ in reopened._get("docs").growing] == [1, 2, 3, 4]
+    engine = UragEngine(reopened, "docs")
+    assert engine.add(["b.pdf"], ["b"], [[0.0] * 1536], [{}])[0] == 5
+    assert len(UragEngine(LocalVectorClient(str(tmp_path)), "docs").get_chunks([5])) == 1
+
+
+def test_vector_client_requires_every_method():
+    class PartialClient(VectorClient):
+        def list_collections(self, **kwargs):
+            return []
+
+    with pytest.raises(TypeError):
+        PartialClient()
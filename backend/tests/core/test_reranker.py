@@ -0,0 +1,68 @@
+import time
+
+from localrag.core.reranker import Reranker
+
+
+class WordCounter:
+    def count(self, texts):
+        return [len(text.split()) for text in texts]
+
+
+def _hit(content, embedding=None, filename="doc.pdf"):
+    hit = {"content": content, "filename": filename, "score": 0.0}
+    if embedding is not None:
+        hit["embedding"] = embedding
+    return hit
+
+
+def test_drops_duplicates_and_strips_vectors():
+    candidates = [
+        _hit("alpha one", [1.0, 0.0, 0.0]),
+        _hit("alpha one", [1.0, 0.0, 0.0]),
+        _hit("alpha again", [0.99, 0.01, 0.0]),
+        _hit("beta", [0.6, 0.8, 0.0]),
+    ]
+    reranked = Reranker(limit=5, token_counter=WordCounter()).rerank([1.0, 0.0, 0.0], candidates)
+
+    assert [hit["content"] for hit in reranked] == ["alpha one", "beta"]
+    assert all("embedding" not in hit for hit in reranked)
+
+
+def test_mmr_prefers_diverse_chunks():
+    candidates = [
+        _hit("a", [1.0, 0.0, 0.0]),
+        _hit("b", [0.95, 0.31, 0.0]),
+        _hit("c", [0.8, 0.0, 0.6]),
+    ]
+    reranker = Reranker(limit=2, dedup_similarity=0.99, mmr_lambda=0.3, token_counter=WordCounter())
+    assert [hit["content"] for hit in reranker.rerank([1.0, 0.0, 0.0], candidates)] == ["a", "c"]
+
+    relevance_only = Reranker(limit=2, dedup_similarity=0.99, mmr_lambda=1.0, token_counter=WordCounter())
+    assert [hit["content"] for hit in relevance_only.rerank([1.0, 0.0, 0.0], candidates)] == ["a", "b"]
+
+
+def test_token_budget_skips_chunks_that_do_not_fit():
+    candidates = [
+        _hit("one two three", [1.0, 0.0]),
+        _hit("four five six seven", [0.0, 1.0]),
+        _hit("eight", [0.7, 0.7]),
+    ]
+    reranker = Reranker(limit=5, token_budget=5, dedup_similarity=1.01, mmr_lambda=1.0, token_counter=WordCounter())
+    assert [hit["content"] for hit in reranker.rerank([1.0, 0.2], candidates)] == ["one two three", "eight"]
+
+
+def test_hits_without_vectors_keep_their_rank():
+    # lexical-only hits of a hybrid search have no vector, the incoming order decides then
+    candidates = [_hit("lexical match"), _hit("vector match", [1.0, 0.0]), _hit("vector twin", [1.0, 0.0])]
+    reranked = Reranker(limit=5, mmr_lambda=1.0, token_counter=WordCounter()).rerank([0.0, 1.0], candidates)
+    assert [hit["content"] for hit in reranked] == ["lexical match", "vector match"]
+
+
+def test_latency_budget_falls_back_to_relevance_order():
+    candidates = [_hit(f"chunk {i}", [1.0, i / 100]) for i in range(50)]
+    started = time.perf_counter()
+    reranked = Reranker(limit=50, budget_ms=0, dedup_similarity=1.01, token_counter=WordCounter()).rerank(
+        [1.0, 0.0], candidates
+    )
+    assert time.perf_counter() - started < 1
+    assert [hit["content"] for hit in reranked] == [f"chunk {i}" for i in range(50)]
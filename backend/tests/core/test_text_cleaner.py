@@ -0,0 +1,32 @@
+import json
+import random
+import re
+from pathlib import Path
+
+import pytest
+from localrag.core.document_processor import clean_pdf_text
+
+GOLDEN = json.loads((Path(__file__).parent / "data" / "pdf_text_golden.json").read_text(encoding="utf-8"))
+
+
+def legacy_clean_pdf_text(text):
+    # The original multi-pass cleaner, kept as the reference implementation
+    text = re.sub(r'\n\s*\n', '\n', text)
+    text = re.sub(r'(?<!\n)\n(?!\n)(?!\s*[-•\d])(?!\s*[A-Z][a-z])', ' ', text)
+    text = re.sub(r'(\w)-\n(\w)', r'\1\2', text)
+    text = ' '.join(text.split())
+    text = text.replace('. ', '.\n')
+    return text
+
+
+@pytest.mark.parametrize("case", GOLDEN, ids=range(len(GOLDEN)))
+def test_clean_pdf_text_golden(case):
+    assert clean_pdf_text(case["input"]) == case["expected"]
+
+
+def test_clean_pdf_text_matches_legacy_on_random_text():
+    rng = random.Random(1234)
+    alphabet = ["a", "Z", "Ab", "x", "7", "-", "•", ".", ". ", "\n", "\n\n", " ", "\t", "\r", "\x0b", "é", "_", "Word"]
+    for _ in range(5000):
+        text = "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 40)))
+        assert clean_pdf_text(text) == legacy_clean_pdf_text(text), repr(text)
@@ -1,7 +1,10 @@
 import pytest
 from fastapi import FastAPI
-from localrag.core.vector_store import bind_milvus, get_milvus, UragEngine
+from localrag.core.index_profiles import resolve_index_config
+from localrag.core.vector_store import bind_milvus, get_milvus, UragEngine, BulkInsertError, ReindexError
+from tests.utils import FakeMilvusClient, _FakeIterator
 from pymilvus import MilvusClient
+from pymilvus.exceptions import MilvusException
 
 @pytest.fixture
 def app():
@@ -52,4 +55,263 @@ def test_vector_store_operations(app, milvus_uri):
         pytest.skip(f"Milvus integration test skipped: {str(e)}")
 
     # run: poetry run pytest -v -m "not integration" to disable integration tests
-    # run: poetry run pytest -v to include integration tests
\ No newline at end of file
+    # run: poetry run pytest -v to include integration tests
+
+def _columns(n, text_size=10):
+    filenames = ["doc.txt"] * n
+    texts = [f"{i:0{text_size}d}" for i in range(n)]
+    embeddings = [[float(i)] * 4 for i in range(n)]
+    metadata = [{"chunk_index": i} for i in range(n)]
+    return filenames, texts, embeddings, metadata
+
+
+def test_bulk_add_batches_by_count(fake_client):
+    engine = UragEngine(fake_client, "docs", insert_batch_size=10)
+    ids = engine.add(*_columns(25))
+
+    assert fake_client.insert_sizes.count(10) == 2
+    assert sorted(fake_client.insert_sizes) == [5, 10, 10]
+    assert [fake_client.rows[i]["content"] for i in ids] == _columns(25)[1]
+
+
+def test_iter_rows_pages_through_collection(fake_client):
+    engine = UragEngine(fake_client, "docs")
+    engine.add(*_columns(25))
+
+    batches = list(engine.iter_rows(["filename", "content"], batch_size=10))
+    assert [len(rows) for rows in batches] == [10, 10, 5]
+    assert sorted(row["content"] for rows in batches for row in rows) == _columns(25)[1]
+
+
+def test_bulk_add_respects_byte_budget(fake_client):
+    engine = UragEngine(fake_client, "docs", insert_batch_size=100)
+    # every row is 16 bytes of vector + 100 bytes of content + small scalars
+    ids = engine.bulk_add(*_columns(10, text_size=100), max_batch_bytes=400)
+
+    assert len(ids) == 10
+    assert max(fake_client.insert_sizes) <= 3
+
+
+def test_bulk_add_retries_only_failed_batch(make_fake_client):
+    filenames, texts, embeddings, metadata = _columns(20)
+    client = make_fake_client(fail_batches={texts[10]: 2})
+    engine = UragEngine(client, "docs", insert_batch_size=5, insert_max_retries=3)
+    ids = engine.bulk_add(filenames, texts, embeddings, metadata)
+
+    assert client.calls.count("insert") == 4 + 2
+    assert len(client.rows) == 20
+    assert [client.rows[i]["content"] for i in ids] == texts
+
+
+def test_bulk_add_reports_partial_failure(make_fake_client):
+    filenames, texts, embeddings, metadata = _columns(10)
+    client = make_fake_client(fail_batches={texts[5]: 10})
+    engine = UragEngine(client, "docs", insert_batch_size=5, insert_max_retries=1)
+
+    with pytest.raises(BulkInsertError) as exc_info:
+        engine.bulk_add(filenames, texts, embeddings, metadata)
+
+    assert exc_info.value.failed_batches == [(5, 10)]
+    assert all(i is not None for i in exc_info.value.ids[:5])
+    assert exc_info.value.ids[5:] == [None] * 5
+
+
+@pytest.mark.parametrize("error, attempts", [
+    (MilvusException(code=2, message="Fail connecting to server"), 3),
+    (MilvusException(code=8, message="rate limit exceeded"), 3),
+    (MilvusException(code=1, message="rpc deadline exceeded"), 1),
+    (TimeoutError("timed out"), 1),
+    (ValueError("dim mismatch"), 1),
+])
+def test_bulk_add_retries_only_transient_errors(fake_client, monkeypatch, error, attempts):
+    engine = UragEngine(fake_client, "docs", insert_max_retries=2)
+    calls = []
+
+    def insert(collection_name, data, **kwargs):
+        calls.append(len(data))
+        raise error
+
+    monkeypatch.setattr(fake_client, "insert", insert)
+    monkeypatch.setattr("localrag.core.vector_store.time.sleep", lambda seconds: None)
+    with pytest.raises(BulkInsertError):
+        engine.bulk_add(*_columns(3))
+    assert len(calls) == attempts
+
+
+def _search_fixture(client, files, rows_per_file, seed=0):
+    import random
+    rng = random.Random(seed)
+    engine = UragEngine(client, "docs", search_batch_size=4)
+    for filename in files:
+        n = rows_per_file[filename] if isinstance(rows_per_file, dict) else rows_per_file
+        engine.add(
+            [filename] * n,
+            [f"{filename}-{i}" for i in range(n)],
+            [[rng.random() for _ in range(4)] for _ in range(n)],
+            [{}] * n
+        )
+    queries = [[rng.random() for _ in range(4)] for _ in range(10)]
+    return engine, queries
+
+
+def test_batch_similarity_search_matches_single_searches(fake_client):
+    engine, queries = _search_fixture(fake_client, ["a.pdf", "b.pdf"], 20)
+    single = [engine.similarity_search(query, limit=3) for query in queries]
+    fake_client.calls.clear()
+
+    batched = engine.batch_similarity_search(queries, limit=3)
+
+    assert batched == single
+    assert fake_client.calls.count("search") == 3
+    assert fake_client.search_sizes[-3:] == [4, 4, 2]
+
+
+def test_search_files_matches_per_file_searches(fake_client):
+    # c.pdf sits far away from every query so it never makes the shared top-k
+    files = ["a.pdf", "b.pdf", "c.pdf"]
+    engine, queries = _search_fixture(fake_client, files, 20)
+    for row in fake_client.rows.values():
+        if row["filename"] == "c.pdf":
+            row["embedding"] = [value + 5 for value in row["embedding"]]
+    expected = [
+        {filename: engine.similarity_search(query, limit=3, metadata_filter=f'filename == "{filename}"') for filename in files}
+        for query in queries
+    ]
+    fake_client.calls.clear()
+
+    results = engine.search_files(queries, files + ["a.pdf"], limit=3)
+
+    assert results == expected
+    # one shared request per query batch plus top-ups for crowded out files, instead of 30 searches
+    assert fake_client.calls.count("search") <= 3 + 3 * len(files)
+
+
+def test_search_files_single_request_when_files_are_balanced(fake_client):
+    engine, queries = _search_fixture(fake_client, ["a.pdf", "b.pdf"], 2)
+    fake_client.calls.clear()
+    results = engine.search_files(queries[:4], ["a.pdf", "b.pdf", "missing.pdf"], limit=5)
+    assert fake_client.calls.count("search") == 1
+    assert all(len(result["a.pdf"]) == 2 and result["missing.pdf"] == [] for result in results)
+
+
+def test_similarity_search_skips_load_state_check(fake_client):
+    engine, queries = _search_fixture(fake_client, ["a.pdf"], 5)
+    fake_client.calls.clear()
+    for query in queries:
+        engine.similarity_search(query, limit=2)
+    assert fake_client.calls == ["search"] * len(queries)
+
+
+def test_similarity_search_reloads_released_collection(fake_client):
+    engine, queries = _search_fixture(fake_client, ["a.pdf"], 5)
+    expected = engine.similarity_search(queries[0], limit=2)
+    fake_client.release_collection("docs")
+    fake_client.calls.clear()
+
+    assert engine.similarity_search(queries[0], limit=2) == expected
+    assert fake_client.calls == ["search", "load_collection", "search"]
+    fake_client.calls.clear()
+    engine.similarity_search(queries[0], limit=2)
+    assert fake_client.calls == ["search"]
+
+
+def test_watchdog_marks_released_collection(fake_client):
+    import time
+    engine, queries = _search_fixture(fake_client, ["a.pdf"], 5)
+    engine.start_watchdog(0.01)
+    try:
+        fake_client.release_collection("docs")
+        deadline = time.monotonic() + 2
+        while engine._loaded and time.monotonic() < deadline:
+            time.sleep(0.01)
+    finally:
+        engine.stop_watchdog()
+    assert not engine._loaded
+    fake_client.calls.clear()
+
+    engine.similarity_search(queries[0], limit=2)
+    # reloaded up front, the search itself never hits the not-loaded error
+    assert fake_client.calls == ["load_collection", "search"]
+
+
+def test_collection_created_with_configured_index(fake_client):
+    engine = UragEngine(fake_client, "docs", index_config=resolve_index_config("low_latency", metric_type="IP"))
+    assert fake_client.indexes["docs"]["index_type"] == "HNSW"
+    engine.add(["a.pdf"] * 3, ["near", "mid", "far"], [[3.0, 0.0], [2.0, 0.0], [1.0, 0.0]], [{}] * 3)
+
+    hits = engine.similarity_search([1.0, 0.0], limit=3)
+
+    # inner product: higher scores first
+    assert [hit["content"] for hit in hits] == ["near", "mid", "far"]
+    assert fake_client.search_params[-1] == {"metric_type": "IP", "params": {"ef": 64}}
+
+
+def test_existing_collection_keeps_its_index(fake_client):
+    UragEngine(fake_client, "docs")
+    engine = UragEngine(fake_client, "docs", index_config=resolve_index_config("exact"))
+    assert engine.index_config.index_type == "IVF_FLAT"
+    assert engine.index_config.build_params == {"nlist": 1024}
+
+
+def test_reindex_swaps_in_new_index(fake_client):
+    engine, queries = _search_fixture(fake_client, ["a.pdf", "b.pdf"], 10)
+    ids = set(fake_client.rows)
+    before = [engine.similarity_search(query, limit=3) for query in queries]
+
+    status = engine.reindex(resolve_index_config("exact"), batch_size=4, drain_seconds=0)
+
+    assert status["state"] == "succeeded" and status["copied"] == 20
+    assert fake_client.collections == ["docs__g1"]
+    assert engine.collection == "docs__g1" and engine.index_config.index_type == "FLAT"
+    # ids survive so references to chunks stay valid
+    assert set(fake_client.rows) == ids
+    assert [engine.similarity_search(query, limit=3) for query in queries] == before
+
+    new_ids = engine.add(["c.pdf"], ["new"], [[0.5] * 4], [{}])
+    assert new_ids[0] > max(ids) and new_ids[0] in fake_client.rows
+    assert UragEngine(fake_client, "docs").collection == "docs__g1"
+
+
+def test_reindex_keeps_writes_made_while_copying(fake_client):
+    engine, _ = _search_fixture(fake_client, ["a.pdf", "b.pdf"], 5)
+    original_iterator = fake_client.query_iterator
+
+    def iterator_with_writes(collection_name, **kwargs):
+        iterator = original_iterator(collection_name, **kwargs)
+        # rows written after the copy started show up in the source, and in the iterator
+        engine.add(["c.pdf"] * 2, ["c-0", "c-1"], [[0.1] * 4, [0.2] * 4], [{}] * 2)
+        engine.delete_by_filename("b.pdf")
+        return _FakeIterator(iterator.rows + [
+            {"id": row_id, **row} for row_id, row in fake_client.data[collection_name].items() if row["filename"] == "c.pdf"
+        ], 3)
+
+    fake_client.query_iterator = iterator_with_writes
+    engine.reindex(resolve_index_config("exact"), drain_seconds=0)
+
+    contents = sorted(row["content"] for row in fake_client.rows.values())
+    assert contents == sorted([f"a.pdf-{i}" for i in range(5)] + ["c-0", "c-1"])
+
+
+def test_failed_reindex_keeps_serving_old_collection(fake_client):
+    engine, queries = _search_fixture(fake_client, ["a.pdf"], 5)
+
+    def broken_iterator(collection_name, **kwargs):
+        raise ConnectionError("injected iterator failure")
+
+    fake_client.query_iterator = broken_iterator
+    with pytest.raises(ReindexError):
+        engine.reindex(resolve_index_config("exact"), drain_seconds=0)
+
+    assert engine.reindex_status["state"] == "failed"
+    assert fake_client.collections == ["docs"] and engine.collection == "docs"
+    assert engine.similarity_search(queries[0], limit=2)
+    engine.add(["b.pdf"], ["b"], [[0.0] * 4], [{}])
+
+
+def test_restart_ignores_unfinished_reindex(fake_client):
+    UragEngine(fake_client, "docs")
+    fake_client.create_collection("docs__g1")
+    engine = UragEngine(fake_client, "docs")
+    assert engine.collection == "docs" and engine.auto_id
+    engine.reindex(resolve_index_config("exact"), drain_seconds=0)
+    assert fake_client.collections == ["docs__g2"]
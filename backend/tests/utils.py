@@ -0,0 +1,309 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import itertools
+import json
+import random
+import threading
+
+from pymilvus.client.types import LoadState
+from pymilvus.exceptions import MilvusException
+
+WORDS = (
+    "retrieval augmented generation vector index embedding chunk overlap query "
+    "document page milvus latency throughput recall memory batch token model "
+    "search result context answer source citation upload process"
+).split()
+
+
+def make_text(words: int, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+
+def make_pdf(pages: int, lines_per_page: int = 40, words_per_line: int = 12, seed: int = 0) -> bytes:
+    """Builds a minimal multi-page PDF with real text content streams."""
+    rng = random.Random(seed)
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # page tree, filled in once page object numbers are known
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    page_refs = []
+    for _ in range(pages):
+        lines = []
+        for _ in range(lines_per_page):
+            line = " ".join(rng.choice(WORDS) for _ in range(words_per_line))
+            if rng.random() < 0.2:
+                line = line.capitalize() + "."
+            lines.append(f"({line}) Tj T*")
+        stream = ("BT /F1 10 Tf 12 TL 40 780 Td " + " ".join(lines) + " ET").encode("latin-1")
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        content_ref = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_ref
+        )
+        page_refs.append(len(objects))
+    kids = " ".join(f"{ref} 0 R" for ref in page_refs).encode()
+    objects[1] = b"<< /Type /Pages /Kids [" + kids + b"] /Count %d >>" % pages
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        out += b"%010d 00000 n \n" % offset
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(out)
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # buffer headers and body into one write, otherwise Nagle stalls keep-alive responses
+    wbufsize = 1 << 16
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        with self.server.lock:
+            self.server.requests += 1
+        if self.path.endswith("/embeddings"):
+            inputs = body["input"] if isinstance(body["input"], list) else [body["input"]]
+            payload = {
+                "object": "list",
+                "model": body.get("model", "stub"),
+                "data": [{"object": "embedding", "index": i, "embedding": [0.1] * 8} for i in range(len(inputs))],
+                "usage": {"prompt_tokens": len(inputs), "total_tokens": len(inputs)},
+            }
+        elif self.path.endswith("/chat/completions"):
+            payload = {
+                "id": "stub", "object": "chat.completion", "created": 0, "model": body.get("model", "stub"),
+                "choices": [{
+                    "index": 0, "finish_reason": "stop",
+                    "message": {"role": "assistant", "content": '{"answer": "ok", "used_context": false}'},
+                }],
+            }
+        else:
+            payload = {"results": []}
+        data = json.dumps(payload).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubServer:
+    """Local keep-alive HTTP server answering OpenAI embeddings/chat and Exa calls, counting TCP connections."""
+
+    def __init__(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _StubHandler)
+        self.server.daemon_threads = True
+        self.server.lock = threading.Lock()
+        self.server.connections = 0
+        self.server.requests = 0
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def connections(self) -> int:
+        return self.server.connections
+
+    @property
+    def requests(self) -> int:
+        return self.server.requests
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class FakeMilvusClient:
+    """In-memory stand-in for MilvusClient that records every call."""
+
+    def __init__(self, fail_batches=None):
+        self.collections = []
+        self.data = {}
+        self.indexes = {}
+        self.auto_ids = {}
+        self.calls = []
+        self.insert_sizes = []
+        self.search_sizes = []
+        self.search_params = []
+        # maps the first content of a batch to how many times it should fail
+        self.fail_batches = dict(fail_batches or {})
+        self.loaded = True
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    @property
+    def rows(self):
+        # rows of the oldest collection, the only one outside of a reindex
+        return self.data[self.collections[0]] if self.collections else {}
+
+    def list_collections(self):
+        self.calls.append("list_collections")
+        return list(self.collections)
+
+    def load_collection(self, collection_name, **kwargs):
+        self.calls.append("load_collection")
+        self.loaded = True
+
+    def release_collection(self, collection_name, **kwargs):
+        # the server side dropping the collection from memory, behind the engine's back
+        self.loaded = False
+
+    def create_collection(self, collection_name, schema=None, index_params=None, **kwargs):
+        self.calls.append("create_collection")
+        self.collections.append(collection_name)
+        self.data[collection_name] = {}
+        self.auto_ids[collection_name] = schema.auto_id if schema is not None else True
+        for index in index_params or []:
+            self.indexes[collection_name] = {
+                "index_type": index["index_type"],
+                "metric_type": index["metric_type"],
+                **{name: str(value) for name, value in index.get("params", {}).items()},
+                "field_name": index["field_name"],
+                "index_name": index["field_name"],
+            }
+
+    def drop_collection(self, collection_name, **kwargs):
+        self.calls.append("drop_collection")
+        self.collections.remove(collection_name)
+        del self.data[collection_name]
+        self.indexes.pop(collection_name, None)
+
+    def describe_index(self, collection_name, index_name, **kwargs):
+        self.calls.append("describe_index")
+        return dict(self.indexes[collection_name])
+
+    def insert(self, collection_name, data, **kwargs):
+        rows = data if isinstance(data, list) else [data]
+        with self._lock:
+            self.calls.append("insert")
+            key = rows[0]["content"]
+            if self.fail_batches.get(key, 0) > 0:
+                self.fail_batches[key] -= 1
+                raise ConnectionError("injected insert failure")
+            self.insert_sizes.append(len(rows))
+            auto_id = self.auto_ids[collection_name]
+            ids = []
+            for row in rows:
+                row = dict(row)
+                if auto_id:
+                    assert "id" not in row, "auto id collections reject explicit ids"
+                    row_id = next(self._ids)
+                else:
+                    row_id = row.pop("id")
+                self.data[collection_name][row_id] = row
+                ids.append(row_id)
+        return {"insert_count": len(ids), "ids": ids}
+
+    def delete(self, collection_name, filter="", **kwargs):
+        self.calls.append("delete")
+        rows = self.data[collection_name]
+        deleted = [row_id for row_id, row in rows.items() if _matches(filter, row_id, row)]
+        for row_id in deleted:
+            del rows[row_id]
+        return {"delete_count": len(deleted)}
+
+    def get(self, collection_name, ids, output_fields=None, **kwargs):
+        self.calls.append("get")
+        rows = self.data[collection_name]
+        return [
+            {"id": row_id, **{field: rows[row_id][field] for field in output_fields or rows[row_id]}}
+            for row_id in ids if row_id in rows
+        ]
+
+    def query_iterator(self, collection_name, batch_size=1000, output_fields=None, filter="", **kwargs):
+        self.calls.append("query_iterator")
+        rows = [
+            {"id": row_id, **row} for row_id, row in sorted(self.data[collection_name].items())
+            if not filter or _matches(filter, row_id, row)
+        ]
+        return _FakeIterator(rows, batch_size)
+
+    def get_load_state(self, collection_name, **kwargs):
+        self.calls.append("get_load_state")
+        return {"state": LoadState.Loaded if self.loaded else LoadState.NotLoad}
+
+    def search(self, collection_name, data, filter="", limit=10, output_fields=None, search_params=None, **kwargs):
+        # brute-force search understanding the filename filters UragEngine builds
+        self.calls.append("search")
+        if not self.loaded:
+            raise MilvusException(code=101, message="failed to search: collection not loaded")
+        metric = self.indexes.get(collection_name, {}).get("metric_type", "L2")
+        if search_params is not None:
+            assert search_params["metric_type"] == metric, "metric type doesn't match the index"
+            self.search_params.append(search_params)
+        self.search_sizes.append(len(data))
+        allowed = _parse_filename_filter(filter)
+        rows = [
+            (row_id, row) for row_id, row in self.data[collection_name].items()
+            if allowed is None or row["filename"] in allowed
+        ]
+        results = []
+        for query in data:
+            scored = sorted(
+                (_score(metric, query, row["embedding"]), row_id, row)
+                for row_id, row in rows
+            )[:limit]
+            results.append([
+                {"id": row_id, "distance": -score if metric != "L2" else score,
+                 "entity": {field: row[field] for field in output_fields or ["filename", "content"]}}
+                for score, row_id, row in scored
+            ])
+        return results
+
+
+class _FakeIterator:
+    def __init__(self, rows, batch_size):
+        self.rows = rows
+        self.batch_size = batch_size
+
+    def next(self):
+        batch, self.rows = self.rows[:self.batch_size], self.rows[self.batch_size:]
+        return batch
+
+    def close(self):
+        pass
+
+
+def _score(metric, query, vector):
+    # lower is better, similarities are negated
+    if metric == "L2":
+        return sum((a - b) ** 2 for a, b in zip(query, vector))
+    dot = sum(a * b for a, b in zip(query, vector))
+    if metric == "COSINE":
+        dot /= (sum(a * a for a in query) ** 0.5 * sum(b * b for b in vector) ** 0.5) or 1.0
+    return -dot
+
+
+def _matches(expression, row_id, row):
+    # the filename and id filters UragEngine deletes and queries by
+    field, op, value = expression.split(" ", 2)
+    assert field in ("filename", "id") and op in ("==", "in"), expression
+    value = json.loads(value)
+    return (row_id if field == "id" else row["filename"]) in ({value} if op == "==" else set(value))
+
+
+def _parse_filename_filter(expression):
+    if not expression:
+        return None
+    field, op, value = expression.split(" ", 2)
+    assert field == "filename" and op in ("==", "in"), expression
+    value = json.loads(value)
+    return {value} if op == "==" else set(value)
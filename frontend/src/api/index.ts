@@ -23,6 +23,38 @@ interface Chat {
   last_updated: string;
 }
 
+export interface ChatSummary {
+  id: string;
+  title: string;
+  last_updated: string;
+  message_count: number;
+}
+
+export interface ChatPage {
+  chats: ChatSummary[];
+  next_cursor: string | null;
+}
+
+export interface ChatSearchResult {
+  id: string;
+  title: string;
+  last_updated: string;
+  total_messages: number;
+  match_count: number;
+  score: number;
+  preview_messages: Array<{
+    content: string;
+    created_at: string;
+  }>;
+}
+
+export interface ChatSearchPage {
+  results: ChatSearchResult[];
+  total: number;
+  next_offset: number | null;
+  mode: 'text' | 'regex' | 'none';
+}
+
 export interface Document {
   id: string;
   name: string;
@@ -32,6 +64,29 @@ export interface Document {
   content?: string;
 }
 
+export interface UploadResponse {
+  name: string;
+  type: string;
+  size: number;
+  uploadDate: string;
+  status: string;
+  job_id: string;
+}
+
+export interface IngestJob {
+  id: string;
+  filename: string;
+  status: 'queued' | 'running' | 'succeeded' | 'failed' | 'interrupted';
+  stages: Record<string, {
+    status: string;
+    done: number;
+    total: number;
+  }>;
+  chunks: number;
+  error: string | null;
+  queue_depth: number;
+}
+
 export interface SearchResponse {
   answer: string;
   sources: Array<{
@@ -51,8 +106,10 @@ export interface SearchResponse {
 
 export const api = {
 
-  async getChats(): Promise<Chat[]> {
-    const response = await fetch('/api/chat');
+  async getChats(cursor?: string, limit: number = 50): Promise<ChatPage> {
+    const params = new URLSearchParams({ limit: String(limit) });
+    if (cursor) params.set('cursor', cursor);
+    const response = await fetch(`/api/chat?${params}`);
     if (!response.ok) throw new Error('Failed to fetch chats');
     return response.json();
   },
@@ -72,19 +129,9 @@ export const api = {
     if (!response.ok) throw new Error('Failed to add message');
   },
 
-  async searchChats(query: string): Promise<{
-    id: string;
-    title: string;
-    last_updated: string;
-    total_messages: number;
-    match_count: number;
-    preview_messages: Array<{
-      content: string;
-      created_at: string;
-      matched_text: string | null;
-    }>;
-  }[]> {
-    const response = await fetch(`/api/chat/search?q=${encodeURIComponent(query)}`);
+  async searchChats(query: string, offset: number = 0, limit: number = 10): Promise<ChatSearchPage> {
+    const params = new URLSearchParams({ q: query, offset: String(offset), limit: String(limit) });
+    const response = await fetch(`/api/chat/search?${params}`);
     if (!response.ok) throw new Error('Failed to search chats');
     return response.json();
   },
@@ -98,50 +145,54 @@ export const api = {
     return response.json();
   },
 
-  async uploadDocument(file: File): Promise<Document> {
+  async uploadDocument(file: File): Promise<UploadResponse> {
     const apiKey = localStorage.getItem('openai_api_key');
     if (!apiKey) {
       throw new Error('OpenAI API key not configured');
     }
 
-    console.log('Starting upload for file:', file.name);
     const formData = new FormData();
     formData.append('file', file);
 
+    const response = await fetch('/api/documents/upload', {
+      method: 'POST',
+      headers: {
+        'X-OpenAI-Key': apiKey
+      },
+      body: formData,
+    });
+
+    const text = await response.text();
+    let data;
     try {
-      const response = await fetch('/api/documents/upload', {
-        method: 'POST',
-        headers: {
-          'X-OpenAI-Key': apiKey
-        },
-        body: formData,
-      });
-      
-      const text = await response.text();
-      console.log('Raw response:', text);
-      
-      let data;
-      try {
-        data = JSON.parse(text);
-      } catch (e) {
-        console.error('Failed to parse response:', text);
-        throw new Error(`Failed to parse response: ${text}`);
-      }
-
-      if (!response.ok) {
-        throw new Error(data.error || 'Failed to upload document');
-      }
-
-      return {
-        id: data.id,
-        name: file.name,
-        type: file.type,
-        size: `${Math.round(file.size / 1024)} KB`,
-        uploadDate: data.uploadDate || new Date().toISOString(),
-      };
-    } catch (error) {
-      console.error('Upload error details:', error);
-      throw error;
+      data = JSON.parse(text);
+    } catch (e) {
+      throw new Error(`Failed to parse response: ${text}`);
+    }
+
+    if (!response.ok) {
+      throw new Error(data.detail || 'Failed to upload document');
+    }
+    return data;
+  },
+
+  async getIngestJob(jobId: string): Promise<IngestJob> {
+    const response = await fetch(`/api/documents/jobs/${jobId}`);
+    if (!response.ok) throw new Error('Failed to fetch ingest job');
+    return response.json();
+  },
+
+  // Polls an upload's ingest job until it stops running, the file is only listed once it succeeded
+  async waitForIngestJob(
+    jobId: string,
+    onProgress?: (job: IngestJob) => void,
+    intervalMs: number = 1000
+  ): Promise<IngestJob> {
+    while (true) {
+      const job = await this.getIngestJob(jobId);
+      onProgress?.(job);
+      if (job.status !== 'queued' && job.status !== 'running') return job;
+      await new Promise(resolve => setTimeout(resolve, intervalMs));
     }
   },
 
@@ -4,7 +4,7 @@ import { useState, useEffect } from 'react';
 import { MessageCircle, X, Plus, Search, Loader2, Trash2 } from 'lucide-react';
 import { Button } from '@/components/ui/button';
 import { ChatSearch } from './ChatSearch';
-import { api } from '@/api';
+import { api, ChatSummary } from '@/api';
 import { useToast } from "@/hooks/use-toast";
 import { useRouter } from 'next/navigation';
 
@@ -16,8 +16,10 @@ interface ChatHistoryProps {
 export function ChatHistory({ onSelectChat, trigger }: ChatHistoryProps) {
   const [isOpen, setIsOpen] = useState(false);
   const [activeTab, setActiveTab] = useState<'chats' | 'search'>('chats');
-  const [chats, setChats] = useState<Array<{ id: string; title: string; last_updated: string }>>([]);
+  const [chats, setChats] = useState<ChatSummary[]>([]);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
   const [isLoading, setIsLoading] = useState(false);
+  const [isLoadingMore, setIsLoadingMore] = useState(false);
   const { toast } = useToast();
   const router = useRouter();
 
@@ -25,7 +27,8 @@ export function ChatHistory({ onSelectChat, trigger }: ChatHistoryProps) {
     setIsLoading(true);
     try {
       const data = await api.getChats();
-      setChats(data);
+      setChats(data.chats);
+      setNextCursor(data.next_cursor);
     } catch (error) {
       console.error('Failed to load chats:', error);
       toast({
@@ -38,6 +41,25 @@ export function ChatHistory({ onSelectChat, trigger }: ChatHistoryProps) {
     }
   };
 
+  const loadMoreChats = async () => {
+    if (!nextCursor) return;
+    setIsLoadingMore(true);
+    try {
+      const data = await api.getChats(nextCursor);
+      setChats((previous) => [...previous, ...data.chats]);
+      setNextCursor(data.next_cursor);
+    } catch (error) {
+      console.error('Failed to load more chats:', error);
+      toast({
+        title: "Error",
+        description: "Failed to load more chats",
+        variant: "destructive",
+      });
+    } finally {
+      setIsLoadingMore(false);
+    }
+  };
+
   useEffect(() => {
     if (isOpen && activeTab === 'chats') {
       loadChats();
@@ -204,6 +226,18 @@ export function ChatHistory({ onSelectChat, trigger }: ChatHistoryProps) {
                       </div>
                     ))
                   )}
+
+                  {!isLoading && nextCursor && (
+                    <Button
+                      variant="ghost"
+                      onClick={loadMoreChats}
+                      disabled={isLoadingMore}
+                      className="w-full"
+                    >
+                      {isLoadingMore && <Loader2 className="w-4 h-4 mr-2 animate-spin" />}
+                      Load more
+                    </Button>
+                  )}
                 </div>
               ) : (
                 <ChatSearch onSelectChat={(chatId) => {
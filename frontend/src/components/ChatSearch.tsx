@@ -4,7 +4,7 @@ import { useState, useEffect } from 'react';
 import { Search, Loader2, MessageCircle, AlertCircle } from 'lucide-react';
 import { Button } from '@/components/ui/button';
 import { useToast } from "@/hooks/use-toast";
-import { api } from '@/api';
+import { api, ChatSearchResult } from '@/api';
 import { useDebounce } from '@/hooks/useDebounce';
 
 interface ChatSearchProps {
@@ -14,7 +14,9 @@ interface ChatSearchProps {
 export function ChatSearch({ onSelectChat }: ChatSearchProps) {
   const [query, setQuery] = useState('');
   const [isSearching, setIsSearching] = useState(false);
-  const [results, setResults] = useState<Awaited<ReturnType<typeof api.searchChats>>>([]);
+  const [results, setResults] = useState<ChatSearchResult[]>([]);
+  const [nextOffset, setNextOffset] = useState<number | null>(null);
+  const [isLoadingMore, setIsLoadingMore] = useState(false);
   const [hasSearched, setHasSearched] = useState(false);
   const { toast } = useToast();
   const debouncedQuery = useDebounce(query, 300); // Debounce search for better performance
@@ -25,6 +27,7 @@ export function ChatSearch({ onSelectChat }: ChatSearchProps) {
       handleSearch();
     } else {
       setResults([]);
+      setNextOffset(null);
       setHasSearched(false);
     }
   }, [debouncedQuery]);
@@ -36,8 +39,9 @@ export function ChatSearch({ onSelectChat }: ChatSearchProps) {
     setIsSearching(true);
     setHasSearched(true);
     try {
-      const searchResults = await api.searchChats(query.trim());
-      setResults(searchResults);
+      const page = await api.searchChats(query.trim());
+      setResults(page.results);
+      setNextOffset(page.next_offset);
     } catch (error) {
       console.error('Search failed:', error);
       toast({
@@ -50,15 +54,39 @@ export function ChatSearch({ onSelectChat }: ChatSearchProps) {
     }
   };
 
-  // Highlight matched text in content
+  const loadMoreResults = async () => {
+    if (nextOffset === null) return;
+    setIsLoadingMore(true);
+    try {
+      const page = await api.searchChats(query.trim(), nextOffset);
+      setResults((previous) => [...previous, ...page.results]);
+      setNextOffset(page.next_offset);
+    } catch (error) {
+      console.error('Search failed:', error);
+      toast({
+        title: "Search failed",
+        description: "Unable to load more results. Please try again.",
+        variant: "destructive",
+      });
+    } finally {
+      setIsLoadingMore(false);
+    }
+  };
+
+  // Highlight the words of the query in content, results are ranked by word matches
   const highlightMatches = (content: string, searchQuery: string) => {
-    if (!searchQuery.trim()) return content;
+    const terms = searchQuery
+      .split(/\s+/)
+      .filter(Boolean)
+      .map((term) => term.replace(/[.*+?^${}()|[\]\\]/g, '\\$&'));
+    if (terms.length === 0) return content;
     
-    const regex = new RegExp(`(${searchQuery})`, 'gi');
+    const regex = new RegExp(`(${terms.join('|')})`, 'gi');
     const parts = content.split(regex);
     
+    // split keeps the captured matches at the odd positions
     return parts.map((part, i) => 
-      regex.test(part) ? 
+      i % 2 === 1 ? 
         <span key={i} className="bg-yellow-100 text-gray-900">{part}</span> : 
         part
     );
@@ -134,6 +162,18 @@ export function ChatSearch({ onSelectChat }: ChatSearchProps) {
             </div>
           </button>
         ))}
+
+        {nextOffset !== null && !isSearching && (
+          <Button
+            variant="ghost"
+            onClick={loadMoreResults}
+            disabled={isLoadingMore}
+            className="w-full"
+          >
+            {isLoadingMore && <Loader2 className="w-4 h-4 mr-2 animate-spin" />}
+            Load more
+          </Button>
+        )}
       </div>
     </div>
   );
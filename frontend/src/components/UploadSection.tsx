@@ -9,9 +9,25 @@ import {
   DialogHeader,
   DialogTitle,
 } from "@/components/ui/dialog";
-import { api } from '@/api';
+import { api, IngestJob } from '@/api';
 import { useToast } from "@/hooks/use-toast";
 
+interface UploadStatus {
+  text: string;
+  failed: boolean;
+}
+
+function describeJob(job: IngestJob): UploadStatus {
+  if (job.status === 'queued') return { text: 'Queued', failed: false };
+  if (job.status === 'succeeded') return { text: `Indexed, ${job.chunks} chunks`, failed: false };
+  if (job.status === 'failed' || job.status === 'interrupted') {
+    return { text: job.error || `Ingest ${job.status}`, failed: true };
+  }
+  const [name, stage] = Object.entries(job.stages).find(([, stage]) => stage.status === 'running') || ['processing', null];
+  const progress = stage && stage.total ? ` ${stage.done}/${stage.total}` : '';
+  return { text: `Running: ${name}${progress}`, failed: false };
+}
+
 interface UploadSectionProps {
   isOpen: boolean;
   onClose: () => void;
@@ -20,6 +36,8 @@ interface UploadSectionProps {
 export function UploadSection({ isOpen, onClose }: UploadSectionProps) {
   const [isDragging, setIsDragging] = useState(false);
   const [files, setFiles] = useState<File[]>([]);
+  const [statuses, setStatuses] = useState<Record<number, UploadStatus>>({});
+  const [isUploading, setIsUploading] = useState(false);
   const fileInputRef = useRef<HTMLInputElement>(null);
   const { toast } = useToast();
 
@@ -49,13 +67,58 @@ export function UploadSection({ isOpen, onClose }: UploadSectionProps) {
 
   const handleRemoveFile = (index: number) => {
     setFiles(files => files.filter((_, i) => i !== index));
+    setStatuses({});
   };
 
   const handleClose = () => {
     setFiles([]); // Clear files when dialog is closed
+    setStatuses({});
     onClose();
   };
 
+  const setStatus = (index: number, status: UploadStatus) => {
+    setStatuses(prev => ({ ...prev, [index]: status }));
+  };
+
+  const handleUpload = async () => {
+    setIsUploading(true);
+    setStatuses({});
+    // a file only counts as uploaded once its ingest job succeeded
+    const failures: string[] = [];
+    for (let index = 0; index < files.length; index++) {
+      const file = files[index];
+      try {
+        setStatus(index, { text: 'Uploading', failed: false });
+        const upload = await api.uploadDocument(file);
+        const job = await api.waitForIngestJob(upload.job_id, progress => setStatus(index, describeJob(progress)));
+        if (job.status !== 'succeeded') failures.push(`${file.name}: ${describeJob(job).text}`);
+      } catch (error) {
+        console.error('Upload error:', error);
+        const message = error instanceof Error ? error.message : 'Failed to upload file';
+        setStatus(index, { text: message, failed: true });
+        failures.push(`${file.name}: ${message}`);
+      }
+    }
+    setIsUploading(false);
+
+    if (failures.length === 0) {
+      toast({
+        title: "Success",
+        description: "Files uploaded and indexed",
+      });
+      setFiles([]);
+      setStatuses({});
+      onClose();
+      window.location.reload();
+    } else {
+      toast({
+        title: "Error",
+        description: failures.join('\n'),
+        variant: "destructive",
+      });
+    }
+  };
+
   return (
     <Dialog open={isOpen} onOpenChange={handleClose}>
       <DialogContent className="sm:max-w-[600px]">
@@ -107,10 +170,18 @@ export function UploadSection({ isOpen, onClose }: UploadSectionProps) {
             <ul className="space-y-2">
               {files.map((file, index) => (
                 <li key={index} className="flex items-center justify-between p-2 bg-gray-50 rounded">
-                  <span className="text-sm text-gray-600">{file.name}</span>
+                  <div className="flex flex-col">
+                    <span className="text-sm text-gray-600">{file.name}</span>
+                    {statuses[index] && (
+                      <span className={`text-xs ${statuses[index].failed ? 'text-red-500' : 'text-gray-500'}`}>
+                        {statuses[index].text}
+                      </span>
+                    )}
+                  </div>
                   <Button
                     variant="ghost"
                     size="sm"
+                    disabled={isUploading}
                     onClick={() => handleRemoveFile(index)}
                     className="text-red-500 hover:text-red-600"
                   >
@@ -127,29 +198,10 @@ export function UploadSection({ isOpen, onClose }: UploadSectionProps) {
                 Cancel
               </Button>
               <Button 
-                onClick={async () => {
-                  try {
-                    for (const file of files) {
-                      await api.uploadDocument(file);
-                    }
-                    toast({
-                      title: "Success",
-                      description: "Files uploaded successfully",
-                    });
-                    setFiles([]);
-                    onClose();
-                    window.location.reload();
-                  } catch (error) {
-                    console.error('Upload error:', error);
-                    toast({
-                      title: "Error",
-                      description: error instanceof Error ? error.message : "Failed to upload files",
-                      variant: "destructive",
-                    });
-                  }
-                }}
+                onClick={handleUpload}
+                disabled={isUploading}
               >
-                Upload
+                {isUploading ? 'Uploading...' : 'Upload'}
               </Button>
             </div>
           </div>